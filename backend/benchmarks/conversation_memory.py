@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Memory held per conversation turn: plain dict turns vs the compact ConversationStore.
+
+The baseline mirrors the original chat service storage (a dict of lists of turn
+dicts, trimmed with list slicing). Turns are synthetic but shaped like real ones:
+markdown answers, and research turns carrying the analyzer text, sources and the
+agent hierarchy in their metadata. Memory is measured with tracemalloc.
+
+    python backend/benchmarks/conversation_memory.py
+    python backend/benchmarks/conversation_memory.py --conversations 2000 --turns 10 --json
+"""
+
+import argparse
+import gc
+import json
+import os
+import random
+import sys
+import tracemalloc
+from datetime import datetime, timedelta
+from typing import Any, Callable, Dict, List
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "chat"))
+
+from conversation_store import ConversationStore  # noqa: E402
+
+WORDS = """
+    temple dynasty fort heritage kakatiya warangal stepwell inscription granite pillar
+    festival ritual deccan sultanate mural gopuram architecture monsoon pilgrimage
+    courtyard carving sandstone monument restoration archive manuscript trade river
+    the of and in to a was built by during century with its which were for from
+""".split()
+
+
+def sentence(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def paragraph(rng: random.Random, sentences: int) -> str:
+    return " ".join(sentence(rng, rng.randint(8, 18)) for _ in range(sentences))
+
+
+def make_turn(rng: random.Random, index: int, started: datetime) -> Dict[str, Any]:
+    """A turn shaped like store_conversation_turn() output for simple and research chats"""
+    research = index % 2 == 0
+    answer = "\n\n".join(f"## {sentence(rng, 3)}\n\n{paragraph(rng, 4)}" for _ in range(3 if research else 1))
+    metadata: Dict[str, Any] = {
+        "response_type": "research_chat" if research else "simple_chat",
+        "research_used": research,
+        "agents_used": (
+            ["Context Analyzer", "EXA Search Tool", "Conversational AI Assistant"]
+            if research else ["Conversational AI Assistant"]
+        ),
+        "agent_hierarchy": [
+            {"agent": "Context Analyzer", "role": "Query analysis and context determination", "order": 1, "status": "completed"},
+            {"agent": "EXA Search Tool", "role": "Real-time information retrieval", "order": 2, "status": "completed"},
+            {"agent": "Conversational AI Assistant", "role": "Research synthesis and response generation", "order": 3, "status": "completed"},
+        ] if research else [
+            {"agent": "Conversational AI Assistant", "role": "Primary response generator", "order": 1, "status": "completed"},
+        ],
+        "execution_flow": (
+            "Research chat flow: User input → Context Analyzer → EXA Search → Conversational AI Assistant → Response"
+            if research else "Simple chat flow: User input → Conversational AI Assistant → Response"
+        ),
+        "routing": {"needs_research": research, "confidence": round(rng.random(), 3), "source": "classifier"},
+    }
+    if research:
+        metadata.update({
+            "exa_search_used": True,
+            "search_query": sentence(rng, 6),
+            "search_queries": [sentence(rng, 5) for _ in range(3)],
+            "search_wall_ms": round(rng.uniform(300, 1500), 1),
+            "search_results_length": rng.randint(4000, 12000),
+            "search_timestamp": (started + timedelta(seconds=index * 30)).isoformat(),
+            "sources": [f"https://example.org/{rng.choice(WORDS)}/{rng.randint(1, 10 ** 6)}" for _ in range(6)],
+            "analysis": paragraph(rng, 10),
+        })
+    return {
+        "user": sentence(rng, rng.randint(6, 20)),
+        "assistant": answer,
+        "timestamp": (started + timedelta(seconds=index * 30 + 5)).isoformat(),
+        "metadata": metadata,
+    }
+
+
+def baseline_store(max_turns: int):
+    """The original storage: dict of lists, trimmed by slicing"""
+    conversations: Dict[str, List[Dict[str, Any]]] = {}
+
+    def append(conversation_id: str, turn: Dict[str, Any]):
+        if conversation_id not in conversations:
+            conversations[conversation_id] = []
+        conversations[conversation_id].append(turn)
+        if len(conversations[conversation_id]) > max_turns:
+            conversations[conversation_id] = conversations[conversation_id][-max_turns:]
+
+    return conversations, append
+
+
+def measure(build: Callable[[], Any], turns: List[List[Dict[str, Any]]], append_of: Callable[[Any], Callable]) -> Dict[str, Any]:
+    """Bytes allocated by a store after ingesting every turn (turn dicts are freed afterwards)"""
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    store = build()
+    append = append_of(store)
+    for conversation_id, conversation in enumerate(turns):
+        for turn in conversation:
+            # Decode from JSON like a request would, so the store owns every object it keeps
+            append(f"conversation-{conversation_id}", json.loads(json.dumps(turn)))
+    gc.collect()
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    held = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return {"store": store, "bytes": held}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bytes per stored conversation turn, before and after")
+    parser.add_argument("--conversations", type=int, default=500)
+    parser.add_argument("--turns", type=int, default=10, help="turns appended per conversation")
+    parser.add_argument("--max-turns", type=int, default=10, help="MAX_CONVERSATION_HISTORY")
+    parser.add_argument("--hot-turns", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    started = datetime(2025, 1, 1, 9, 30)
+    turns = [[make_turn(rng, index, started) for index in range(args.turns)] for _ in range(args.conversations)]
+    stored_turns = args.conversations * min(args.turns, args.max_turns)
+
+    baseline = measure(lambda: baseline_store(args.max_turns), turns, lambda store: store[1])
+    variants = {
+        "compact": dict(compress=False),
+        "compact+zlib": dict(compress=True),
+    }
+    results = {
+        "conversations": args.conversations,
+        "stored_turns": stored_turns,
+        "baseline": {"bytes": baseline["bytes"], "bytes_per_turn": round(baseline["bytes"] / stored_turns, 1)},
+    }
+    for name, options in variants.items():
+        measured = measure(
+            lambda: ConversationStore(
+                ttl=0, max_bytes=1 << 40, max_conversations=1 << 30,
+                max_turns=args.max_turns, sweep_interval=0, hot_turns=args.hot_turns, **options
+            ),
+            turns,
+            lambda store: store.append,
+        )
+        # Reading back must give the same turns the baseline holds
+        store = measured["store"]
+        sample = f"conversation-{args.conversations - 1}"
+        assert store.get(sample) == baseline["store"][0][sample], f"{name} did not round-trip"
+        results[name] = {
+            "bytes": measured["bytes"],
+            "bytes_per_turn": round(measured["bytes"] / stored_turns, 1),
+            "reduction": round(baseline["bytes"] / measured["bytes"], 2) if measured["bytes"] else None,
+            "accounted_bytes": store.stats()["bytes"],
+        }
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    print(f"{args.conversations} conversations, {stored_turns} stored turns (max {args.max_turns} per conversation)")
+    print(f"{'layout':<14} {'bytes held':>14} {'bytes/turn':>12} {'vs baseline':>12}")
+    print(f"{'dict turns':<14} {results['baseline']['bytes']:>14,} {results['baseline']['bytes_per_turn']:>12,.1f} {'1.00x':>12}")
+    for name in variants:
+        row = results[name]
+        print(f"{name:<14} {row['bytes']:>14,} {row['bytes_per_turn']:>12,.1f} {row['reduction']:>11.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,434 @@
+#!/usr/bin/env python3
+"""
+Throughput and tail latency of /chat and /explore against local EXA and watsonx stand-ins.
+
+Each workload is driven closed-loop at each concurrency level: N clients send requests
+back to back until the level's request count is reached. Workloads:
+
+    simple    POST /chat with force_simple (one watsonx call, no search)
+    research  POST /chat with force_research (context analysis, EXA fan-out, synthesis)
+    explore   POST /explore (plan, search, coordinates, synthesis on the job pool)
+
+With --spawn, the two stand-ins (standins.py) and the chat and explore services
+(through standin_service.py) are started as subprocesses on free ports, with disk
+caches, traces and the conversation log switched off. Otherwise --chat-url / --explore-url name services that are already
+running. Every message carries the request number, so the search and completion caches
+miss as they would for distinct users; pass --repeat to send identical messages instead.
+
+Reports p50/p95/p99 latency, throughput and error rate per workload and concurrency.
+--output saves the run as JSON, and --compare prints the change against a saved run.
+
+    python backend/benchmarks/load_test.py --spawn
+    python backend/benchmarks/load_test.py --spawn --workloads simple,research --concurrency 1,8,32 \\
+        --watsonx-latency lognormal:0.6,0.5 --exa-error-rate 0.05 --output run.json
+    python backend/benchmarks/load_test.py --chat-url http://127.0.0.1:8001 --workloads simple --compare run.json
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCHMARKS_DIR)
+
+sys.path.insert(0, BENCHMARKS_DIR)
+
+from standins import add_arguments  # noqa: E402
+
+MESSAGES = [
+    "Tell me about the history of the Thousand Pillar Temple in Warangal",
+    "What architectural style is the Ramappa temple built in",
+    "Which dynasty built the Golconda fort and why",
+    "Explain the significance of stepwells in Deccan architecture",
+    "What festivals are celebrated at the Bhadrachalam temple",
+]
+QUERIES = [
+    "temples in Warangal",
+    "heritage forts near Hyderabad",
+    "stepwells in Telangana",
+    "Kakatiya monuments to visit",
+]
+
+# Service -> the configuration that isolates a benchmark run from local state
+SERVICE_ENV = {
+    "chat": {
+        "CONVERSATION_LOG_DIR": "",
+        "ROUTER_LOG_PATH": "",
+    },
+    "explore": {},
+}
+COMMON_ENV = {
+    "IBM_API_KEY": "standin",
+    "IBM_PROJECT_ID": "standin",
+    "EXA_API_KEY": "standin",
+    "LAZY_STARTUP": "False",
+    "TRACE_DIR": "",
+    "SEARCH_DISK_CACHE_PATH": "",
+    "LLM_CACHE_DISK_PATH": "",
+    "PROFILE_TOKEN": "",
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+class Processes:
+    """Subprocesses started for the run, stopped together (and on Ctrl-C)"""
+
+    def __init__(self, log_dir: str):
+        self.log_dir = log_dir
+        self.running: List[Tuple[str, subprocess.Popen]] = []
+
+    def start(self, name: str, args: List[str], cwd: str, env: Optional[Dict[str, str]] = None) -> subprocess.Popen:
+        log = open(os.path.join(self.log_dir, f"{name}.log"), "w")
+        process = subprocess.Popen(args, cwd=cwd, env={**os.environ, **(env or {})}, stdout=log, stderr=subprocess.STDOUT)
+        self.running.append((name, process))
+        return process
+
+    def wait_ready(self, name: str, url: str, timeout: float):
+        """Poll `url` until it answers 200; fail early if the process exits"""
+        process = dict(self.running)[name]
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"{name} exited with {process.returncode}; see {self.log_dir}/{name}.log")
+            try:
+                if httpx.get(url, timeout=2).status_code == 200:
+                    return
+            except httpx.HTTPError:
+                pass
+            time.sleep(0.5)
+        raise RuntimeError(f"{name} was not ready after {timeout:.0f}s; see {self.log_dir}/{name}.log")
+
+    def stop(self):
+        for _, process in self.running:
+            process.terminate()
+        for _, process in self.running:
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+        self.running.clear()
+
+
+def spawn(args: argparse.Namespace, processes: Processes, workloads: List[str]) -> Dict[str, str]:
+    """Start the stand-ins and the services the workloads need; returns their base URLs"""
+    urls = {"exa": f"http://127.0.0.1:{free_port()}", "watsonx": f"http://127.0.0.1:{free_port()}"}
+    standin = [sys.executable, os.path.join(BENCHMARKS_DIR, "standins.py")]
+    common = ["--seed", str(args.seed)]
+    processes.start("exa", standin + [
+        "exa", "--port", urls["exa"].rsplit(":", 1)[1],
+        "--latency", args.exa_latency, "--error-rate", str(args.exa_error_rate), "--error-status", args.exa_error_status,
+        "--text-chars", str(args.exa_text_chars),
+    ] + (["--payload", args.exa_payload] if args.exa_payload else []) + common, BENCHMARKS_DIR)
+    processes.start("watsonx", standin + [
+        "watsonx", "--port", urls["watsonx"].rsplit(":", 1)[1],
+        "--latency", args.watsonx_latency, "--error-rate", str(args.watsonx_error_rate),
+        "--error-status", args.watsonx_error_status,
+        "--tokens-per-second", str(args.watsonx_tokens_per_second), "--output-tokens", str(args.watsonx_output_tokens),
+    ] + (["--payload", args.watsonx_payload] if args.watsonx_payload else []) + common, BENCHMARKS_DIR)
+    for name in ("exa", "watsonx"):
+        processes.wait_ready(name, f"{urls[name]}/stats", 30)
+
+    env = {
+        **COMMON_ENV,
+        "EXA_BASE_URL": urls["exa"],
+        "IBM_WATSONX_URL": urls["watsonx"],
+    }
+    if not args.cache:
+        env["LLM_CACHE_ENABLED"] = "False"
+    services = {"chat"} if {"simple", "research"} & set(workloads) else set()
+    if "explore" in workloads:
+        services.add("explore")
+    for service in sorted(services):
+        port = free_port()
+        urls[service] = f"http://127.0.0.1:{port}"
+        service_env = {**env, **SERVICE_ENV[service], "PORT": str(port)}
+        if service == "explore":
+            service_env["EXPLORE_JOB_DB"] = os.path.join(processes.log_dir, "explore_jobs.db")
+        processes.start(service, [
+            sys.executable, os.path.join(BENCHMARKS_DIR, "standin_service.py"), "--port", str(port),
+        ], os.path.join(BACKEND_DIR, service), service_env)
+    for service in sorted(services):
+        processes.wait_ready(service, f"{urls[service]}/ready", args.startup_timeout)
+    return urls
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Nearest-rank percentile of sorted `values`"""
+    if not values:
+        return 0.0
+    rank = max(1, math.ceil(q / 100 * len(values)))
+    return values[min(rank, len(values)) - 1]
+
+
+def request_for(workload: str, index: int, repeat: bool, urls: Dict[str, str]) -> Tuple[str, Dict[str, Any]]:
+    suffix = "" if repeat else f" (request {index})"
+    if workload == "explore":
+        return f"{urls['explore']}/explore", {"query": QUERIES[index % len(QUERIES)] + suffix}
+    body = {"message": MESSAGES[index % len(MESSAGES)] + suffix}
+    body["force_simple" if workload == "simple" else "force_research"] = True
+    return f"{urls['chat']}/chat", body
+
+
+def classify(response: httpx.Response) -> Optional[str]:
+    """None for a successful request, else an error label"""
+    if response.status_code != 200:
+        return f"http_{response.status_code}"
+    try:
+        body = response.json()
+    except ValueError:
+        return "invalid_json"
+    if body.get("success") is False:
+        return "failed"
+    return None
+
+
+async def run_level(
+    workload: str,
+    concurrency: int,
+    total: int,
+    urls: Dict[str, str],
+    timeout: float,
+    repeat: bool,
+    offset: int,
+) -> Dict[str, Any]:
+    """`concurrency` clients send `total` requests between them, each as soon as its last returned"""
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    next_index = [0]
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+
+    async with httpx.AsyncClient(timeout=timeout, limits=limits) as client:
+        async def worker():
+            while next_index[0] < total:
+                index = next_index[0]
+                next_index[0] += 1
+                url, body = request_for(workload, offset + index, repeat, urls)
+                started = time.perf_counter()
+                try:
+                    error = classify(await client.post(url, json=body))
+                except httpx.TimeoutException:
+                    error = "timeout"
+                except httpx.HTTPError as e:
+                    error = type(e).__name__
+                elapsed = time.perf_counter() - started
+                if error is None:
+                    latencies.append(elapsed)
+                else:
+                    errors[error] = errors.get(error, 0) + 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        wall = time.perf_counter() - started
+
+    latencies.sort()
+    failed = sum(errors.values())
+    return {
+        "workload": workload,
+        "concurrency": concurrency,
+        "requests": total,
+        "succeeded": len(latencies),
+        "failed": failed,
+        "error_rate": round(failed / total, 4) if total else 0.0,
+        "errors": errors,
+        "wall_seconds": round(wall, 3),
+        "throughput_rps": round(len(latencies) / wall, 3) if wall else 0.0,
+        "latency_ms": {
+            "min": round(latencies[0] * 1000, 1) if latencies else None,
+            "mean": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else None,
+            "p50": round(percentile(latencies, 50) * 1000, 1) if latencies else None,
+            "p95": round(percentile(latencies, 95) * 1000, 1) if latencies else None,
+            "p99": round(percentile(latencies, 99) * 1000, 1) if latencies else None,
+            "max": round(latencies[-1] * 1000, 1) if latencies else None,
+        },
+    }
+
+
+async def fetch_stats(urls: Dict[str, str]) -> Dict[str, Any]:
+    """Stand-in counters and the services' token totals, if reachable"""
+    paths = {"exa": "/stats", "watsonx": "/stats", "chat": "/tokens/stats", "explore": "/tokens/stats"}
+    stats: Dict[str, Any] = {}
+    async with httpx.AsyncClient(timeout=5) as client:
+        for name, url in urls.items():
+            try:
+                response = await client.get(url + paths[name])
+                if response.status_code == 200:
+                    stats[name] = response.json()
+            except httpx.HTTPError:
+                pass
+    return stats
+
+
+async def run(args: argparse.Namespace, urls: Dict[str, str], workloads: List[str], levels: List[int]) -> List[Dict[str, Any]]:
+    runs = []
+    offset = 0
+    for workload in workloads:
+        if args.warmup:
+            await run_level(workload, 1, args.warmup, urls, args.timeout, args.repeat, offset)
+            offset += args.warmup
+        for concurrency in levels:
+            total = args.requests or max(args.min_requests, concurrency * args.requests_per_client)
+            result = await run_level(workload, concurrency, total, urls, args.timeout, args.repeat, offset)
+            offset += total
+            runs.append(result)
+            if not args.json:
+                print_row(result)
+    return runs
+
+
+def print_header():
+    print(f"{'workload':<10} {'conc':>5} {'reqs':>6} {'ok':>6} {'err%':>6} {'rps':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+
+
+def print_row(row: Dict[str, Any]):
+    latency = row["latency_ms"]
+
+    def ms(value: Optional[float]) -> str:
+        return f"{value:>9,.0f}" if value is not None else f"{'-':>9}"
+
+    print(
+        f"{row['workload']:<10} {row['concurrency']:>5} {row['requests']:>6} {row['succeeded']:>6} "
+        f"{row['error_rate'] * 100:>5.1f}% {row['throughput_rps']:>8.2f} "
+        f"{ms(latency['p50'])} {ms(latency['p95'])} {ms(latency['p99'])} {ms(latency['max'])}"
+        + (f"  {row['errors']}" if row["errors"] else "")
+    )
+
+
+def compare(results: Dict[str, Any], path: str) -> List[Dict[str, Any]]:
+    """Change of each (workload, concurrency) against a saved run, as percentages"""
+    with open(path, encoding="utf-8") as f:
+        previous = {(row["workload"], row["concurrency"]): row for row in json.load(f)["runs"]}
+
+    def change(new: Optional[float], old: Optional[float]) -> Optional[float]:
+        if new is None or not old:
+            return None
+        return round((new - old) / old * 100, 1)
+
+    deltas = []
+    for row in results["runs"]:
+        old = previous.get((row["workload"], row["concurrency"]))
+        if old is None:
+            continue
+        deltas.append({
+            "workload": row["workload"],
+            "concurrency": row["concurrency"],
+            "throughput_pct": change(row["throughput_rps"], old["throughput_rps"]),
+            "p50_pct": change(row["latency_ms"]["p50"], old["latency_ms"]["p50"]),
+            "p95_pct": change(row["latency_ms"]["p95"], old["latency_ms"]["p95"]),
+            "p99_pct": change(row["latency_ms"]["p99"], old["latency_ms"]["p99"]),
+            "error_rate_diff": round(row["error_rate"] - old["error_rate"], 4),
+        })
+    return deltas
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test /chat and /explore against local EXA and watsonx stand-ins")
+    parser.add_argument("--workloads", default="simple,research,explore", help="comma-separated: simple, research, explore")
+    parser.add_argument("--concurrency", default="1,4,16", help="comma-separated concurrency levels")
+    parser.add_argument("--requests", type=int, default=0, help="requests per level (default: scales with concurrency)")
+    parser.add_argument("--requests-per-client", type=int, default=4)
+    parser.add_argument("--min-requests", type=int, default=10)
+    parser.add_argument("--warmup", type=int, default=2, help="unmeasured requests before each workload")
+    parser.add_argument("--timeout", type=float, default=300.0, help="per-request timeout in seconds")
+    parser.add_argument("--repeat", action="store_true", help="send identical messages (exercises the caches)")
+    parser.add_argument("--spawn", action="store_true", help="start stand-ins and services as subprocesses")
+    parser.add_argument("--chat-url", default="http://127.0.0.1:8001")
+    parser.add_argument("--explore-url", default="http://127.0.0.1:8002")
+    parser.add_argument("--startup-timeout", type=float, default=180.0)
+    parser.add_argument("--cache", action="store_true", help="with --spawn, keep the in-memory completion cache on")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="save results to this JSON file")
+    parser.add_argument("--compare", help="print the change against a JSON file saved by an earlier run")
+    parser.add_argument("--json", action="store_true", help="print machine-readable results")
+    for service in ("exa", "watsonx"):
+        group = argparse.ArgumentParser(add_help=False)
+        add_arguments(group, service)
+        # Stand-in options are prefixed with the service name, e.g. --exa-latency
+        for action in group._actions:
+            parser.add_argument(
+                f"--{service}-{action.option_strings[0][2:]}",
+                dest=f"{service}_{action.dest}",
+                type=action.type,
+                default=action.default,
+                help=f"{service} stand-in: {action.help}" if action.help else f"{service} stand-in",
+            )
+    args = parser.parse_args()
+
+    workloads = [name.strip() for name in args.workloads.split(",") if name.strip()]
+    unknown = set(workloads) - {"simple", "research", "explore"}
+    if unknown:
+        parser.error(f"unknown workloads: {', '.join(sorted(unknown))}")
+    levels = [int(level) for level in args.concurrency.split(",") if level]
+
+    log_dir = tempfile.mkdtemp(prefix="load-test-")
+    processes = Processes(log_dir)
+    try:
+        if args.spawn:
+            if not args.json:
+                print(f"Starting stand-ins and services (logs in {log_dir})...")
+            urls = spawn(args, processes, workloads)
+        else:
+            urls = {"chat": args.chat_url.rstrip("/"), "explore": args.explore_url.rstrip("/")}
+        if not args.json:
+            print_header()
+        started_at = datetime.now(timezone.utc).isoformat()
+        runs = asyncio.run(run(args, urls, workloads, levels))
+        stats = asyncio.run(fetch_stats(urls))
+    finally:
+        processes.stop()
+
+    results = {
+        "started_at": started_at,
+        "host": {"python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count()},
+        "config": {
+            key: value for key, value in vars(args).items()
+            if key not in ("json", "output", "compare", "chat_url", "explore_url")
+        },
+        "spawned": args.spawn,
+        "runs": runs,
+        "server_stats": stats,
+    }
+    if args.compare:
+        results["comparison"] = {"baseline": args.compare, "changes": compare(results, args.compare)}
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+
+    if args.compare:
+        print(f"\nChange against {args.compare} (negative latency is better)")
+        print(f"{'workload':<10} {'conc':>5} {'rps':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'err':>8}")
+        for row in results["comparison"]["changes"]:
+            cells = [row["throughput_pct"], row["p50_pct"], row["p95_pct"], row["p99_pct"]]
+            print(
+                f"{row['workload']:<10} {row['concurrency']:>5} "
+                + " ".join(f"{cell:>+7.1f}%" if cell is not None else f"{'-':>8}" for cell in cells)
+                + f" {row['error_rate_diff'] * 100:>+7.1f}%"
+            )
+        if not results["comparison"]["changes"]:
+            print("(no workload and concurrency level in common)")
+    if args.output:
+        print(f"\nSaved {args.output}")
+
+
+if __name__ == "__main__":
+    main()
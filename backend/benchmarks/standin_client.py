@@ -0,0 +1,129 @@
+"""
+A plain-REST watsonx client for running the services against the local stand-in.
+
+The watsonx SDK cannot reach standins.py: it accepts only https IBM Cloud or CPD URLs
+and always takes its token from IBM Cloud IAM. `install()` swaps the SDK names the
+services' client registry (llm_registry.py) imports on first use for the classes here,
+which send the same text generation calls over httpx. Only standin_service.py calls it,
+so production services never take this path.
+"""
+
+import json
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+import httpx
+
+API_VERSION = "2023-05-29"
+
+
+class WatsonxRestError(Exception):
+    """A text generation call to the stand-in failed"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class StandinCredentials:
+    """Takes the place of ibm_watsonx_ai.Credentials; just holds the URL and key"""
+
+    def __init__(self, url: Optional[str] = None, api_key: Optional[str] = None, **kwargs: Any):
+        self.url = url
+        self.api_key = api_key
+
+
+class StandinAPIClient:
+    """Takes the place of ibm_watsonx_ai.APIClient: one pooled HTTP session, no IAM token fetch"""
+
+    def __init__(self, credentials: StandinCredentials, project_id: Optional[str] = None, **kwargs: Any):
+        if not credentials.url:
+            raise ValueError("IBM_WATSONX_URL must point at the watsonx stand-in")
+        self.project_id = project_id
+        self.http = httpx.Client(
+            base_url=credentials.url.rstrip("/"),
+            headers={"Authorization": f"Bearer {credentials.api_key}"},
+            timeout=httpx.Timeout(300.0, connect=10.0),
+            limits=httpx.Limits(max_connections=100, max_keepalive_connections=20),
+        )
+
+
+class WatsonxRestModel:
+    """The part of ModelInference that WatsonxLLM uses, sent straight to the REST API"""
+
+    def __init__(self, model_id: str, api_client: StandinAPIClient, params: Optional[Dict[str, Any]] = None, **kwargs: Any):
+        self.model_id = model_id
+        self.params = params or {}
+        self.client = api_client.http
+        self.project_id = api_client.project_id
+
+    def _body(self, prompt: str, params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        return {
+            "input": prompt,
+            "parameters": params if params is not None else self.params,
+            "model_id": self.model_id,
+            "project_id": self.project_id,
+        }
+
+    @staticmethod
+    def _check(response: httpx.Response):
+        if response.status_code != 200:
+            raise WatsonxRestError(
+                f"Text generation failed with status {response.status_code}: {response.text[:500]}",
+                status_code=response.status_code,
+            )
+
+    def generate(self, prompt: Union[str, List[str]], params: Optional[Dict[str, Any]] = None, **kwargs: Any) -> Any:
+        """One response per prompt, a list when `prompt` is a list (as the SDK returns)"""
+        prompts = prompt if isinstance(prompt, list) else [prompt]
+        responses = []
+        for text in prompts:
+            response = self.client.post(
+                "/ml/v1/text/generation", params={"version": API_VERSION}, json=self._body(text, params)
+            )
+            self._check(response)
+            responses.append(response.json())
+        return responses if isinstance(prompt, list) else responses[0]
+
+    def generate_text_stream(
+        self,
+        prompt: str,
+        params: Optional[Dict[str, Any]] = None,
+        raw_response: bool = False,
+        **kwargs: Any,
+    ) -> Iterator[Any]:
+        """Server-sent events from generation_stream: raw chunks, or just their text"""
+        with self.client.stream(
+            "POST", "/ml/v1/text/generation_stream", params={"version": API_VERSION}, json=self._body(prompt, params)
+        ) as response:
+            if response.status_code != 200:
+                response.read()
+                self._check(response)
+            for line in response.iter_lines():
+                if not line.startswith("data:"):
+                    continue
+                chunk = json.loads(line[5:])
+                yield chunk if raw_response else chunk["results"][0]["generated_text"]
+
+    def tokenize(self, prompt: str, return_tokens: bool = False) -> Dict[str, Any]:
+        response = self.client.post(
+            "/ml/v1/text/tokenization",
+            params={"version": API_VERSION},
+            json={
+                "input": prompt,
+                "model_id": self.model_id,
+                "project_id": self.project_id,
+                "parameters": {"return_tokens": return_tokens},
+            },
+        )
+        self._check(response)
+        return response.json()["result"]
+
+
+def install():
+    """Make the client registry build stand-in clients in place of the SDK's"""
+    import ibm_watsonx_ai
+    import ibm_watsonx_ai.foundation_models
+
+    ibm_watsonx_ai.Credentials = StandinCredentials
+    ibm_watsonx_ai.APIClient = StandinAPIClient
+    ibm_watsonx_ai.foundation_models.ModelInference = WatsonxRestModel
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+"""
+Run the chat or explore service against the watsonx stand-in.
+
+Start it from the service's directory, as uvicorn would be. It installs the REST
+stand-in client (standin_client.py) before the service is imported, then serves
+main:app. load_test.py --spawn starts the services this way.
+
+    cd backend/chat && IBM_WATSONX_URL=http://127.0.0.1:8902 python ../benchmarks/standin_service.py --port 8001
+"""
+
+import argparse
+import os
+import sys
+
+BENCHMARKS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Serve a backend service with watsonx calls sent to the stand-in")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--log-level", default="warning")
+    args = parser.parse_args()
+
+    sys.path.insert(0, BENCHMARKS_DIR)
+    # The services import their modules flat from their own directory
+    sys.path.insert(0, os.getcwd())
+    import standin_client
+
+    standin_client.install()
+    uvicorn.run("main:app", host=args.host, port=args.port, log_level=args.log_level)
+
+
+if __name__ == "__main__":
+    main()
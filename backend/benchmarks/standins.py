@@ -0,0 +1,407 @@
+#!/usr/bin/env python3
+"""
+Local stand-ins for EXA /search and the watsonx text generation API, for load tests.
+
+Point a service at them with EXA_BASE_URL and IBM_WATSONX_URL, and start it with
+standin_service.py so its watsonx calls go over plain REST (standin_client.py) rather
+than through the SDK. Each stand-in draws its latency from a distribution and fails a
+share of requests with the given statuses. Stand-in watsonx generates output at a fixed token rate after a
+sampled time to first token, and streams it on /generation_stream the way watsonx does.
+
+Replies come from canned payloads. EXA serves results from a JSON file
+(`{"results": [...]}`) or synthetic pages. watsonx answers in the crewai ReAct format:
+agents with tools first call their tool once, then give a Final Answer. The answer text
+comes from the first rule in a JSON file (`{"rules": [{"match": regex, "text": ...}],
+"default": ...}`) whose regex matches the prompt, or from built-in rules. Those cover
+the chat context analyzer and the explore synthesizer's JSON. GET /stats reports
+requests served and errors injected.
+
+    python backend/benchmarks/standins.py exa --port 8901 --latency lognormal:0.4,0.5 --error-rate 0.02
+    python backend/benchmarks/standins.py watsonx --port 8902 --latency uniform:0.2,0.6 --tokens-per-second 80
+
+Latency specs: fixed:S, uniform:LOW,HIGH, normal:MEAN,STDDEV, lognormal:MEDIAN,SIGMA,
+exponential:MEAN (seconds; samples below zero are clamped).
+"""
+
+import argparse
+import asyncio
+import json
+import math
+import random
+import re
+import threading
+import time
+import uuid
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+# The services estimate tokens at four characters each; the stand-in counts the same way
+CHARS_PER_TOKEN = 4
+
+WORDS = """
+    temple dynasty fort heritage kakatiya warangal stepwell inscription granite pillar
+    festival ritual deccan sultanate mural gopuram architecture monsoon pilgrimage
+    courtyard carving sandstone monument restoration archive manuscript trade river
+    the of and in to a was built by during century with its which were for from
+""".split()
+
+DISTRIBUTIONS: Dict[str, Callable[..., Callable[[random.Random], float]]] = {
+    "fixed": lambda value: lambda rng: value,
+    "uniform": lambda low, high: lambda rng: rng.uniform(low, high),
+    "normal": lambda mean, stddev: lambda rng: rng.gauss(mean, stddev),
+    "lognormal": lambda median, sigma: lambda rng: rng.lognormvariate(math.log(median), sigma),
+    "exponential": lambda mean: lambda rng: rng.expovariate(1 / mean),
+}
+
+
+class Latency:
+    """A latency distribution parsed from `name:arg,arg`"""
+
+    def __init__(self, spec: str, seed: Optional[int] = None):
+        name, _, args = spec.partition(":")
+        if name not in DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution {name!r} (one of {', '.join(DISTRIBUTIONS)})")
+        try:
+            self._sample = DISTRIBUTIONS[name](*(float(arg) for arg in args.split(",") if arg))
+        except TypeError:
+            raise ValueError(f"Wrong number of arguments for {name} in {spec!r}")
+        self.spec = spec
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            return max(0.0, self._sample(self._rng))
+
+
+class Faults:
+    """Fails a share of requests with one of the given HTTP statuses"""
+
+    def __init__(self, rate: float, statuses: Sequence[int], seed: Optional[int] = None):
+        self.rate = rate
+        self.statuses = list(statuses) or [500]
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def pick(self) -> Optional[int]:
+        with self._lock:
+            if self.rate and self._rng.random() < self.rate:
+                return self._rng.choice(self.statuses)
+        return None
+
+
+class Counters:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.values: Dict[str, int] = {}
+        self.started = time.time()
+
+    def inc(self, name: str, amount: int = 1):
+        with self._lock:
+            self.values[name] = self.values.get(name, 0) + amount
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"uptime_seconds": round(time.time() - self.started, 1), **self.values}
+
+
+def estimate_tokens(text: str) -> int:
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN) if text else 0
+
+
+def filler(rng: random.Random, chars: int) -> str:
+    """Sentences of heritage vocabulary, about `chars` long"""
+    parts: List[str] = []
+    length = 0
+    while length < chars:
+        sentence = " ".join(rng.choice(WORDS) for _ in range(rng.randint(8, 18))).capitalize() + "."
+        parts.append(sentence)
+        length += len(sentence) + 1
+    return " ".join(parts)[:chars]
+
+
+def load_json(path: Optional[str]) -> Dict[str, Any]:
+    if not path:
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def error_response(status: int, message: str) -> JSONResponse:
+    return JSONResponse(status_code=status, content={"errors": [{"code": "standin_fault", "message": message}], "status_code": status})
+
+
+# -- EXA ---------------------------------------------------------------------------
+
+
+def exa_app(latency: Latency, faults: Faults, payload: Dict[str, Any], text_chars: int = 1500, seed: int = 7) -> FastAPI:
+    """EXA /search returning canned or synthetic results after a sampled delay"""
+    app = FastAPI(title="EXA stand-in")
+    canned = payload.get("results") or []
+    counters = Counters()
+    rng = random.Random(seed)
+
+    def results_for(query: str, count: int) -> List[Dict[str, Any]]:
+        if canned:
+            start = zlib.crc32(query.encode()) % len(canned)
+            return [canned[(start + i) % len(canned)] for i in range(min(count, len(canned)))]
+        slug = re.sub(r"[^a-z0-9]+", "-", query.lower()).strip("-")[:60] or "result"
+        return [
+            {
+                "id": uuid.uuid4().hex,
+                "title": f"{query[:60]} - source {i + 1}",
+                "url": f"https://heritage.example.org/{slug}/{i + 1}",
+                "publishedDate": "2024-01-01T00:00:00.000Z",
+                "author": None,
+                "score": round(1 - i * 0.05, 3),
+                "text": filler(rng, text_chars),
+            }
+            for i in range(count)
+        ]
+
+    @app.post("/search")
+    async def search(request: Request):
+        body = await request.json()
+        counters.inc("requests")
+        await asyncio.sleep(latency.sample())
+        status = faults.pick()
+        if status is not None:
+            counters.inc(f"faults_{status}")
+            return error_response(status, "Injected EXA failure")
+        results = results_for(str(body.get("query", "")), int(body.get("numResults", 5)))
+        counters.inc("results", len(results))
+        return {"requestId": uuid.uuid4().hex, "resolvedSearchType": body.get("type", "neural"), "results": results}
+
+    @app.get("/stats")
+    async def stats():
+        return {"service": "exa", "latency": latency.spec, "error_rate": faults.rate, **counters.snapshot()}
+
+    return app
+
+
+# -- watsonx -------------------------------------------------------------------------
+
+_TOOLS = re.compile(r"only one name of \[([^\]]+)\]")
+_TASK = re.compile(r"Current Task:\s*(.+)")
+
+ANALYZER_TEXT = (
+    "topic_tag: heritage\nintent: information\n"
+    'needs_research: yes -> "{topic} history", "{topic} architecture", "{topic} visiting hours"\n'
+    "response_type: detailed"
+)
+SYNTHESIS_ITEMS = 3
+
+
+def task_topic(prompt: str) -> str:
+    """A few words of the task, used as search input and to vary answers"""
+    match = _TASK.search(prompt)
+    words = re.findall(r"[A-Za-z0-9']+", match.group(1) if match else prompt[-300:])
+    return " ".join(words[:8]) or "heritage sites"
+
+
+def synthesis_json(topic: str) -> str:
+    items = [
+        {
+            "title": f"{topic.title()} site {i + 1}",
+            "description": f"A heritage site related to {topic}.",
+            "location": "Warangal, Telangana",
+            "tags": ["temple", "heritage"],
+            "url": f"https://heritage.example.org/site-{i + 1}",
+            "coordinates": {"lat": 17.97 + i / 100, "lng": 79.6 + i / 100},
+            "image": None,
+            "address": None,
+            "distance_km": None,
+            "distance_text": None,
+        }
+        for i in range(SYNTHESIS_ITEMS)
+    ]
+    return json.dumps({"query": topic, "summary": f"Places to explore for {topic}.", "items": items, "sources": []}, separators=(",", ":"))
+
+
+class Responder:
+    """Picks the stand-in's answer for a prompt"""
+
+    def __init__(self, payload: Dict[str, Any], output_tokens: int, seed: int = 7):
+        self.rules = [(re.compile(rule["match"], re.IGNORECASE | re.DOTALL), rule["text"]) for rule in payload.get("rules", [])]
+        self.default = payload.get("default")
+        self.output_tokens = output_tokens
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def answer_text(self, prompt: str, topic: str) -> str:
+        for pattern, text in self.rules:
+            if pattern.search(prompt):
+                return text.replace("{topic}", topic)
+        if "minified JSON" in prompt:
+            return synthesis_json(topic)
+        if "needs_research" in prompt:
+            return ANALYZER_TEXT.format(topic=topic)
+        if self.default:
+            return self.default.replace("{topic}", topic)
+        with self._lock:
+            return f"## {topic.title()}\n\n" + filler(self._rng, self.output_tokens * CHARS_PER_TOKEN)
+
+    def reply(self, prompt: str) -> str:
+        topic = task_topic(prompt)
+        tools = _TOOLS.search(prompt)
+        scratchpad = prompt.rsplit("Begin!", 1)[-1]
+        if tools and "Observation:" not in scratchpad:
+            tool = tools.group(1).split(",")[0].strip()
+            return (
+                f"Thought: I should search for information about {topic}\n"
+                f"Action: {tool}\n"
+                f'Action Input: {{"search_query": "{topic}"}}'
+            )
+        return f"Thought: I now can give a great answer\nFinal Answer: {self.answer_text(prompt, topic)}"
+
+
+def watsonx_app(
+    latency: Latency,
+    faults: Faults,
+    payload: Dict[str, Any],
+    tokens_per_second: float = 60.0,
+    output_tokens: int = 200,
+    seed: int = 7,
+) -> FastAPI:
+    """watsonx /ml/v1/text/generation (plain and streamed) with ReAct-shaped canned answers"""
+    app = FastAPI(title="watsonx stand-in")
+    responder = Responder(payload, output_tokens, seed)
+    counters = Counters()
+
+    def generation(body: Dict[str, Any]):
+        prompt = str(body.get("input", ""))
+        params = body.get("parameters") or {}
+        text = responder.reply(prompt)
+        stop_reason = "eos_token"
+        for stop in params.get("stop_sequences") or []:
+            if stop and stop in text:
+                text, stop_reason = text[: text.index(stop)], "stop_sequence"
+        max_new_tokens = params.get("max_new_tokens")
+        if max_new_tokens is not None and estimate_tokens(text) > max_new_tokens:
+            text, stop_reason = text[: max_new_tokens * CHARS_PER_TOKEN], "max_tokens"
+        return prompt, text, stop_reason
+
+    def result(body: Dict[str, Any], text: str, input_tokens: int, output_tokens: int, stop_reason: str) -> Dict[str, Any]:
+        return {
+            "model_id": body.get("model_id"),
+            "model_version": "standin",
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "results": [{
+                "generated_text": text,
+                "generated_token_count": output_tokens,
+                "input_token_count": input_tokens,
+                "stop_reason": stop_reason,
+            }],
+        }
+
+    async def admit(endpoint: str) -> Optional[JSONResponse]:
+        counters.inc("requests")
+        counters.inc(f"requests_{endpoint}")
+        await asyncio.sleep(latency.sample())
+        status = faults.pick()
+        if status is None:
+            return None
+        counters.inc(f"faults_{status}")
+        return error_response(status, "Injected watsonx failure")
+
+    @app.post("/ml/v1/text/generation")
+    async def generate(request: Request):
+        body = await request.json()
+        failed = await admit("generation")
+        if failed is not None:
+            return failed
+        prompt, text, stop_reason = generation(body)
+        input_tokens, output_tokens = estimate_tokens(prompt), estimate_tokens(text)
+        await asyncio.sleep(output_tokens / tokens_per_second)
+        counters.inc("input_tokens", input_tokens)
+        counters.inc("output_tokens", output_tokens)
+        return result(body, text, input_tokens, output_tokens, stop_reason)
+
+    @app.post("/ml/v1/text/generation_stream")
+    async def generate_stream(request: Request):
+        body = await request.json()
+        failed = await admit("generation_stream")
+        if failed is not None:
+            return failed
+        prompt, text, stop_reason = generation(body)
+        input_tokens = estimate_tokens(prompt)
+        # Chunks of a few tokens, each carrying the running token count like watsonx does
+        pieces = re.findall(r"\S+\s*|\s+", text) or [""]
+        counters.inc("input_tokens", input_tokens)
+
+        async def events():
+            generated = 0
+            for index, piece in enumerate(pieces):
+                tokens = estimate_tokens(piece)
+                await asyncio.sleep(tokens / tokens_per_second)
+                generated += tokens
+                last = index == len(pieces) - 1
+                chunk = result(body, piece, input_tokens, generated, stop_reason if last else "not_finished")
+                yield f"id: {index + 1}\nevent: message\ndata: {json.dumps(chunk)}\n\n"
+            counters.inc("output_tokens", generated)
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    @app.post("/ml/v1/text/tokenization")
+    async def tokenize(request: Request):
+        body = await request.json()
+        counters.inc("requests_tokenization")
+        return {"model_id": body.get("model_id"), "result": {"token_count": estimate_tokens(str(body.get("input", "")))}}
+
+    @app.get("/stats")
+    async def stats():
+        return {
+            "service": "watsonx",
+            "latency": latency.spec,
+            "error_rate": faults.rate,
+            "tokens_per_second": tokens_per_second,
+            **counters.snapshot(),
+        }
+
+    return app
+
+
+def build_app(args: argparse.Namespace) -> FastAPI:
+    latency = Latency(args.latency, args.seed)
+    faults = Faults(args.error_rate, [int(status) for status in args.error_status.split(",") if status], args.seed)
+    payload = load_json(args.payload)
+    if args.service == "exa":
+        return exa_app(latency, faults, payload, text_chars=args.text_chars, seed=args.seed)
+    return watsonx_app(latency, faults, payload, args.tokens_per_second, args.output_tokens, seed=args.seed)
+
+
+def add_arguments(parser: argparse.ArgumentParser, service: str):
+    parser.add_argument("--latency", default="lognormal:0.3,0.4" if service == "exa" else "lognormal:0.4,0.4",
+                        help="response delay (watsonx: time to first token)")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of requests that fail")
+    parser.add_argument("--error-status", default="503" if service == "exa" else "429,503",
+                        help="comma-separated statuses injected failures use")
+    parser.add_argument("--payload", help="JSON file with canned results (exa) or answer rules (watsonx)")
+    parser.add_argument("--seed", type=int, default=7)
+    if service == "exa":
+        parser.add_argument("--text-chars", type=int, default=1500, help="length of synthetic result text")
+    else:
+        parser.add_argument("--tokens-per-second", type=float, default=60.0, help="generation rate after the first token")
+        parser.add_argument("--output-tokens", type=int, default=200, help="length of synthetic answers")
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local EXA and watsonx stand-ins for load tests")
+    services = parser.add_subparsers(dest="service", required=True)
+    for service in ("exa", "watsonx"):
+        sub = services.add_parser(service)
+        sub.add_argument("--host", default="127.0.0.1")
+        sub.add_argument("--port", type=int, default=8901 if service == "exa" else 8902)
+        add_arguments(sub, service)
+    args = parser.parse_args()
+    uvicorn.run(build_app(args), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
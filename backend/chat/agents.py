@@ -1,13 +1,39 @@
 from crewai import Agent
 from crewai_tools import SerperDevTool, WebsiteSearchTool
-from langchain_community.llms import WatsonxLLM
 from langchain.tools import BaseTool
 from config import ChatConfig
-import requests
+from exa_client import EXAClient, EXASearchError
+from search_cache import SearchCache
+from disk_cache import DiskSearchCache
+from llm_cache import CompletionCache
+from llm_registry import WatsonxClientRegistry
+from streaming import token_stream_handler
+from events import emit_event
+from tracing import span
 import json
 from typing import Optional, Type
 from pydantic import BaseModel, Field
 
+# Shared pooled EXA client (keep-alive connections reused across searches and threads).
+# Repeated searches are answered from the result cache without a network round trip.
+exa_client = EXAClient(
+    api_key=ChatConfig.EXA_API_KEY,
+    base_url=ChatConfig.EXA_BASE_URL,
+    timeout=ChatConfig.EXA_TIMEOUT,
+    max_connections=ChatConfig.EXA_MAX_CONNECTIONS,
+    max_keepalive_connections=ChatConfig.EXA_MAX_KEEPALIVE,
+    cache=SearchCache(
+        ttl=ChatConfig.SEARCH_CACHE_TTL,
+        max_bytes=ChatConfig.SEARCH_CACHE_MAX_BYTES,
+        max_entries=ChatConfig.SEARCH_CACHE_MAX_ENTRIES,
+        backing=DiskSearchCache(
+            ChatConfig.SEARCH_DISK_CACHE_PATH,
+            ttl=ChatConfig.SEARCH_DISK_CACHE_TTL,
+            max_bytes=ChatConfig.SEARCH_DISK_CACHE_MAX_BYTES
+        ) if ChatConfig.SEARCH_DISK_CACHE_PATH else None
+    )
+)
+
 # Custom EXA Search Tool
 class EXASearchInput(BaseModel):
     search_query: str = Field(description="The search query to find information about")
@@ -19,48 +45,61 @@ class CustomEXASearchTool(BaseTool):
     
     def _run(self, search_query: str) -> str:
         """Use EXA API to search for information"""
-        try:
-            headers = {
-                'accept': 'application/json',
-                'content-type': 'application/json',
-                'x-api-key': ChatConfig.EXA_API_KEY
-            }
-            
-            data = {
-                'query': search_query,
-                'numResults': 5,
-                'type': 'neural',
-                'contents': {
-                    'text': True
-                }
-            }
-            
-            response = requests.post('https://api.exa.ai/search', headers=headers, json=data)
-            
-            if response.status_code == 200:
-                result = response.json()
-                results = result.get('results', [])
-                
-                if not results:
-                    return f"No results found for query: {search_query}"
-                
-                formatted_results = []
-                for i, res in enumerate(results, 1):
-                    title = res.get('title', 'No title')
-                    url = res.get('url', 'No URL')
-                    text = res.get('text', 'No text available')[:500]  # Limit text length
-                    formatted_results.append(f"Result {i}:\nTitle: {title}\nURL: {url}\nContent: {text}...\n")
-                
-                return f"Search results for '{search_query}':\n\n" + "\n".join(formatted_results)
-            else:
-                return f"Search failed with status {response.status_code}: {response.text}"
-                
-        except Exception as e:
-            return f"Error during search: {str(e)}"
+        with span("tool", tool=self.name, input_chars=len(search_query)) as call:
+            self._report_start(search_query)
+            try:
+                results = exa_client.search(search_query, num_results=5)
+            except EXASearchError as e:
+                self._report_complete(error=e, call=call)
+                return str(e)
+            except Exception as e:
+                self._report_complete(error=e, call=call)
+                return f"Error during search: {str(e)}"
+            self._report_complete(results=results, call=call)
+            return self._format_results(search_query, results)
     
     async def _arun(self, search_query: str) -> str:
         """Async version of the search"""
-        return self._run(search_query)
+        with span("tool", tool=self.name, input_chars=len(search_query)) as call:
+            self._report_start(search_query)
+            try:
+                results = await exa_client.asearch(search_query, num_results=5)
+            except EXASearchError as e:
+                self._report_complete(error=e, call=call)
+                return str(e)
+            except Exception as e:
+                self._report_complete(error=e, call=call)
+                return f"Error during search: {str(e)}"
+            self._report_complete(results=results, call=call)
+            return self._format_results(search_query, results)
+    
+    def _report_start(self, search_query: str):
+        """Publish a tool_start event to the request's log channel"""
+        emit_event("tool_start", {"tool": self.name, "query": search_query}, f"Searching the web for: {search_query}", "EXA Search Tool")
+    
+    def _report_complete(self, results: Optional[list] = None, error: Optional[Exception] = None, call=None):
+        """Publish a tool_complete event to the request's log channel and annotate the trace span"""
+        if call is not None:
+            call.set(success=error is None, results=len(results or []), error=str(error) if error else None)
+        if error is not None:
+            emit_event("tool_complete", {"tool": self.name, "success": False, "error": str(error)}, "Web search failed", "EXA Search Tool")
+        else:
+            emit_event("tool_complete", {"tool": self.name, "success": True, "results": len(results)}, f"Web search returned {len(results)} results", "EXA Search Tool")
+    
+    @staticmethod
+    def _format_results(search_query: str, results: list) -> str:
+        """Render EXA results in the text format the agents and source extraction expect"""
+        if not results:
+            return f"No results found for query: {search_query}"
+        
+        formatted_results = []
+        for i, res in enumerate(results, 1):
+            title = res.get('title', 'No title')
+            url = res.get('url', 'No URL')
+            text = (res.get('text', 'No text available') or '')[:500]  # Limit text length
+            formatted_results.append(f"Result {i}:\nTitle: {title}\nURL: {url}\nContent: {text}...\n")
+        
+        return f"Search results for '{search_query}':\n\n" + "\n".join(formatted_results)
 
 # Initialize search tools - Custom EXA as primary
 try:
@@ -74,65 +113,91 @@ except Exception as e:
 available_tools = [exa_search_tool] if exa_search_tool else []
 print(f"📊 Available search tools: {len(available_tools)} (EXA only)")
 
+# Completions for repeated greedy prompts (e.g. context analysis) are served from here
+completion_cache = CompletionCache(
+    max_entries=ChatConfig.LLM_CACHE_MAX_ENTRIES,
+    max_bytes=ChatConfig.LLM_CACHE_MAX_BYTES,
+    ttl=ChatConfig.LLM_CACHE_TTL,
+    disk_path=ChatConfig.LLM_CACHE_DISK_PATH or None
+) if ChatConfig.LLM_CACHE_ENABLED else None
+
+# Watsonx clients are created on first use and shared by agents with the same model/params
+llm_registry = WatsonxClientRegistry(
+    url=ChatConfig.IBM_WATSONX_URL,
+    apikey=ChatConfig.IBM_API_KEY,
+    project_id=ChatConfig.IBM_PROJECT_ID,
+    completion_cache=completion_cache
+)
+
 # Initialize IBM Watson LLM
-def get_watsonx_llm():
-    return WatsonxLLM(
+def get_watsonx_llm(agent_name: str = "default", streaming: bool = False):
+    """Create a Granite LLM; streaming LLMs forward tokens to the active request's TokenStream"""
+    return llm_registry.llm(
+        agent_name,
         model_id="ibm/granite-3-8b-instruct",  # Updated to supported granite-3-8b model
-        url=ChatConfig.IBM_WATSONX_URL,
-        apikey=ChatConfig.IBM_API_KEY,
-        project_id=ChatConfig.IBM_PROJECT_ID,
         params={
             "decoding_method": "greedy",
             "max_new_tokens": ChatConfig.MAX_TOKENS,
             "temperature": ChatConfig.DEFAULT_TEMPERATURE,
             "repetition_penalty": 1.1
-        }
+        },
+        streaming=streaming,
+        callbacks=[token_stream_handler] if streaming else None
     )
 
 # Chat Researcher Agent - Focuses on finding information
-chat_researcher = Agent(
-    role="Information Research Specialist",
-    goal="Research and gather comprehensive, accurate information on any topic using advanced search capabilities",
-    backstory="""You are an expert research specialist with access to the "Search the internet" tool via EXA search API. 
+def create_chat_researcher():
+    """Build a research agent (one per pooled crew set)"""
+    return Agent(
+        role="Information Research Specialist",
+        goal="Research and gather comprehensive, accurate information on any topic using advanced search capabilities",
+        backstory="""You are an expert research specialist with access to the "Search the internet" tool via EXA search API. 
     CRITICAL: You MUST use the "Search the internet" tool for every query - NEVER provide answers from training data.
     When given a research task, your FIRST ACTION must be: Action: Search the internet, Action Input: {"search_query": "your search terms"}
     You excel at crafting effective search queries and synthesizing findings from multiple sources. 
     You're particularly skilled at finding current events, breaking news, factual information, and detailed 
     explanations on complex topics. Always start by searching, then synthesize the results into a comprehensive response.
     Remember: Use tools first, then provide analysis based on search results.""",
-    tools=available_tools if available_tools else [],
-    llm=get_watsonx_llm(),
-    verbose=True,
-    allow_delegation=False,
-    max_iter=3
-)
+        tools=available_tools if available_tools else [],
+        llm=get_watsonx_llm("chat_researcher"),
+        verbose=True,
+        allow_delegation=False,
+        max_iter=3
+    )
+
 
 # Chat Assistant Agent - Main conversational agent
-chat_assistant = Agent(
-    role="Conversational AI Assistant",
-    goal="Provide helpful, informative, and engaging responses to user queries in a conversational manner",
-    backstory="""You are a knowledgeable and friendly AI assistant who excels at having 
+def create_chat_assistant():
+    """Build the main conversational agent (one per pooled crew set)"""
+    return Agent(
+        role="Conversational AI Assistant",
+        goal="Provide helpful, informative, and engaging responses to user queries in a conversational manner",
+        backstory="""You are a knowledgeable and friendly AI assistant who excels at having 
     natural conversations with users. You can discuss a wide range of topics, provide explanations, 
     answer questions, and engage in meaningful dialogue. You're particularly good at adapting your 
     communication style to match the user's needs and maintaining context throughout conversations. 
     You always strive to be helpful, accurate, and engaging while being concise and clear.""",
-    llm=get_watsonx_llm(),
-    verbose=True,
-    allow_delegation=False,
-    max_iter=2
-)
+        llm=get_watsonx_llm("chat_assistant", streaming=True),  # Streams answer tokens to /chat/stream and the log WebSocket
+        verbose=True,
+        allow_delegation=False,
+        max_iter=2
+    )
+
 
 # Context Analyzer Agent - Analyzes conversation context
-context_analyzer = Agent(
-    role="Conversation Context Analyst",
-    goal="Analyze conversation context and determine the best approach for responding to user queries",
-    backstory="""You are a specialist in understanding conversation context, user intent, and 
+def create_context_analyzer():
+    """Build the context analysis agent (one per pooled crew set)"""
+    return Agent(
+        role="Conversation Context Analyst",
+        goal="Analyze conversation context and determine the best approach for responding to user queries",
+        backstory="""You are a specialist in understanding conversation context, user intent, and 
     dialogue flow. You excel at determining whether a user's query requires research, simple 
     conversation, or specific information. You can identify when searches are needed and what 
     type of information would be most helpful to the user. You help ensure responses are 
     contextually appropriate and useful.""",
-    llm=get_watsonx_llm(),
-    verbose=True,
-    allow_delegation=False,
-    max_iter=1
-) 
\ No newline at end of file
+        llm=get_watsonx_llm("context_analyzer"),
+        verbose=True,
+        allow_delegation=False,
+        max_iter=1
+    )
+ 
\ No newline at end of file
@@ -1,15 +1,120 @@
 from crewai import Crew, Process
-from agents import chat_researcher, chat_assistant, context_analyzer, exa_search_tool
+from agents import create_chat_researcher, create_chat_assistant, create_context_analyzer, exa_search_tool, exa_client
 from tasks import create_context_analysis_task, create_research_task, create_response_task, create_simple_chat_task
+from router import local_router
+from speculation import SpeculativeRunner
+from crew_pool import CrewPool
+from research_fanout import ResearchFanOut, parse_needs_research, parse_search_queries
+from search_cache import normalize_query
+from streaming import current_token_stream
+from events import emit_event, set_flow, agent_step_callback, task_complete_callback
+from metrics import registry, track_stage, record_error
+from tracing import agent_span, span, step_callback
+from config import ChatConfig
 from typing import Dict, Any, List, Optional
 import json
 import logging
+import time
 from datetime import datetime
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Names the log WebSocket shows for each agent role
+AGENT_NAMES = {
+    "Conversation Context Analyst": "Context Analyzer",
+    "Information Research Specialist": "Chat Researcher",
+    "Conversational AI Assistant": "Conversational AI Assistant"
+}
+SIMPLE_FLOW = ["Conversational AI Assistant"]
+RESEARCH_FLOW = ["EXA Search Tool", "Conversational AI Assistant"]
+
+# Which route each message took and what decided it (forced, local router source, or llm)
+routing_decisions = registry.counter("routing_decisions_total", "Chat routing decisions by route and deciding source", ["route", "source"])
+
+def routing_metadata(routing: Optional[Dict[str, Any]], needs_research: bool) -> Dict[str, Any]:
+    """
+    How a message's route was decided, as reported in the response metadata
+
+    `routing` is the local router's decision, None when the route was forced. `source`
+    is what decided: forced, the local router's source, or llm when the router was
+    unsure and the context analyzer decided; `local` keeps the router's own guess.
+    """
+    if routing is None:
+        return {"source": "forced", "needs_research": needs_research, "confidence": None, "llm_fallback": False, "local": None}
+    llm_fallback = not routing["confident"]
+    return {
+        "source": "llm" if llm_fallback else routing["source"],
+        "needs_research": needs_research,
+        "confidence": routing["confidence"],
+        "llm_fallback": llm_fallback,
+        "local": {
+            key: routing[key]
+            for key in ("source", "needs_research", "confidence", "probability", "matched_keywords", "latency_ms")
+        },
+    }
+
+class ChatCrewSet:
+    """
+    One private set of agents and crews, checked out from the crew pool per crew run
+    so concurrent requests never share task lists or agent state
+    """
+    
+    def __init__(self):
+        """Build the agents and the crews that use them"""
+        self.context_analyzer = create_context_analyzer()
+        self.chat_researcher = create_chat_researcher()
+        self.chat_assistant = create_chat_assistant()
+        
+        # Trace every agent step, then publish it and each finished task to the request's event channel
+        for agent in (self.context_analyzer, self.chat_researcher, self.chat_assistant):
+            agent.step_callback = step_callback(agent_step_callback(AGENT_NAMES[agent.role]))
+        on_task_complete = task_complete_callback(AGENT_NAMES)
+        
+        # Full crew with research capabilities
+        self.crew = Crew(
+            agents=[
+                self.context_analyzer,
+                self.chat_researcher,
+                self.chat_assistant
+            ],
+            tasks=[],  # Tasks will be added per request
+            process=Process.sequential,
+            verbose=True,
+            # No crew memory: crewai keeps it in one on-disk store shared by every pooled set,
+            # which races under concurrent runs and mixes users' conversations. Context comes
+            # from the conversation history passed to each task instead.
+            memory=False,
+            task_callback=on_task_complete
+        )
+        
+        # Simple crew for basic conversations
+        self.simple_crew = Crew(
+            agents=[self.chat_assistant],
+            tasks=[],  # Tasks will be added per request
+            process=Process.sequential,
+            verbose=True,
+            memory=False,  # See the research crew above
+            task_callback=on_task_complete
+        )
+        
+        # Lightweight crew for context analysis (previously rebuilt on every message)
+        self.analysis_crew = Crew(
+            agents=[self.context_analyzer],
+            tasks=[],
+            process=Process.sequential,
+            verbose=False,
+            memory=False,  # See the research crew above
+            task_callback=on_task_complete
+        )
+    
+    def reset(self):
+        """Drop the previous request's tasks before the set is reused"""
+        self.crew.tasks = []
+        self.simple_crew.tasks = []
+        self.analysis_crew.tasks = []
+
 class ChatCrew:
     """
     Main orchestrator for AI chat functionality using CrewAI
@@ -18,48 +123,32 @@ class ChatCrew:
     
     def __init__(self):
         """Initialize the chat crew"""
-        self.crew = None
-        self.simple_crew = None
+        self.pool = None
+        self.speculative_mode = ChatConfig.SPECULATIVE_MODE
+        self.speculation = SpeculativeRunner(ChatConfig.SPECULATIVE_WORKERS)
+        self.research = ResearchFanOut(
+            exa_client,
+            max_workers=ChatConfig.RESEARCH_FANOUT_WORKERS,
+            num_results=ChatConfig.RESEARCH_RESULTS_PER_QUERY,
+            max_results=ChatConfig.RESEARCH_MAX_RESULTS
+        )
         self._setup_crews()
     
     def _setup_crews(self):
-        """Set up the CrewAI crews for different chat scenarios"""
+        """Set up the pool of per-request crew sets"""
         try:
-            # Full crew with research capabilities
-            self.crew = Crew(
-                agents=[
-                    context_analyzer,
-                    chat_researcher,
-                    chat_assistant
-                ],
-                tasks=[],  # Tasks will be added dynamically
-                process=Process.sequential,
-                verbose=True,
-                memory=True,  # Enable memory for better context tracking
-                embedder={
-                    "provider": "openai",
-                    "config": {
-                        "model": "text-embedding-ada-002"
-                    }
-                }
-            )
-            
-            # Simple crew for basic conversations
-            self.simple_crew = Crew(
-                agents=[chat_assistant],
-                tasks=[],  # Tasks will be added dynamically
-                process=Process.sequential,
-                verbose=True,
-                memory=True,  # Enable memory for better context tracking
-                embedder={
-                    "provider": "openai",
-                    "config": {
-                        "model": "text-embedding-ada-002"
-                    }
-                }
+            # Every crew worker may run one crew at a time; in full speculative mode
+            # a request's muted simple-chat draft holds a second set alongside it
+            size = ChatConfig.CREW_POOL_SIZE or ChatConfig.CREW_WORKERS * (2 if self.speculative_mode == "full" else 1)
+            self.pool = CrewPool(
+                "chat",
+                ChatCrewSet,
+                size=size,
+                prebuild=ChatConfig.CREW_POOL_PREBUILD,
+                acquire_timeout=ChatConfig.CREW_QUEUE_TIMEOUT,
+                reset=ChatCrewSet.reset
             )
-            
-            logger.info("Chat crews initialized successfully")
+            logger.info(f"Chat crew pool initialized (size {size})")
         except Exception as e:
             logger.error(f"Error initializing crews: {str(e)}")
             raise
@@ -81,28 +170,86 @@ class ChatCrew:
             logger.info(f"Processing chat message: {user_message[:100]}...")
             
             if force_simple:
-                return self._simple_chat(user_message, conversation_history)
+                routing_decisions.inc("simple", "forced")
+                set_flow(SIMPLE_FLOW, "simple", source="forced")
+                result = self._simple_chat(user_message, conversation_history)
+                result["metadata"]["routing"] = routing_metadata(None, False)
+                return result
             
             # Force research if explicitly requested
             if force_research:
                 logger.info(f"FORCING RESEARCH MODE - User enabled think mode for: {user_message[:50]}...")
-                return self._chat_with_research(user_message, conversation_history, "Forced research mode via think mode")
-            
-            # First, analyze context to determine if research is needed
-            analysis_result = self._analyze_context(user_message, conversation_history)
-            
-            # Determine if research is needed based on analysis
-            needs_research = self._needs_research(analysis_result, user_message)
-            
+                routing_decisions.inc("research", "forced")
+                set_flow(RESEARCH_FLOW, "research", source="forced")
+                result = self._chat_with_research(user_message, conversation_history, "Forced research mode via think mode")
+                result["metadata"]["routing"] = routing_metadata(None, True)
+                return result
+            
+            # Route locally first; only pay for the LLM analyzer when the router is unsure
+            with track_stage("routing"):
+                routing = local_router.route(user_message, conversation_history)
+            if routing["confident"]:
+                needs_research = routing["needs_research"]
+                analysis_result = (
+                    f"Local router: {'research' if needs_research else 'simple chat'} "
+                    f"(confidence {routing['confidence']}, matched: {', '.join(routing['matched_keywords']) or 'none'})"
+                )
+                local_router.record(user_message, routing, needs_research)
+                branches = {}
+            else:
+                # Start the work either route may need while the analyzer decides
+                branches = self._start_speculation(user_message, conversation_history)
+                analysis_started = time.perf_counter()
+                analysis_result = self._analyze_context(user_message, conversation_history)
+                needs_research = self._needs_research(analysis_result, user_message)
+                local_router.record(user_message, routing, needs_research, (time.perf_counter() - analysis_started) * 1000)
+            
+            keep = "prefetch" if needs_research else "simple"
+            for name, branch in branches.items():
+                if name != keep:
+                    branch.discard()
+            kept = self._use_branch(branches.get(keep))
+            decision = routing_metadata(routing, needs_research)
+            routing_decisions.inc("research" if needs_research else "simple", decision["source"])
+            
+            set_flow(
+                (["Context Analyzer"] if decision["llm_fallback"] else []) + (RESEARCH_FLOW if needs_research else SIMPLE_FLOW),
+                "research" if needs_research else "simple",
+                source=decision["source"],
+                confidence=routing["confidence"]
+            )
             if needs_research:
-                logger.info(f"RESEARCH TRIGGERED - Keywords detected in: {user_message[:50]}...")
-                return self._chat_with_research(user_message, conversation_history, analysis_result)
+                logger.info(f"RESEARCH TRIGGERED - Routed via {decision['source']} for: {user_message[:50]}...")
+                result = self._chat_with_research(user_message, conversation_history, analysis_result, prefetched_results=kept, routing=routing)
+            elif kept is not None:
+                logger.info(f"SIMPLE CHAT - Using speculative answer for: {user_message[:50]}...")
+                emit_event(
+                    "agent_complete",
+                    {"agent": "Conversational AI Assistant", "speculative": True},
+                    "Using the answer drafted while the context was analyzed",
+                    "Conversational AI Assistant"
+                )
+                stream = current_token_stream.get()
+                if stream is not None:
+                    # The speculative draft ran muted; deliver it now that it has won
+                    stream.feed_answer(kept["response"])
+                result = kept
             else:
                 logger.info(f"SIMPLE CHAT - No research needed for: {user_message[:50]}...")
-                return self._simple_chat(user_message, conversation_history)
+                result = self._simple_chat(user_message, conversation_history)
+            
+            result["metadata"]["routing"] = decision
+            if branches:
+                result["metadata"]["speculation"] = {
+                    "mode": self.speculative_mode,
+                    "launched": sorted(branches),
+                    "used": keep if kept is not None else None,
+                }
+            return result
                 
         except Exception as e:
             logger.error(f"Error processing chat: {str(e)}")
+            record_error(e, "chat")
             return {
                 "success": False,
                 "error": str(e),
@@ -113,26 +260,45 @@ class ChatCrew:
                 }
             }
     
+    def _start_speculation(self, user_message: str, conversation_history: List[Dict] = None) -> Dict[str, Any]:
+        """Launch speculative branches according to SPECULATIVE_MODE"""
+        branches = {}
+        if self.speculative_mode in ("prefetch", "full") and exa_search_tool:
+            branches["prefetch"] = self.speculation.start(
+                "prefetch", exa_client.search, user_message.strip(), num_results=ChatConfig.RESEARCH_RESULTS_PER_QUERY
+            )
+        if self.speculative_mode == "full":
+            branches["simple"] = self.speculation.start(
+                "simple", self._simple_chat, user_message, conversation_history, mute_stream=True
+            )
+        return branches
+    
+    def _use_branch(self, branch) -> Optional[Any]:
+        """Result of a kept speculative branch, or None so the caller runs the step itself"""
+        if branch is None:
+            return None
+        try:
+            return branch.use()
+        except Exception as e:
+            logger.warning(f"Speculative {branch.name} branch failed, running it inline: {e}")
+            return None
+    
     def _analyze_context(self, user_message: str, conversation_history: List[Dict] = None) -> str:
         """Analyze the context to determine response strategy"""
         try:
-            analysis_task = create_context_analysis_task(user_message, conversation_history)
-            
-            # Create temporary crew for analysis
-            analysis_crew = Crew(
-                agents=[context_analyzer],
-                tasks=[analysis_task],
-                process=Process.sequential,
-                verbose=False,
-                embedder={
-                    "provider": "openai",
-                    "config": {
-                        "model": "text-embedding-ada-002"
-                    }
-                }
+            emit_event(
+                "agent_start",
+                {"agent": "Context Analyzer"},
+                "Analyzing the message to decide whether it needs a web search",
+                "Context Analyzer",
+                0
             )
-            
-            result = analysis_crew.kickoff()
+            with track_stage("context_analysis"), self.pool.acquire() as crews:
+                crews.analysis_crew.tasks = [
+                    create_context_analysis_task(crews.context_analyzer, user_message, conversation_history)
+                ]
+                with agent_span(crews.context_analyzer.role):
+                    result = crews.analysis_crew.kickoff()
             return str(result)
             
         except Exception as e:
@@ -141,21 +307,13 @@ class ChatCrew:
     
     def _needs_research(self, analysis_result: str, user_message: str) -> bool:
         """Determine if the query needs research based on analysis and keywords"""
-        research_keywords = [
-            "latest", "current", "recent", "today", "news", "update", "what's happening",
-            "when did", "current price", "stock price", "weather", "score", "results",
-            "search", "find", "look up", "what is", "who is", "where is", "how is",
-            "trending", "breaking", "live", "now", "2024", "2025", "this year"
-        ]
-        
-        # Check if analysis explicitly mentions research need
-        analysis_lower = analysis_result.lower()
-        if "research is needed: yes" in analysis_lower or "requires research" in analysis_lower:
-            return True
+        # The analyzer's needs_research field decides when it gave one
+        decision = parse_needs_research(analysis_result)
+        if decision is not None:
+            return decision
         
-        # Check for research keywords in user message
-        message_lower = user_message.lower()
-        if any(keyword in message_lower for keyword in research_keywords):
+        # Analysis unavailable or unparseable: fall back to the research keywords
+        if local_router.keywords.findall(user_message):
             return True
         
         # Default to simple chat for most queries
@@ -166,10 +324,18 @@ class ChatCrew:
         try:
             logger.info("Processing as simple chat")
             
-            simple_task = create_simple_chat_task(user_message, conversation_history)
-            self.simple_crew.tasks = [simple_task]
-            
-            result = self.simple_crew.kickoff()
+            emit_event(
+                "agent_start",
+                {"agent": "Conversational AI Assistant"},
+                "Generating a conversational response",
+                "Conversational AI Assistant"
+            )
+            with track_stage("response_generation"), self.pool.acquire() as crews:
+                simple_task = create_simple_chat_task(crews.chat_assistant, user_message, conversation_history)
+                crews.simple_crew.tasks = [simple_task]
+                
+                with agent_span(crews.chat_assistant.role):
+                    result = crews.simple_crew.kickoff()
             
             return {
                 "success": True,
@@ -195,26 +361,60 @@ class ChatCrew:
             logger.error(f"Error in simple chat: {str(e)}")
             raise
     
-    def _chat_with_research(self, user_message: str, conversation_history: List[Dict] = None, analysis_result: str = None) -> Dict[str, Any]:
-        """Handle chat with research capabilities - FORCES EXA SEARCH"""
+    def _chat_with_research(self, user_message: str, conversation_history: List[Dict] = None, analysis_result: str = None, prefetched_results: Optional[List[Dict[str, Any]]] = None, routing: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Handle chat with research capabilities - FORCES EXA SEARCH
+        
+        `routing` is the local router's decision; None means research was forced.
+        The LLM context analyzer only ran when that decision was not confident.
+        """
         try:
             logger.info("Processing chat with research - FORCING EXA SEARCH")
             
             # FORCE EXA SEARCH FIRST - This bypasses the agent tool-calling issue
             search_query = user_message.strip()  # Use the message directly as search query
-            logger.info(f"Executing forced EXA search for: {search_query}")
+            # Fan out to the analyzer's proposed queries alongside the raw message
+            search_queries = [search_query]
+            for query in parse_search_queries(analysis_result or "", ChatConfig.RESEARCH_FANOUT_QUERIES):
+                if normalize_query(query) not in {normalize_query(q) for q in search_queries}:
+                    search_queries.append(query)
+            logger.info(f"Executing forced EXA search for: {search_queries}")
             
             search_results = "No search results available"
             search_success = False
+            fanout = None
             
             if exa_search_tool:
+                emit_event(
+                    "tool_start",
+                    {"tool": "EXA Search Tool", "queries": search_queries, "prefetched": prefetched_results is not None},
+                    f"Searching the web for {len(search_queries)} queries",
+                    "EXA Search Tool"
+                )
                 try:
-                    search_results = exa_search_tool._run(search_query)
-                    search_success = True
+                    prefetched = {search_query: prefetched_results} if prefetched_results is not None else None
+                    with track_stage("exa_search"), span("exa.fanout", queries=len(search_queries)) as traced:
+                        fanout = self.research.run(search_queries, prefetched=prefetched)
+                        if traced is not None:
+                            traced.set(results=len(fanout["results"]), all_failed=fanout["all_failed"])
+                    search_results = exa_search_tool._format_results(" | ".join(search_queries), fanout["results"])
+                    search_success = not fanout["all_failed"]
                     logger.info(f"EXA search completed - {len(search_results)} characters returned")
+                    emit_event(
+                        "tool_complete",
+                        {
+                            "tool": "EXA Search Tool",
+                            "success": search_success,
+                            "results": len(fanout["results"]),
+                            "wall_ms": fanout["wall_ms"]
+                        },
+                        f"Web search returned {len(fanout['results'])} results in {fanout['wall_ms']:.0f} ms",
+                        "EXA Search Tool"
+                    )
                 except Exception as e:
                     logger.error(f"EXA search failed: {e}")
                     search_results = f"Search error: {str(e)}"
+                    emit_event("tool_complete", {"tool": "EXA Search Tool", "success": False, "error": str(e)}, "Web search failed", "EXA Search Tool")
             
             # Extract sources from search results
             sources = self._extract_sources_from_search_results(search_results)
@@ -253,13 +453,28 @@ class ChatCrew:
             """
             
             # Create response task with search results embedded
-            response_task = create_response_task(enhanced_message, requires_search=True)
-            
-            # Update crew with single task (no need for research task since we already have results)
-            self.crew.tasks = [response_task]
+            emit_event(
+                "agent_start",
+                {"agent": "Conversational AI Assistant", "sources": len(sources)},
+                "Synthesizing a response from the search results",
+                "Conversational AI Assistant"
+            )
+            with track_stage("response_generation"), self.pool.acquire() as crews:
+                response_task = create_response_task(crews.chat_assistant, enhanced_message, requires_search=True)
+                
+                # Single task on this request's own crew (no need for research task since we already have results)
+                crews.crew.tasks = [response_task]
+                
+                # Execute the crew
+                with agent_span(crews.chat_assistant.role, sources=len(sources)):
+                    result = crews.crew.kickoff()
             
-            # Execute the crew
-            result = self.crew.kickoff()
+            # Report the steps that actually ran: the analyzer only runs when the router was unsure
+            analyzed = routing is not None and not routing["confident"]
+            steps = ([("Context Analyzer", "Query analysis and context determination", "completed")] if analyzed else []) + [
+                ("EXA Search Tool", "Real-time information retrieval", "completed" if search_success else "failed"),
+                ("Conversational AI Assistant", "Research synthesis and response generation", "completed"),
+            ]
             
             return {
                 "success": True,
@@ -270,30 +485,17 @@ class ChatCrew:
                     "research_used": True,
                     "exa_search_used": search_success,
                     "search_query": search_query,
+                    "search_queries": fanout["queries"] if fanout else [],
+                    "search_wall_ms": fanout["wall_ms"] if fanout else None,
                     "search_results_length": len(search_results),
                     "search_timestamp": datetime.now().isoformat(),
-                    "agents_used": ["Context Analyzer", "EXA Search Tool", "Conversational AI Assistant"],
+                    "sources": sources,
+                    "agents_used": [agent for agent, _, _ in steps],
                     "agent_hierarchy": [
-                        {
-                            "agent": "Context Analyzer",
-                            "role": "Query analysis and context determination",
-                            "order": 1,
-                            "status": "completed"
-                        },
-                        {
-                            "agent": "EXA Search Tool",
-                            "role": "Real-time information retrieval",
-                            "order": 2,
-                            "status": "completed" if search_success else "failed"
-                        },
-                        {
-                            "agent": "Conversational AI Assistant",
-                            "role": "Research synthesis and response generation",
-                            "order": 3,
-                            "status": "completed"
-                        }
+                        {"agent": agent, "role": role, "order": order, "status": status}
+                        for order, (agent, role, status) in enumerate(steps, 1)
                     ],
-                    "execution_flow": "Research chat flow: User input → Context Analyzer → EXA Search → Conversational AI Assistant → Response",
+                    "execution_flow": "Research chat flow: User input → " + " → ".join(agent for agent, _, _ in steps) + " → Response",
                     "analysis": analysis_result
                 }
             }
@@ -360,7 +562,7 @@ class ChatCrew:
                 "Conversation history awareness"
             ],
             "search_tools": ["EXA Search", "SERPER", "Website Search"],
-            "features": ["Memory enabled", "Sequential processing", "Dynamic task creation"]
+            "features": ["Conversation history context", "Sequential processing", "Dynamic task creation"]
         }
 
 # Create a singleton instance
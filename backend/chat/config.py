@@ -1,20 +1,74 @@
 import os
+import tempfile
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
+def data_path(name: str) -> str:
+    """`name` inside DATA_DIR, or an empty string (disabled) when DATA_DIR is unset"""
+    data_dir = os.getenv("DATA_DIR", "")
+    return os.path.join(data_dir, name) if data_dir else ""
+
 class ChatConfig:
+    # Runtime state - set DATA_DIR to a mounted volume to keep caches, history, traces and
+    # profiles on disk. Unset, nothing is written to the working directory; each path below
+    # can also be set on its own.
+    DATA_DIR = os.getenv("DATA_DIR", "")
+    
     # IBM Watson Configuration
     IBM_API_KEY = os.getenv("IBM_API_KEY")
     IBM_WATSONX_URL = os.getenv("IBM_WATSONX_URL")
     IBM_PROJECT_ID = os.getenv("IBM_PROJECT_ID")
     
     # CrewAI Configuration  
-    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # Required for embeddings
+    OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # Only for embeddings if crew memory is enabled
     EXA_API_KEY = os.getenv("EXA_API_KEY")
     SERPER_API_KEY = os.getenv("SERPER_API_KEY")
     
+    # EXA HTTP client
+    EXA_BASE_URL = os.getenv("EXA_BASE_URL", "https://api.exa.ai")
+    EXA_TIMEOUT = float(os.getenv("EXA_TIMEOUT", "15"))
+    EXA_MAX_CONNECTIONS = int(os.getenv("EXA_MAX_CONNECTIONS", "20"))
+    EXA_MAX_KEEPALIVE = int(os.getenv("EXA_MAX_KEEPALIVE", "10"))
+    
+    # EXA search result cache (in-process TTL + LRU)
+    SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+    SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2048"))
+    # Persistent tier under the memory cache; point it at a mounted volume to survive redeploys.
+    # Defaults to DATA_DIR/search_cache.db; empty (the default without DATA_DIR) disables it.
+    SEARCH_DISK_CACHE_PATH = os.getenv("SEARCH_DISK_CACHE_PATH", data_path("search_cache.db"))
+    SEARCH_DISK_CACHE_TTL = float(os.getenv("SEARCH_DISK_CACHE_TTL", str(7 * 24 * 3600)))
+    SEARCH_DISK_CACHE_MAX_BYTES = int(os.getenv("SEARCH_DISK_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+    
+    # Completion cache for greedy watsonx calls (LLM_CACHE_DISK_PATH enables the SQLite tier)
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "True").lower() == "true"
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+    LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+    LLM_CACHE_DISK_PATH = os.getenv("LLM_CACHE_DISK_PATH", "")
+    
+    # Local router - the LLM context analyzer only runs below this confidence
+    ROUTER_CONFIDENCE_THRESHOLD = float(os.getenv("ROUTER_CONFIDENCE_THRESHOLD", "0.6"))
+    ROUTER_LOG_PATH = os.getenv("ROUTER_LOG_PATH", "")  # JSONL decision log, empty to disable
+    
+    # Speculative execution while the LLM analyzer decides the route:
+    # "off", "prefetch" (EXA search for the raw message) or "full" (also draft the simple answer)
+    SPECULATIVE_MODE = os.getenv("SPECULATIVE_MODE", "prefetch").lower()
+    SPECULATIVE_WORKERS = int(os.getenv("SPECULATIVE_WORKERS", "4"))
+    
+    # Research fan-out - the raw message plus up to N analyzer queries are searched concurrently
+    RESEARCH_FANOUT_QUERIES = int(os.getenv("RESEARCH_FANOUT_QUERIES", "3"))
+    RESEARCH_FANOUT_WORKERS = int(os.getenv("RESEARCH_FANOUT_WORKERS", "8"))
+    RESEARCH_RESULTS_PER_QUERY = int(os.getenv("RESEARCH_RESULTS_PER_QUERY", "5"))
+    RESEARCH_MAX_RESULTS = int(os.getenv("RESEARCH_MAX_RESULTS", "10"))
+    
+    # Startup - LAZY_STARTUP binds the port first and warms crews in the background;
+    # WARMUP_CONNECT also authenticates with watsonx before reporting ready
+    LAZY_STARTUP = os.getenv("LAZY_STARTUP", "True").lower() == "true"
+    WARMUP_CONNECT = os.getenv("WARMUP_CONNECT", "True").lower() == "true"
+    
     # Application Settings
     DEBUG = os.getenv("DEBUG", "False").lower() == "true"
     HOST = os.getenv("HOST", "0.0.0.0")
@@ -25,6 +79,67 @@ class ChatConfig:
     MAX_CONVERSATION_HISTORY = int(os.getenv("MAX_CONVERSATION_HISTORY", "10"))
     DEFAULT_TEMPERATURE = float(os.getenv("DEFAULT_TEMPERATURE", "0.7"))
     MAX_TOKENS = int(os.getenv("MAX_TOKENS", "2000"))
+    # Input + output tokens one request may spend across all its watsonx calls; 0 is unlimited.
+    # Near the limit max_new_tokens is lowered, then further calls return the partial answer.
+    TOKEN_BUDGET = int(os.getenv("TOKEN_BUDGET", "0"))
+    
+    # Conversation store - idle conversations expire after CONVERSATION_TTL seconds and the
+    # least recently used are evicted once all history exceeds CONVERSATION_MAX_BYTES
+    CONVERSATION_TTL = float(os.getenv("CONVERSATION_TTL", str(6 * 3600)))
+    CONVERSATION_MAX_BYTES = int(os.getenv("CONVERSATION_MAX_BYTES", str(64 * 1024 * 1024)))
+    CONVERSATION_MAX_COUNT = int(os.getenv("CONVERSATION_MAX_COUNT", "10000"))
+    CONVERSATION_SWEEP_INTERVAL = float(os.getenv("CONVERSATION_SWEEP_INTERVAL", "60"))
+    # Turns older than the newest CONVERSATION_HOT_TURNS are zlib-compressed in memory
+    CONVERSATION_HOT_TURNS = int(os.getenv("CONVERSATION_HOT_TURNS", "3"))
+    CONVERSATION_COMPRESS = os.getenv("CONVERSATION_COMPRESS", "True").lower() == "true"
+    CONVERSATION_PAGE_MAX = int(os.getenv("CONVERSATION_PAGE_MAX", "500"))  # Largest /conversations page
+    # Durable history: write-ahead log + snapshots in this directory (one process per directory).
+    # Turns are fsynced in groups every CONVERSATION_LOG_COMMIT_INTERVAL seconds. Defaults to
+    # DATA_DIR/conversation_log; empty (the default without DATA_DIR) keeps history in memory only.
+    CONVERSATION_LOG_DIR = os.getenv("CONVERSATION_LOG_DIR", data_path("conversation_log"))
+    CONVERSATION_LOG_COMMIT_INTERVAL = float(os.getenv("CONVERSATION_LOG_COMMIT_INTERVAL", "0.05"))
+    CONVERSATION_LOG_MAX_BATCH = int(os.getenv("CONVERSATION_LOG_MAX_BATCH", "512"))
+    CONVERSATION_SNAPSHOT_EVERY = int(os.getenv("CONVERSATION_SNAPSHOT_EVERY", "5000"))
+    
+    # Log WebSocket fan-out - each subscriber gets a bounded buffer; on overflow "drop" discards
+    # the oldest events, "coalesce" first merges consecutive answer chunks
+    # Batching and heartbeats apply only to sockets opened with ?batch=1
+    EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+    EVENT_OVERFLOW_POLICY = os.getenv("EVENT_OVERFLOW_POLICY", "coalesce").lower()
+    EVENT_BATCH_INTERVAL = float(os.getenv("EVENT_BATCH_INTERVAL", "0.05"))
+    EVENT_BATCH_MAX = int(os.getenv("EVENT_BATCH_MAX", "50"))
+    EVENT_HEARTBEAT_INTERVAL = float(os.getenv("EVENT_HEARTBEAT_INTERVAL", "15"))
+    EVENT_IDLE_TIMEOUT = float(os.getenv("EVENT_IDLE_TIMEOUT", "600"))
+    EVENT_SEND_TIMEOUT = float(os.getenv("EVENT_SEND_TIMEOUT", "5"))
+    
+    # Tracing - one JSONL line per kept request trace in TRACE_DIR (defaults to DATA_DIR/traces;
+    # empty disables); a fraction TRACE_SAMPLE_RATE is kept up front, slower or failed requests
+    # are always kept
+    TRACE_DIR = os.getenv("TRACE_DIR", data_path("traces"))
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+    TRACE_SLOW_SECONDS = float(os.getenv("TRACE_SLOW_SECONDS", "10"))
+    TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "2000"))
+    TRACE_EXPORT_QUEUE = int(os.getenv("TRACE_EXPORT_QUEUE", "1000"))
+    
+    # Profiling - requests presenting PROFILE_TOKEN (X-Profile-Token header or ?profile=) run under
+    # a stack sampler and leave collapsed-stack profiles in PROFILE_DIR; the /heap endpoints take
+    # tracemalloc snapshots. Both are disabled while PROFILE_TOKEN is empty.
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+    # Profiles go to DATA_DIR/profiles, or the system temp directory without DATA_DIR
+    PROFILE_DIR = os.getenv("PROFILE_DIR", data_path("profiles") or os.path.join(tempfile.gettempdir(), "chat-profiles"))
+    PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+    PROFILE_MAX_SECONDS = float(os.getenv("PROFILE_MAX_SECONDS", "300"))
+    PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "100"))
+    HEAP_TRACE_FRAMES = int(os.getenv("HEAP_TRACE_FRAMES", "10"))
+    HEAP_MAX_SNAPSHOTS = int(os.getenv("HEAP_MAX_SNAPSHOTS", "4"))
+    
+    # Crew execution pool - bounds concurrent crew runs per worker process
+    CREW_WORKERS = int(os.getenv("CREW_WORKERS", "4"))
+    CREW_QUEUE_SIZE = int(os.getenv("CREW_QUEUE_SIZE", "16"))
+    CREW_QUEUE_TIMEOUT = float(os.getenv("CREW_QUEUE_TIMEOUT", "60"))
+    # Pooled per-request crew sets; 0 sizes the pool to CREW_WORKERS (doubled in full speculative mode)
+    CREW_POOL_SIZE = int(os.getenv("CREW_POOL_SIZE", "0"))
+    CREW_POOL_PREBUILD = int(os.getenv("CREW_POOL_PREBUILD", "1"))
     
     @classmethod
     def validate_config(cls):
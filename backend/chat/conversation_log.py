@@ -0,0 +1,337 @@
+"""
+Durable conversation history: an append-only write-ahead log plus snapshots.
+
+The conversation store stays the source of truth for reads. Every change it makes
+(appended turn, deleted/evicted/expired conversation) is handed to this log as a
+numbered record without blocking the request. A writer thread collects records for
+up to `commit_interval` seconds and commits the batch with a single write + fsync
+(group commit), so the request path never waits on the disk.
+
+Every `snapshot_every` records the writer rotates to a new log segment, writes the
+store's current state to `snapshot.json` atomically and deletes the segments the
+snapshot covers. On startup the snapshot is loaded and only the records after it are
+replayed; a torn final line from a crash is ignored.
+
+Layout of `directory`:
+
+    snapshot.json               {"seq": N, "conversations": [[id, [turn, ...]], ...]}
+    wal-000000000007.jsonl      {"seq": 123, "op": "append", "id": ..., "turn": {...}}
+
+Segments are numbered in the order they were created.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from config import ChatConfig
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+SNAPSHOT_FILE = "snapshot.json"
+SEGMENT_PREFIX = "wal-"
+SEGMENT_SUFFIX = ".jsonl"
+
+_CLOSE = object()
+
+
+def _fsync_directory(directory: str):
+    """Make renames and new files durable (not supported on every platform)"""
+    try:
+        fd = os.open(directory, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class ConversationLog:
+    """Write-ahead log with group commit and snapshots for a ConversationStore"""
+
+    def __init__(
+        self,
+        directory: str,
+        commit_interval: float = 0.05,
+        max_batch: int = 512,
+        snapshot_every: int = 5000,
+    ):
+        self.directory = directory
+        self.commit_interval = commit_interval
+        self.max_batch = max(1, max_batch)
+        self.snapshot_every = snapshot_every
+        self.store: Any = None
+
+        self._queue: "queue.Queue[Any]" = queue.Queue()
+        self._lock = threading.Lock()
+        self._seq = 0
+        self._segment: Any = None
+        self._segment_path: Optional[str] = None
+        self._writer: Optional[threading.Thread] = None
+        self._records_since_snapshot = 0
+
+        self._records = 0
+        self._batches = 0
+        self._bytes_written = 0
+        self._fsync_seconds = 0.0
+        self._max_fsync_seconds = 0.0
+        self._write_errors = 0
+        self._snapshots = 0
+        self._last_snapshot_seconds: Optional[float] = None
+        self._replay: Dict[str, Any] = {}
+
+    # --- request path -------------------------------------------------------
+
+    def record(self, op: str, conversation_id: str, turn: Optional[Dict[str, Any]] = None) -> int:
+        """
+        Queue a change for the next group commit and return its sequence number
+
+        The store calls this while holding its own lock, so sequence numbers follow the
+        order in which changes were applied in memory.
+        """
+        with self._lock:
+            self._seq += 1
+            seq = self._seq
+        entry = {"seq": seq, "op": op, "id": conversation_id}
+        if turn is not None:
+            entry["turn"] = turn
+        self._queue.put(entry)
+        return seq
+
+    @property
+    def last_seq(self) -> int:
+        return self._seq
+
+    # --- startup --------------------------------------------------------------
+
+    def open(self, store: Any):
+        """Replay snapshot + log into `store`, then journal its changes from now on"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._replay_into(store)
+        self._open_segment()
+        self.store = store
+        store.journal = self
+        self._writer = threading.Thread(target=self._write_loop, name="conversation-log", daemon=True)
+        self._writer.start()
+
+    def _segments(self) -> List[Tuple[int, str]]:
+        segments = []
+        for name in os.listdir(self.directory):
+            if name.startswith(SEGMENT_PREFIX) and name.endswith(SEGMENT_SUFFIX):
+                try:
+                    number = int(name[len(SEGMENT_PREFIX):-len(SEGMENT_SUFFIX)])
+                except ValueError:
+                    continue
+                segments.append((number, os.path.join(self.directory, name)))
+        return sorted(segments)
+
+    def _replay_into(self, store: Any):
+        started = time.perf_counter()
+        snapshot_seq = 0
+        conversations = 0
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        if os.path.exists(snapshot_path):
+            with open(snapshot_path, "r", encoding="utf-8") as f:
+                snapshot = json.load(f)
+            snapshot_seq = snapshot.get("seq", 0)
+            for conversation_id, turns in snapshot.get("conversations", []):
+                for turn in turns:
+                    store.append(conversation_id, turn)
+                conversations += 1
+
+        applied = 0
+        skipped = 0
+        torn = 0
+        last_seq = snapshot_seq
+        for _, path in self._segments():
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        # A crash mid-write leaves at most a partial last line per segment
+                        torn += 1
+                        continue
+                    seq = entry.get("seq", 0)
+                    if seq <= snapshot_seq:
+                        skipped += 1
+                        continue
+                    if entry.get("op") == "append":
+                        store.append(entry["id"], entry["turn"])
+                    elif entry.get("op") == "delete":
+                        store.delete(entry["id"])
+                    applied += 1
+                    last_seq = max(last_seq, seq)
+
+        self._seq = last_seq
+        self._records_since_snapshot = applied
+        self._replay = {
+            "snapshot_seq": snapshot_seq,
+            "snapshot_conversations": conversations,
+            "records_applied": applied,
+            "records_skipped": skipped,
+            "torn_lines": torn,
+            "seconds": round(time.perf_counter() - started, 4),
+        }
+        logger.info(
+            f"Replayed conversation log in {self._replay['seconds']:.3f}s: snapshot of {conversations} "
+            f"conversations at seq {snapshot_seq}, {applied} records applied, {torn} torn lines ignored"
+        )
+
+    def _open_segment(self):
+        """Start a fresh segment; never append after a possibly torn tail"""
+        if self._segment is not None:
+            self._segment.close()
+        segments = self._segments()
+        number = segments[-1][0] + 1 if segments else 1
+        self._segment_path = os.path.join(self.directory, f"{SEGMENT_PREFIX}{number:012d}{SEGMENT_SUFFIX}")
+        self._segment = open(self._segment_path, "a", encoding="utf-8")
+        _fsync_directory(self.directory)
+
+    # --- writer thread --------------------------------------------------------
+
+    def _next_batch(self) -> Tuple[List[Dict[str, Any]], bool]:
+        """Block for one record, then gather more until the commit interval or batch cap"""
+        first = self._queue.get()
+        if first is _CLOSE:
+            return [], True
+        batch = [first]
+        closing = False
+        deadline = time.monotonic() + self.commit_interval
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            try:
+                entry = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is _CLOSE:
+                closing = True
+                break
+            batch.append(entry)
+        return batch, closing
+
+    def _commit(self, batch: List[Dict[str, Any]]):
+        data = "".join(json.dumps(entry, ensure_ascii=False, default=str) + "\n" for entry in batch)
+        self._segment.write(data)
+        self._segment.flush()
+        started = time.perf_counter()
+        os.fsync(self._segment.fileno())
+        fsync_seconds = time.perf_counter() - started
+        with self._lock:
+            self._records += len(batch)
+            self._batches += 1
+            self._bytes_written += len(data.encode("utf-8"))
+            self._fsync_seconds += fsync_seconds
+            self._max_fsync_seconds = max(self._max_fsync_seconds, fsync_seconds)
+        self._records_since_snapshot += len(batch)
+
+    def _write_loop(self):
+        while True:
+            batch, closing = self._next_batch()
+            if batch:
+                try:
+                    self._commit(batch)
+                except Exception as e:
+                    with self._lock:
+                        self._write_errors += 1
+                    logger.error(f"Conversation log commit of {len(batch)} records failed: {e}")
+                if self.snapshot_every > 0 and self._records_since_snapshot >= self.snapshot_every:
+                    try:
+                        self.snapshot()
+                    except Exception as e:
+                        logger.error(f"Conversation snapshot failed: {e}")
+            if closing:
+                return
+
+    def snapshot(self):
+        """
+        Write the store's state atomically and drop the log segments it covers
+
+        Runs on the writer thread (or after it has stopped), so every record queued
+        before the rotation is already on disk in an older segment.
+        """
+        started = time.perf_counter()
+        old_segments = self._segments()
+        seq, conversations = self.store.export()
+        self._open_segment()
+
+        snapshot_path = os.path.join(self.directory, SNAPSHOT_FILE)
+        tmp_path = snapshot_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"seq": seq, "conversations": conversations}, f, ensure_ascii=False, default=str)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, snapshot_path)
+        _fsync_directory(self.directory)
+
+        # Older segments only hold records <= seq: the snapshot already contains them
+        for _, path in old_segments:
+            if path != self._segment_path:
+                os.remove(path)
+        self._records_since_snapshot = 0
+        self._last_snapshot_seconds = time.perf_counter() - started
+        with self._lock:
+            self._snapshots += 1
+        logger.info(
+            f"Wrote conversation snapshot of {len(conversations)} conversations at seq {seq} "
+            f"in {self._last_snapshot_seconds:.3f}s"
+        )
+
+    def close(self, snapshot: bool = True):
+        """Flush pending records and optionally snapshot so the next startup replays nothing"""
+        if self._writer is None:
+            return
+        self._queue.put(_CLOSE)
+        self._writer.join(timeout=30)
+        self._writer = None
+        if snapshot:
+            try:
+                self.snapshot()
+            except Exception as e:
+                logger.error(f"Conversation snapshot on shutdown failed: {e}")
+        if self.store is not None:
+            self.store.journal = None
+        if self._segment is not None:
+            self._segment.close()
+            self._segment = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "enabled": True,
+                "directory": self.directory,
+                "last_seq": self._seq,
+                "queue_depth": self._queue.qsize(),
+                "records": self._records,
+                "batches": self._batches,
+                "avg_batch_size": round(self._records / self._batches, 2) if self._batches else 0.0,
+                "bytes_written": self._bytes_written,
+                "avg_fsync_ms": round(self._fsync_seconds / self._batches * 1000, 3) if self._batches else 0.0,
+                "max_fsync_ms": round(self._max_fsync_seconds * 1000, 3),
+                "write_errors": self._write_errors,
+                "records_since_snapshot": self._records_since_snapshot,
+                "snapshots": self._snapshots,
+                "last_snapshot_seconds": (
+                    round(self._last_snapshot_seconds, 4) if self._last_snapshot_seconds is not None else None
+                ),
+                "segments": len(self._segments()),
+                "replay": self._replay,
+            }
+
+
+# Create a singleton instance (None when persistence is disabled)
+conversation_log = ConversationLog(
+    directory=ChatConfig.CONVERSATION_LOG_DIR,
+    commit_interval=ChatConfig.CONVERSATION_LOG_COMMIT_INTERVAL,
+    max_batch=ChatConfig.CONVERSATION_LOG_MAX_BATCH,
+    snapshot_every=ChatConfig.CONVERSATION_SNAPSHOT_EVERY
+) if ChatConfig.CONVERSATION_LOG_DIR else None
@@ -0,0 +1,475 @@
+import bisect
+import json
+import logging
+import threading
+import time
+import zlib
+from collections import OrderedDict, deque
+from datetime import datetime, timedelta
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from config import ChatConfig
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+# Metadata fields that repeat verbatim across turns of the same kind (the agent
+# hierarchy, flow description, ...); each distinct combination is stored once
+TEMPLATE_KEYS = ("response_type", "research_used", "agents_used", "agent_hierarchy", "execution_flow")
+MAX_TEMPLATES = 256
+
+# Rough per-turn cost of the Turn object and its fields, for byte accounting
+TURN_OVERHEAD = 200
+
+_EPOCH = datetime(1970, 1, 1)
+
+
+# Rebuild the last_updated index once stale entries outnumber live ones by this much
+INDEX_COMPACT_SLACK = 1024
+
+
+def _micros(moment: datetime) -> int:
+    delta = moment - _EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _pack_timestamp(value: Any) -> Any:
+    """Naive ISO timestamps become integer microseconds; anything else is kept as is"""
+    if isinstance(value, str):
+        try:
+            parsed = datetime.fromisoformat(value)
+        except ValueError:
+            return value
+        if parsed.tzinfo is None and parsed.isoformat() == value:
+            return _micros(parsed)
+    return value
+
+
+def parse_since(value: str) -> int:
+    """An ISO date or timestamp as local-time microseconds, comparable with stored turns"""
+    parsed = datetime.fromisoformat(value)
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone().replace(tzinfo=None)
+    return _micros(parsed)
+
+
+def encode_cursor(entry: Tuple[int, int, str]) -> str:
+    return f"{entry[0]}.{entry[1]}"
+
+
+def decode_cursor(cursor: str) -> Tuple[int, int]:
+    updated, _, seq = cursor.partition(".")
+    return int(updated), int(seq)
+
+
+def _unpack_timestamp(value: Any) -> Any:
+    return (_EPOCH + timedelta(microseconds=value)).isoformat() if isinstance(value, int) else value
+
+
+class MetadataTemplates:
+    """Interns the static part of turn metadata so identical templates share one dict"""
+
+    def __init__(self, max_templates: int = MAX_TEMPLATES):
+        self.max_templates = max_templates
+        self._templates: Dict[str, Dict[str, Any]] = {}
+        self.misses = 0
+
+    def split(self, metadata: Optional[Dict[str, Any]]) -> Tuple[Optional[Dict[str, Any]], Optional[Dict[str, Any]]]:
+        """Return (shared template, per-turn fields); either may be None"""
+        if not metadata:
+            return None, None
+        static = {key: metadata[key] for key in TEMPLATE_KEYS if key in metadata}
+        extra = {key: value for key, value in metadata.items() if key not in static} or None
+        if not static:
+            return None, extra
+        key = json.dumps(static, sort_keys=True, default=str)
+        template = self._templates.get(key)
+        if template is None:
+            if len(self._templates) >= self.max_templates:
+                # Unbounded variety means these fields are not really static; keep them per turn
+                self.misses += 1
+                return None, dict(metadata)
+            template = self._templates[key] = static
+        return template, extra
+
+    def __len__(self) -> int:
+        return len(self._templates)
+
+
+class Turn:
+    """
+    One stored exchange
+
+    The timestamp is kept as integer microseconds, the static metadata as a shared
+    template, the remaining metadata as one JSON string (far smaller than nested
+    dicts and lists), and turns outside the hot window as one zlib blob. Turns are never
+    mutated once stored: compressing one replaces it, so readers can materialize
+    turns outside the store lock. Templates are shared, so treat returned metadata
+    as read-only.
+    """
+
+    __slots__ = ("user", "assistant", "created", "template", "extra", "packed", "size")
+
+    def __init__(self, user: Any, assistant: Any, created: Any, template: Optional[Dict[str, Any]],
+                 extra: Optional[str], packed: Optional[bytes], size: int):
+        self.user = user
+        self.assistant = assistant
+        self.created = created
+        self.template = template
+        self.extra = extra
+        self.packed = packed
+        self.size = size
+
+    @classmethod
+    def from_dict(cls, turn: Dict[str, Any], templates: MetadataTemplates) -> "Turn":
+        template, extra = templates.split(turn.get("metadata"))
+        others = {key: value for key, value in turn.items() if key not in ("user", "assistant", "timestamp", "metadata")}
+        if others:
+            extra = {**(extra or {}), "__turn__": others}
+        user = turn.get("user")
+        assistant = turn.get("assistant")
+        encoded = json.dumps(extra, ensure_ascii=False, default=str) if extra else None
+        size = TURN_OVERHEAD + len(user or "") + len(assistant or "") + len(encoded or "")
+        return cls(user, assistant, _pack_timestamp(turn.get("timestamp")), template, encoded, None, size)
+
+    def compressed(self) -> Optional["Turn"]:
+        """A packed copy of this turn, or None if compression does not pay off"""
+        if self.packed is not None:
+            return None
+        raw = json.dumps([self.user, self.assistant, self.extra], ensure_ascii=False, default=str).encode("utf-8")
+        packed = zlib.compress(raw, 6)
+        if len(packed) >= len(raw):
+            return None
+        return Turn(None, None, self.created, self.template, None, packed, TURN_OVERHEAD + len(packed))
+
+    def to_dict(self) -> Dict[str, Any]:
+        if self.packed is not None:
+            user, assistant, extra = json.loads(zlib.decompress(self.packed))
+        else:
+            user, assistant, extra = self.user, self.assistant, self.extra
+        metadata: Dict[str, Any] = dict(self.template) if self.template else {}
+        others = None
+        if extra:
+            extra = json.loads(extra)
+            others = extra.get("__turn__")
+            metadata.update((key, value) for key, value in extra.items() if key != "__turn__")
+        turn = {
+            "user": user,
+            "assistant": assistant,
+            "timestamp": _unpack_timestamp(self.created),
+            "metadata": metadata,
+        }
+        if others:
+            turn.update(others)
+        return turn
+
+
+class _Conversation:
+    """Ring buffer of turns for one conversation plus the bookkeeping the store evicts on"""
+
+    __slots__ = ("turns", "bytes", "created_at", "last_access", "index_entry")
+
+    def __init__(self, now: float, max_turns: int):
+        self.turns: Deque[Turn] = deque(maxlen=max_turns)
+        self.bytes = 0
+        self.created_at = now
+        self.last_access = now
+        # This conversation's live entry in the store's last_updated index
+        self.index_entry: Optional[Tuple[int, int, str]] = None
+
+
+class ConversationStore:
+    """
+    Bounded in-memory conversation history.
+
+    Each conversation keeps at most `max_turns` turns. Conversations idle for longer
+    than `ttl` seconds expire, and when the estimated size of all turns exceeds
+    `max_bytes` (or there are more than `max_conversations`), the least recently used
+    conversations are evicted first. A background sweeper removes expired
+    conversations even when no requests arrive to trigger lazy expiry.
+
+    Turns are stored as compact `Turn` records in a per-conversation ring buffer; all
+    but the newest `hot_turns` are zlib-compressed when `compress` is set.
+
+    Listing uses an index of (last_updated, seq, id) entries kept sorted with bisect.
+    An update inserts a new entry and leaves the old one behind; stale entries are
+    skipped while paging and dropped when the index is compacted, so listing a page
+    costs O(log n + page size) rather than a scan of every conversation.
+
+    When a `journal` (see conversation_log.py) is attached, every appended turn and
+    every removed conversation is recorded to it so history survives restarts.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 6 * 3600.0,
+        max_bytes: int = 64 * 1024 * 1024,
+        max_conversations: int = 10000,
+        max_turns: int = 10,
+        sweep_interval: float = 60.0,
+        hot_turns: int = 3,
+        compress: bool = True,
+    ):
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_conversations = max_conversations
+        self.max_turns = max(1, max_turns)
+        self.sweep_interval = sweep_interval
+        self.hot_turns = max(0, hot_turns)
+        self.compress = compress
+        self.templates = MetadataTemplates()
+        self._conversations: "OrderedDict[str, _Conversation]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sweeper: Optional[threading.Thread] = None
+        self.journal: Any = None
+        self._index: List[Tuple[int, int, str]] = []
+        self._index_seq = 0
+        self._index_compactions = 0
+
+        self._turns_appended = 0
+        self._turns_trimmed = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._sweeps = 0
+        self._turns_compressed = 0
+
+    def _expired(self, conversation: _Conversation, now: float) -> bool:
+        return self.ttl > 0 and now - conversation.last_access > self.ttl
+
+    def _remove(self, conversation_id: str) -> _Conversation:
+        conversation = self._conversations.pop(conversation_id)
+        self._bytes -= conversation.bytes
+        # Its index entry is now stale and will be skipped or compacted away
+        conversation.index_entry = None
+        if self.journal is not None:
+            self.journal.record("delete", conversation_id)
+        return conversation
+
+    def _get_live(self, conversation_id: str, now: float) -> Optional[_Conversation]:
+        """Look up a conversation, expiring it in place if it has been idle too long"""
+        conversation = self._conversations.get(conversation_id)
+        if conversation is not None and self._expired(conversation, now):
+            self._remove(conversation_id)
+            self._expirations += 1
+            return None
+        return conversation
+
+    def _evict(self, keep: str):
+        """Drop least recently used conversations until the store fits its caps"""
+        while len(self._conversations) > 1 and (
+            self._bytes > self.max_bytes or len(self._conversations) > self.max_conversations
+        ):
+            oldest = next(iter(self._conversations))
+            if oldest == keep:
+                break
+            self._remove(oldest)
+            self._evictions += 1
+
+    def append(self, conversation_id: str, turn: Dict[str, Any]):
+        """Add a turn, trimming the conversation to `max_turns` and evicting to stay in budget"""
+        now = time.monotonic()
+        with self._lock:
+            record = Turn.from_dict(turn, self.templates)
+            conversation = self._get_live(conversation_id, now)
+            if conversation is None:
+                conversation = self._conversations[conversation_id] = _Conversation(now, self.max_turns)
+            turns = conversation.turns
+            if len(turns) == self.max_turns:
+                # The ring buffer drops its oldest turn on append
+                self._adjust(conversation, -turns[0].size)
+                self._turns_trimmed += 1
+            turns.append(record)
+            self._adjust(conversation, record.size)
+            self._turns_appended += 1
+            if self.journal is not None:
+                self.journal.record("append", conversation_id, turn)
+
+            cold = len(turns) - 1 - self.hot_turns
+            if self.compress and cold >= 0:
+                packed = turns[cold].compressed()
+                if packed is not None:
+                    self._adjust(conversation, packed.size - turns[cold].size)
+                    turns[cold] = packed
+                    self._turns_compressed += 1
+
+            conversation.last_access = now
+            self._conversations.move_to_end(conversation_id)
+            self._reindex(conversation_id, conversation, record)
+            self._evict(keep=conversation_id)
+
+    def _reindex(self, conversation_id: str, conversation: _Conversation, record: Turn):
+        """Insert the conversation's new last_updated entry; the previous one goes stale"""
+        updated = record.created if isinstance(record.created, int) else _micros(datetime.now())
+        self._index_seq += 1
+        entry = (updated, self._index_seq, conversation_id)
+        conversation.index_entry = entry
+        # Turns arrive in time order, so this is almost always an append at the end
+        if not self._index or self._index[-1] < entry:
+            self._index.append(entry)
+        else:
+            bisect.insort(self._index, entry)
+        if len(self._index) > 2 * len(self._conversations) + INDEX_COMPACT_SLACK:
+            self._compact_index()
+
+    def _is_live_entry(self, entry: Tuple[int, int, str]) -> Optional[_Conversation]:
+        conversation = self._conversations.get(entry[2])
+        return conversation if conversation is not None and conversation.index_entry is entry else None
+
+    def _compact_index(self):
+        self._index = [entry for entry in self._index if self._is_live_entry(entry) is not None]
+        self._index_compactions += 1
+
+    def _adjust(self, conversation: _Conversation, delta: int):
+        conversation.bytes += delta
+        self._bytes += delta
+
+    def get(self, conversation_id: str, last: Optional[int] = None) -> Optional[List[Dict[str, Any]]]:
+        """Turns of a live conversation (oldest first, optionally only the `last` few), or None if unknown or expired"""
+        now = time.monotonic()
+        with self._lock:
+            conversation = self._get_live(conversation_id, now)
+            if conversation is None:
+                return None
+            conversation.last_access = now
+            self._conversations.move_to_end(conversation_id)
+            turns = list(conversation.turns)
+        if last is not None:
+            turns = turns[-last:] if last > 0 else []
+        return [turn.to_dict() for turn in turns]
+
+    def history(self, conversation_id: str, last: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Turns to feed the crew; empty for a new conversation"""
+        return self.get(conversation_id, last) or []
+
+    def delete(self, conversation_id: str) -> bool:
+        with self._lock:
+            if self._get_live(conversation_id, time.monotonic()) is None:
+                return False
+            self._remove(conversation_id)
+            return True
+
+    def page(
+        self,
+        limit: int = 50,
+        after: Optional[str] = None,
+        since: Optional[str] = None,
+    ) -> Tuple[List[Tuple[str, int, Dict[str, Any]]], Optional[str]]:
+        """
+        Live conversations, most recently updated first, as (id, turn count, latest turn)
+
+        `after` is the cursor returned with the previous page, `since` an ISO timestamp
+        that stops the walk at older conversations. Returns the page and the cursor for
+        the next one (None when there is nothing further). Does not refresh TTLs.
+        Raises ValueError for a malformed cursor or timestamp.
+        """
+        start = decode_cursor(after) if after else None
+        floor = parse_since(since) if since else None
+        now = time.monotonic()
+        found: List[Tuple[str, int, Turn, Tuple[int, int, str]]] = []
+        next_cursor = None
+        with self._lock:
+            position = bisect.bisect_left(self._index, start) if start else len(self._index)
+            while position > 0:
+                position -= 1
+                entry = self._index[position]
+                if floor is not None and entry[0] < floor:
+                    break
+                conversation = self._is_live_entry(entry)
+                if conversation is None or not conversation.turns or self._expired(conversation, now):
+                    continue
+                if len(found) == limit:
+                    next_cursor = encode_cursor(found[-1][3])
+                    break
+                found.append((entry[2], len(conversation.turns), conversation.turns[-1], entry))
+        # Stored turns are immutable, so the latest ones are expanded outside the lock
+        return [(conversation_id, count, turn.to_dict()) for conversation_id, count, turn, _ in found], next_cursor
+
+    def export(self) -> Tuple[int, List[Tuple[str, List[Dict[str, Any]]]]]:
+        """Consistent copy of every conversation (LRU order) and the last journal seq it reflects"""
+        with self._lock:
+            seq = self.journal.last_seq if self.journal is not None else 0
+            conversations = [
+                (conversation_id, list(conversation.turns))
+                for conversation_id, conversation in self._conversations.items()
+            ]
+        # Stored turns are immutable, so they can be expanded without holding the lock
+        return seq, [(conversation_id, [turn.to_dict() for turn in turns]) for conversation_id, turns in conversations]
+
+    def sweep(self) -> int:
+        """Remove every expired conversation; returns how many were removed"""
+        now = time.monotonic()
+        with self._lock:
+            expired = [
+                conversation_id
+                for conversation_id, conversation in self._conversations.items()
+                if self._expired(conversation, now)
+            ]
+            for conversation_id in expired:
+                self._remove(conversation_id)
+            self._expirations += len(expired)
+            self._sweeps += 1
+        if expired:
+            logger.info(f"Conversation sweeper expired {len(expired)} idle conversations")
+        return len(expired)
+
+    def _sweep_loop(self):
+        while not self._stop.wait(self.sweep_interval):
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Conversation sweep failed: {e}")
+
+    def start_sweeper(self):
+        """Expire idle conversations on a daemon thread every `sweep_interval` seconds"""
+        if self._sweeper is None and self.ttl > 0 and self.sweep_interval > 0:
+            self._stop.clear()
+            self._sweeper = threading.Thread(target=self._sweep_loop, name="conversation-sweeper", daemon=True)
+            self._sweeper.start()
+
+    def stop_sweeper(self):
+        self._stop.set()
+        if self._sweeper is not None:
+            self._sweeper.join(timeout=5)
+            self._sweeper = None
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            turns = sum(len(conversation.turns) for conversation in self._conversations.values())
+            return {
+                "conversations": len(self._conversations),
+                "turns": turns,
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "max_conversations": self.max_conversations,
+                "max_turns": self.max_turns,
+                "ttl_seconds": self.ttl,
+                "turns_appended": self._turns_appended,
+                "turns_trimmed": self._turns_trimmed,
+                "turns_compressed": self._turns_compressed,
+                "metadata_templates": len(self.templates),
+                "index_entries": len(self._index),
+                "index_compactions": self._index_compactions,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "sweeps": self._sweeps,
+                "sweeper_running": self._sweeper is not None,
+            }
+
+
+# Create a singleton instance
+conversation_store = ConversationStore(
+    ttl=ChatConfig.CONVERSATION_TTL,
+    max_bytes=ChatConfig.CONVERSATION_MAX_BYTES,
+    max_conversations=ChatConfig.CONVERSATION_MAX_COUNT,
+    max_turns=ChatConfig.MAX_CONVERSATION_HISTORY,
+    sweep_interval=ChatConfig.CONVERSATION_SWEEP_INTERVAL,
+    hot_turns=ChatConfig.CONVERSATION_HOT_TURNS,
+    compress=ChatConfig.CONVERSATION_COMPRESS
+)
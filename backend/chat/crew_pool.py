@@ -0,0 +1,137 @@
+"""
+Pool of pre-built crew sets so concurrent requests never share agents or crews.
+
+CrewAI agents and crews carry per-run state (task lists, executors, tool caches),
+so each request checks out a private set, uses it, and hands it back for reuse
+instead of mutating shared module-level objects or rebuilding crews per call.
+Kept identical in backend/chat and backend/explore; change both copies together.
+"""
+
+import logging
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class CrewPoolTimeout(TimeoutError):
+    """Raised when no crew set becomes free within the acquire timeout"""
+
+
+class CrewPool:
+    """
+    Up to `size` crew sets built by `factory`, handed out one request at a time.
+
+    `prebuild` sets are created up front; the rest are created on demand the first
+    time concurrency needs them. Size the pool to the number of crew runs that may
+    execute at once so acquiring normally never waits.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        factory: Callable[[], Any],
+        size: int,
+        prebuild: int = 1,
+        acquire_timeout: float = 60.0,
+        reset: Optional[Callable[[Any], None]] = None,
+    ):
+        self.name = name
+        self.size = max(1, size)
+        self.acquire_timeout = acquire_timeout
+        self._factory = factory
+        self._reset = reset
+        # LIFO so the most recently used (warmest) set is handed out first
+        self._idle: "queue.LifoQueue[Any]" = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._peak_in_use = 0
+        self._acquisitions = 0
+        self._waits = 0
+        self._timeouts = 0
+        self._total_wait = 0.0
+
+        for _ in range(min(max(0, prebuild), self.size)):
+            with self._lock:
+                self._created += 1
+            self._idle.put(self._create())
+
+    def _create(self) -> Any:
+        """Build a new set into a slot the caller already reserved in `_created`"""
+        started = time.perf_counter()
+        try:
+            member = self._factory()
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+        logger.info(f"Built {self.name} crew set {self._created}/{self.size} in {time.perf_counter() - started:.2f}s")
+        return member
+
+    def _checkout(self, timeout: Optional[float]) -> Any:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            can_grow = self._created < self.size
+            if can_grow:
+                self._created += 1
+        if can_grow:
+            return self._create()
+
+        started = time.perf_counter()
+        with self._lock:
+            self._waits += 1
+        try:
+            member = self._idle.get(timeout=self.acquire_timeout if timeout is None else timeout)
+        except queue.Empty:
+            with self._lock:
+                self._timeouts += 1
+            raise CrewPoolTimeout(f"No {self.name} crew set became free; all {self.size} are busy")
+        with self._lock:
+            self._total_wait += time.perf_counter() - started
+        return member
+
+    @contextmanager
+    def acquire(self, timeout: Optional[float] = None) -> Iterator[Any]:
+        """Check out a crew set for exclusive use; it is reset and recycled on exit"""
+        member = self._checkout(timeout)
+        with self._lock:
+            self._in_use += 1
+            self._acquisitions += 1
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+        try:
+            yield member
+        finally:
+            if self._reset is not None:
+                try:
+                    self._reset(member)
+                except Exception as e:
+                    logger.warning(f"Resetting {self.name} crew set failed, dropping it: {e}")
+                    member = None
+            with self._lock:
+                self._in_use -= 1
+                if member is None:
+                    self._created -= 1
+            if member is not None:
+                self._idle.put(member)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "size": self.size,
+                "created": self._created,
+                "in_use": self._in_use,
+                "idle": self._idle.qsize(),
+                "peak_in_use": self._peak_in_use,
+                "acquisitions": self._acquisitions,
+                "waits": self._waits,
+                "timeouts": self._timeouts,
+                "avg_wait_ms": round(self._total_wait / self._waits * 1000, 2) if self._waits else 0.0,
+            }
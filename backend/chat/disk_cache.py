@@ -0,0 +1,322 @@
+"""
+SQLite-backed tier under the in-memory EXA search cache.
+
+Stores raw EXA results so warm hits survive redeploys. Documents (url, title, full
+text) are stored once and shared by every search that returned them. Kept identical
+in backend/chat and backend/explore; change both copies together.
+
+Inspect and prune from the command line:
+
+    python disk_cache.py stats
+    python disk_cache.py list --limit 20
+    python disk_cache.py show "famous temples in warangal" --num-results 5
+    python disk_cache.py prune --older-than 604800
+    python disk_cache.py compact --max-bytes 104857600
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from search_cache import SearchCache
+
+# Leave headroom after compaction so the next few writes don't trigger it again
+COMPACT_TARGET_RATIO = 0.8
+COMPACT_CHECK_EVERY = 50
+
+
+class DiskSearchCache:
+    """Persistent search/document cache with TTL, size-based compaction and hit counters."""
+
+    def __init__(self, path: str, ttl: float = 7 * 24 * 3600, max_bytes: int = 256 * 1024 * 1024):
+        self.path = path
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._lock = threading.Lock()
+        self._writes_since_check = 0
+        self._hits = 0
+        self._misses = 0
+        self._compactions = 0
+
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            with self._conn:
+                self._conn.executescript(
+                    """
+                    CREATE TABLE IF NOT EXISTS searches (
+                        normalized_query TEXT NOT NULL,
+                        num_results INTEGER NOT NULL,
+                        query TEXT NOT NULL,
+                        created_at REAL NOT NULL,
+                        accessed_at REAL NOT NULL,
+                        hits INTEGER NOT NULL DEFAULT 0,
+                        PRIMARY KEY (normalized_query, num_results)
+                    );
+                    CREATE INDEX IF NOT EXISTS searches_accessed ON searches (accessed_at);
+                    CREATE TABLE IF NOT EXISTS search_results (
+                        normalized_query TEXT NOT NULL,
+                        num_results INTEGER NOT NULL,
+                        position INTEGER NOT NULL,
+                        url TEXT NOT NULL,
+                        PRIMARY KEY (normalized_query, num_results, position)
+                    );
+                    CREATE INDEX IF NOT EXISTS search_results_url ON search_results (url);
+                    CREATE TABLE IF NOT EXISTS documents (
+                        url TEXT PRIMARY KEY,
+                        title TEXT,
+                        text TEXT,
+                        extra TEXT,
+                        fetched_at REAL NOT NULL,
+                        size INTEGER NOT NULL
+                    );
+                    """
+                )
+
+    # -- cache API -------------------------------------------------------------
+
+    def get(self, query: str, num_results: int) -> Optional[List[Dict[str, Any]]]:
+        normalized, num_results = SearchCache.key(query, num_results)
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT created_at FROM searches WHERE normalized_query = ? AND num_results = ?",
+                (normalized, num_results),
+            ).fetchone()
+            if row is None or row[0] + self.ttl <= now:
+                self._misses += 1
+                return None
+
+            rows = self._conn.execute(
+                """
+                SELECT d.url, d.title, d.text, d.extra FROM search_results r
+                JOIN documents d ON d.url = r.url
+                WHERE r.normalized_query = ? AND r.num_results = ?
+                ORDER BY r.position
+                """,
+                (normalized, num_results),
+            ).fetchall()
+            with self._conn:
+                self._conn.execute(
+                    "UPDATE searches SET accessed_at = ?, hits = hits + 1 WHERE normalized_query = ? AND num_results = ?",
+                    (now, normalized, num_results),
+                )
+            self._hits += 1
+
+        results = []
+        for url, title, text, extra in rows:
+            result = json.loads(extra) if extra else {}
+            result.update({"url": url, "title": title, "text": text})
+            results.append(result)
+        return results
+
+    def put(self, query: str, num_results: int, results: List[Dict[str, Any]]):
+        normalized, num_results = SearchCache.key(query, num_results)
+        now = time.time()
+        documents = []
+        for result in results:
+            url = result.get("url")
+            if not url:
+                continue
+            title = result.get("title") or ""
+            text = result.get("text") or ""
+            extra = {k: v for k, v in result.items() if k not in ("url", "title", "text")}
+            extra_json = json.dumps(extra, ensure_ascii=False) if extra else None
+            size = len(url) + len(title) + len(text) + len(extra_json or "")
+            documents.append((url, title, text, extra_json, now, size))
+
+        with self._lock:
+            with self._conn:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO documents (url, title, text, extra, fetched_at, size) VALUES (?, ?, ?, ?, ?, ?)",
+                    documents,
+                )
+                self._conn.execute(
+                    "DELETE FROM search_results WHERE normalized_query = ? AND num_results = ?",
+                    (normalized, num_results),
+                )
+                self._conn.executemany(
+                    "INSERT INTO search_results (normalized_query, num_results, position, url) VALUES (?, ?, ?, ?)",
+                    [(normalized, num_results, position, doc[0]) for position, doc in enumerate(documents)],
+                )
+                self._conn.execute(
+                    """
+                    INSERT OR REPLACE INTO searches (normalized_query, num_results, query, created_at, accessed_at, hits)
+                    VALUES (?, ?, ?, ?, ?, 0)
+                    """,
+                    (normalized, num_results, query, now, now),
+                )
+            self._writes_since_check += 1
+            check = self._writes_since_check >= COMPACT_CHECK_EVERY
+            if check:
+                self._writes_since_check = 0
+
+        if check and self.size_bytes() > self.max_bytes:
+            self.compact()
+
+    # -- maintenance -----------------------------------------------------------
+
+    def size_bytes(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM documents").fetchone()[0]
+
+    def _delete_orphans(self) -> int:
+        """Drop documents no search points at any more (caller holds the lock)"""
+        return self._conn.execute(
+            "DELETE FROM documents WHERE url NOT IN (SELECT DISTINCT url FROM search_results)"
+        ).rowcount
+
+    def _delete_searches(self, keys: List[tuple]):
+        self._conn.executemany("DELETE FROM search_results WHERE normalized_query = ? AND num_results = ?", keys)
+        self._conn.executemany("DELETE FROM searches WHERE normalized_query = ? AND num_results = ?", keys)
+
+    def prune(self, older_than: Optional[float] = None) -> Dict[str, int]:
+        """Delete searches created more than `older_than` seconds ago (default: the TTL)"""
+        cutoff = time.time() - (self.ttl if older_than is None else older_than)
+        with self._lock, self._conn:
+            keys = self._conn.execute(
+                "SELECT normalized_query, num_results FROM searches WHERE created_at <= ?", (cutoff,)
+            ).fetchall()
+            self._delete_searches(keys)
+            documents = self._delete_orphans()
+        return {"searches_deleted": len(keys), "documents_deleted": documents}
+
+    def compact(self, max_bytes: Optional[int] = None, vacuum: bool = False) -> Dict[str, int]:
+        """Evict least recently used searches until stored documents fit under the size budget"""
+        budget = self.max_bytes if max_bytes is None else max_bytes
+        target = int(budget * COMPACT_TARGET_RATIO)
+        searches_deleted = documents_deleted = 0
+        with self._lock:
+            with self._conn:
+                # Expired entries go first, whatever their recency
+                expired = self._conn.execute(
+                    "SELECT normalized_query, num_results FROM searches WHERE created_at <= ?",
+                    (time.time() - self.ttl,),
+                ).fetchall()
+                self._delete_searches(expired)
+                searches_deleted += len(expired)
+                documents_deleted += self._delete_orphans()
+
+                while self._conn.execute("SELECT COALESCE(SUM(size), 0) FROM documents").fetchone()[0] > target:
+                    oldest = self._conn.execute(
+                        "SELECT normalized_query, num_results FROM searches ORDER BY accessed_at LIMIT 10"
+                    ).fetchall()
+                    if not oldest:
+                        break
+                    self._delete_searches(oldest)
+                    searches_deleted += len(oldest)
+                    documents_deleted += self._delete_orphans()
+            if vacuum:
+                self._conn.execute("VACUUM")
+            self._compactions += 1
+        return {"searches_deleted": searches_deleted, "documents_deleted": documents_deleted}
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM search_results")
+            self._conn.execute("DELETE FROM searches")
+            self._conn.execute("DELETE FROM documents")
+
+    def list_searches(self, limit: int = 20) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                """
+                SELECT s.query, s.normalized_query, s.num_results, s.created_at, s.accessed_at, s.hits,
+                       COUNT(r.url)
+                FROM searches s LEFT JOIN search_results r
+                  ON r.normalized_query = s.normalized_query AND r.num_results = s.num_results
+                GROUP BY s.normalized_query, s.num_results
+                ORDER BY s.accessed_at DESC LIMIT ?
+                """,
+                (limit,),
+            ).fetchall()
+        return [
+            {
+                "query": query,
+                "normalized_query": normalized,
+                "num_results": num_results,
+                "created_at": created_at,
+                "accessed_at": accessed_at,
+                "hits": hits,
+                "documents": documents,
+            }
+            for query, normalized, num_results, created_at, accessed_at, hits, documents in rows
+        ]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            searches = self._conn.execute("SELECT COUNT(*) FROM searches").fetchone()[0]
+            documents, size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM documents").fetchone()
+            lookups = self._hits + self._misses
+            return {
+                "path": self.path,
+                "searches": searches,
+                "documents": documents,
+                "bytes": size,
+                "file_bytes": os.path.getsize(self.path) if os.path.exists(self.path) else 0,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "compactions": self._compactions,
+            }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect and prune the persistent EXA search cache")
+    default_db = os.getenv("SEARCH_DISK_CACHE_PATH") or os.path.join(os.getenv("DATA_DIR", "."), "search_cache.db")
+    parser.add_argument("--db", default=default_db, help="cache database path")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    commands.add_parser("stats", help="show entry counts and sizes")
+    list_cmd = commands.add_parser("list", help="list most recently used searches")
+    list_cmd.add_argument("--limit", type=int, default=20)
+    show_cmd = commands.add_parser("show", help="print the cached results for a query")
+    show_cmd.add_argument("query")
+    show_cmd.add_argument("--num-results", type=int, default=5)
+    prune_cmd = commands.add_parser("prune", help="delete searches older than a given age")
+    prune_cmd.add_argument("--older-than", type=float, default=None, help="age in seconds (default: TTL)")
+    compact_cmd = commands.add_parser("compact", help="evict least recently used searches down to a size budget")
+    compact_cmd.add_argument("--max-bytes", type=int, default=None)
+    compact_cmd.add_argument("--vacuum", action="store_true", help="also shrink the database file")
+    commands.add_parser("clear", help="delete everything")
+
+    args = parser.parse_args(argv)
+    if not os.path.exists(args.db):
+        print(f"No cache database at {args.db}", file=sys.stderr)
+        return 1
+
+    cache = DiskSearchCache(args.db, ttl=float(os.getenv("SEARCH_DISK_CACHE_TTL", 7 * 24 * 3600)))
+    if args.command == "stats":
+        output = cache.stats()
+    elif args.command == "list":
+        output = cache.list_searches(args.limit)
+    elif args.command == "show":
+        output = cache.get(args.query, args.num_results)
+        if output is None:
+            print("Not cached (or expired)", file=sys.stderr)
+            return 1
+    elif args.command == "prune":
+        output = cache.prune(args.older_than)
+    elif args.command == "compact":
+        output = cache.compact(args.max_bytes, vacuum=args.vacuum)
+    else:
+        cache.clear()
+        output = {"cleared": True}
+
+    print(json.dumps(output, indent=2, ensure_ascii=False))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,392 @@
+import asyncio
+import contextvars
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, AsyncIterator, Callable, Deque, Dict, List, Optional
+
+from config import ChatConfig
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Long observations and thoughts are cut so one step cannot flood the log socket
+MAX_TEXT = 500
+
+OVERFLOW_POLICIES = ("drop", "coalesce")
+# Never dropped while anything else can be: the client needs these to finish a request
+PROTECTED_TYPES = frozenset({"response", "error"})
+
+
+def _clip(text: Any) -> str:
+    text = str(text or "")
+    return text if len(text) <= MAX_TEXT else text[:MAX_TEXT] + "..."
+
+
+def make_event(event_type: str, data: Optional[Dict[str, Any]] = None, message: Optional[str] = None,
+               agent: Optional[str] = None, hierarchy: Optional[int] = None) -> Dict[str, Any]:
+    """An event in the log WebSocket's wire format"""
+    return {
+        "type": event_type,
+        "data": data or {},
+        "message": message,
+        "agent": agent,
+        "hierarchy": hierarchy,
+        "timestamp": datetime.now().isoformat()
+    }
+
+
+class Subscription:
+    """
+    One subscriber's bounded buffer of events for a channel
+
+    Producers (any thread) never wait: when the buffer is full the `drop` policy
+    discards the oldest droppable event, and the `coalesce` policy additionally
+    merges consecutive answer chunks into one before dropping anything. The
+    consumer side (`frames`) runs on the event loop and ends the subscription once
+    the client has been idle for too long. By default it sends one event per frame;
+    with `batch` set it batches whatever has queued up into one frame and sends
+    heartbeats when the channel is quiet.
+    """
+
+    def __init__(
+        self,
+        bus: "EventBus",
+        channel: str,
+        loop: asyncio.AbstractEventLoop,
+        max_queue: int = 256,
+        policy: str = "coalesce",
+        batch: bool = False,
+        batch_interval: float = 0.05,
+        max_batch: int = 50,
+        heartbeat_interval: float = 15.0,
+        idle_timeout: float = 600.0,
+    ):
+        self.bus = bus
+        self.channel = channel
+        self.policy = policy if policy in OVERFLOW_POLICIES else "coalesce"
+        self.max_queue = max(1, max_queue)
+        self.batch = batch
+        self.batch_interval = batch_interval
+        self.max_batch = max(1, max_batch)
+        self.heartbeat_interval = heartbeat_interval
+        self.idle_timeout = idle_timeout
+        self._loop = loop
+        self._lock = threading.Lock()
+        self._buffer: Deque[Any] = deque()
+        self._wake = asyncio.Event()
+        self._closed = False
+        self.connected_at = time.monotonic()
+        self.last_activity = self.connected_at
+
+        self.received = 0
+        self.dropped = 0
+        self.coalesced = 0
+        self.frames_sent = 0
+        self.events_sent = 0
+        self.heartbeats = 0
+        self.peak_queue = 0
+        self.evicted: Optional[str] = None
+
+    def deliver(self, event: Any):
+        """Buffer an event for the subscriber (safe to call from any thread, never blocks)"""
+        with self._lock:
+            if self._closed:
+                return
+            self.received += 1
+            buffer = self._buffer
+            was_empty = not buffer
+            if (
+                self.policy == "coalesce" and buffer
+                and event["type"] == "response_chunk" and buffer[-1]["type"] == "response_chunk"
+            ):
+                # Events are shared between subscribers, so merge into a new dict
+                previous = buffer.pop()
+                event = {**event, "data": {**event["data"], "content": previous["data"]["content"] + event["data"]["content"]}}
+                self.coalesced += 1
+            buffer.append(event)
+            if len(buffer) > self.max_queue:
+                self._drop_one()
+            self.peak_queue = max(self.peak_queue, len(buffer))
+        if was_empty:
+            self._notify()
+
+    def _drop_one(self):
+        """Discard the oldest event a client can live without (caller holds the lock)"""
+        for index, queued in enumerate(self._buffer):
+            if queued["type"] not in PROTECTED_TYPES:
+                del self._buffer[index]
+                break
+        else:
+            self._buffer.popleft()
+        self.dropped += 1
+
+    def _notify(self):
+        try:
+            self._loop.call_soon_threadsafe(self._wake.set)
+        except RuntimeError:
+            # The subscriber's loop is gone; it will never read again
+            self.bus.unsubscribe(self)
+
+    def touch(self):
+        """Record client activity (a message received on the socket)"""
+        self.last_activity = time.monotonic()
+
+    def close(self):
+        with self._lock:
+            self._closed = True
+        self._notify()
+
+    def _drain(self) -> List[Dict[str, Any]]:
+        with self._lock:
+            count = min(len(self._buffer), self.max_batch)
+            return [self._buffer.popleft() for _ in range(count)]
+
+    async def frames(self) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Frames to send to the client: a single event, or with `batch` also a `batch` of
+        events or a heartbeat
+
+        Ends when the subscription is closed or the client has been idle (no messages
+        received and no events sent) for `idle_timeout` seconds.
+        """
+        while not self._closed:
+            self._wake.clear()
+            if not self._buffer:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.heartbeat_interval)
+                except asyncio.TimeoutError:
+                    if self.idle_timeout > 0 and time.monotonic() - self.last_activity > self.idle_timeout:
+                        self.evicted = "idle"
+                        return
+                    if self.batch:
+                        self.heartbeats += 1
+                        yield make_event("heartbeat", {"queued": 0})
+                    continue
+                if self._closed:
+                    return
+                # Give a burst of events a moment to accumulate into one frame
+                if self.batch and self.batch_interval > 0:
+                    await asyncio.sleep(self.batch_interval)
+
+            events = self._drain()
+            if not events:
+                continue
+            self.last_activity = time.monotonic()
+            self.events_sent += len(events)
+            if not self.batch:
+                for event in events:
+                    self.frames_sent += 1
+                    yield event
+                continue
+            self.frames_sent += 1
+            if len(events) == 1:
+                yield events[0]
+            else:
+                yield {"type": "batch", "events": events, "timestamp": datetime.now().isoformat()}
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queued = len(self._buffer)
+        return {
+            "channel": self.channel,
+            "policy": self.policy,
+            "batch": self.batch,
+            "queued": queued,
+            "peak_queue": self.peak_queue,
+            "received": self.received,
+            "dropped": self.dropped,
+            "coalesced": self.coalesced,
+            "frames_sent": self.frames_sent,
+            "events_sent": self.events_sent,
+            "heartbeats": self.heartbeats,
+            "connected_seconds": round(time.monotonic() - self.connected_at, 1),
+            "idle_seconds": round(time.monotonic() - self.last_activity, 1),
+        }
+
+
+class EventBus:
+    """
+    Routes instrumentation events to WebSocket subscribers by channel (conversation id)
+
+    A channel may have any number of subscribers (e.g. several browser tabs), each
+    with its own bounded buffer, so a slow client only ever loses its own events.
+    Publishing never blocks and is a dict lookup when nobody is listening, so
+    request handlers and crew worker threads can publish freely.
+    """
+
+    def __init__(self, **subscription_defaults: Any):
+        self.subscription_defaults = subscription_defaults
+        self._lock = threading.Lock()
+        self._subscribers: Dict[str, List[Subscription]] = {}
+        self._published = 0
+        self._delivered = 0
+        # Counters of subscriptions that have already gone away
+        self._retired = {"subscriptions": 0, "dropped": 0, "coalesced": 0, "frames_sent": 0, "events_sent": 0}
+        self._evictions: Dict[str, int] = {}
+
+    def subscribe(self, channel: str, **options: Any) -> Subscription:
+        """Subscribe to a channel (call from the event loop); options override the bus defaults"""
+        settings = {**self.subscription_defaults, **{key: value for key, value in options.items() if value is not None}}
+        subscription = Subscription(self, channel, asyncio.get_running_loop(), **settings)
+        with self._lock:
+            self._subscribers.setdefault(channel, []).append(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription, reason: Optional[str] = None):
+        subscription.close()
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.channel, [])
+            if subscription not in subscribers:
+                return
+            subscribers.remove(subscription)
+            if not subscribers:
+                self._subscribers.pop(subscription.channel, None)
+            self._retired["subscriptions"] += 1
+            for key in ("dropped", "coalesced", "frames_sent", "events_sent"):
+                self._retired[key] += getattr(subscription, key)
+            reason = reason or subscription.evicted
+            if reason:
+                self._evictions[reason] = self._evictions.get(reason, 0) + 1
+
+    def has_subscribers(self, channel: str) -> bool:
+        return channel in self._subscribers
+
+    def publish(self, channel: str, event: Dict[str, Any]):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+            self._published += 1
+            self._delivered += len(subscribers)
+        for subscription in subscribers:
+            subscription.deliver(event)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            live = [subscription for subscribers in self._subscribers.values() for subscription in subscribers]
+            totals = dict(self._retired)
+            evictions = dict(self._evictions)
+            published, delivered = self._published, self._delivered
+        for subscription in live:
+            for key in ("dropped", "coalesced", "frames_sent", "events_sent"):
+                totals[key] += getattr(subscription, key)
+        return {
+            "channels": len({subscription.channel for subscription in live}),
+            "subscribers": len(live),
+            "published": published,
+            "delivered": delivered,
+            "dropped": totals["dropped"],
+            "coalesced": totals["coalesced"],
+            "frames_sent": totals["frames_sent"],
+            "events_sent": totals["events_sent"],
+            "closed_subscriptions": totals["subscriptions"],
+            "evictions": evictions,
+            "defaults": self.subscription_defaults,
+            "live": [subscription.stats() for subscription in live],
+        }
+
+
+class RequestEvents:
+    """Publishes one request's events to its conversation channel"""
+
+    def __init__(self, bus: EventBus, channel: str):
+        self.bus = bus
+        self.channel = channel
+        # Agents in the order the chosen flow runs them; gives each event its hierarchy level
+        self.flow: List[str] = []
+
+    def emit(self, event_type: str, data: Optional[Dict[str, Any]] = None, message: Optional[str] = None,
+             agent: Optional[str] = None, hierarchy: Optional[int] = None):
+        if hierarchy is None and agent in self.flow:
+            hierarchy = self.flow.index(agent)
+        self.bus.publish(self.channel, make_event(event_type, data, message, agent, hierarchy))
+
+
+# Events for the request currently executing in this context; copied into crew worker threads
+current_events: contextvars.ContextVar[Optional[RequestEvents]] = contextvars.ContextVar(
+    "current_events", default=None
+)
+
+
+def emit_event(event_type: str, data: Optional[Dict[str, Any]] = None, message: Optional[str] = None,
+               agent: Optional[str] = None, hierarchy: Optional[int] = None):
+    """Publish to the active request's channel; a no-op outside a request"""
+    events = current_events.get()
+    if events is not None:
+        events.emit(event_type, data, message, agent, hierarchy)
+
+
+def set_flow(agents: List[str], mode: str, **details: Any):
+    """Announce which agents the routed flow will run, in order"""
+    events = current_events.get()
+    if events is not None:
+        events.flow = list(agents)
+        events.emit(
+            "agent_hierarchy",
+            {"mode": mode, "expected_agents": list(agents), **details},
+            f"Running {mode} workflow: {' → '.join(agents)}"
+        )
+
+
+def agent_step_callback(agent: str) -> Callable[[Any], None]:
+    """CrewAI step callback publishing each thought/tool call/final answer of `agent`"""
+
+    def on_step(step_output: Any):
+        try:
+            if hasattr(step_output, "return_values"):  # AgentFinish
+                emit_event(
+                    "agent_step",
+                    {"kind": "final_answer", "output": _clip(step_output.return_values.get("output"))},
+                    f"{agent} produced its final answer",
+                    agent
+                )
+                return
+            for step in step_output or []:  # AgentStep(action, observation) per tool call
+                action = getattr(step, "action", None)
+                observation = getattr(step, "observation", None)
+                emit_event(
+                    "agent_step",
+                    {
+                        "kind": "tool_call",
+                        "tool": getattr(action, "tool", None),
+                        "tool_input": _clip(getattr(action, "tool_input", None)),
+                        "thought": _clip(getattr(action, "log", None)),
+                        "observation": _clip(observation)
+                    },
+                    f"{agent} used {getattr(action, 'tool', 'a tool')}",
+                    agent
+                )
+        except Exception as e:
+            logger.warning(f"Could not publish step event for {agent}: {e}")
+
+    return on_step
+
+
+def task_complete_callback(display_names: Dict[str, str]) -> Callable[[Any], None]:
+    """CrewAI task callback publishing agent_complete; maps agent roles to display names"""
+
+    def on_task(output: Any):
+        role = getattr(output, "agent", "")
+        agent = display_names.get(role, role)
+        raw = getattr(output, "raw", "") or ""
+        emit_event(
+            "agent_complete",
+            {"agent": agent, "output_length": len(raw), "summary": getattr(output, "summary", None)},
+            f"{agent} finished its task",
+            agent
+        )
+
+    return on_task
+
+
+# Create a singleton instance
+event_bus = EventBus(
+    max_queue=ChatConfig.EVENT_QUEUE_SIZE,
+    policy=ChatConfig.EVENT_OVERFLOW_POLICY,
+    batch_interval=ChatConfig.EVENT_BATCH_INTERVAL,
+    max_batch=ChatConfig.EVENT_BATCH_MAX,
+    heartbeat_interval=ChatConfig.EVENT_HEARTBEAT_INTERVAL,
+    idle_timeout=ChatConfig.EVENT_IDLE_TIMEOUT
+)
@@ -0,0 +1,201 @@
+import asyncio
+import contextvars
+import logging
+import math
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from config import ChatConfig
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class BackpressureError(Exception):
+    """Base class for requests rejected because the crew pool is saturated"""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFullError(BackpressureError):
+    """Raised when the admission queue is full and a job cannot be accepted"""
+
+
+class QueueTimeoutError(BackpressureError):
+    """Raised when a job waited longer than the queue timeout before starting"""
+
+
+class CrewExecutor:
+    """
+    Runs blocking crew calls on a thread pool with a bounded admission queue.
+
+    At most `max_workers` jobs run at once and up to `max_queue` more may wait
+    for a free worker. Anything beyond that is rejected immediately so the API
+    can answer with a 503 instead of piling work onto the event loop.
+    """
+
+    def __init__(self, max_workers: int, max_queue: int, queue_timeout: float):
+        self.max_workers = max(1, max_workers)
+        self.max_queue = max(0, max_queue)
+        self.queue_timeout = queue_timeout
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="chat-crew")
+        self._lock = threading.Lock()
+
+        # Live state: jobs admitted but not yet picked up, by ticket (their future once submitted)
+        self._running = 0
+        self._waiting: Dict[object, Optional[Future]] = {}
+
+        # Counters
+        self._submitted = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+        self._expired = 0
+        self._cancelled = 0
+        # Queue wait of jobs that started, kept apart from the waits of jobs that expired
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._total_expired_wait = 0.0
+        self._total_run = 0.0
+
+    @property
+    def capacity(self) -> int:
+        """Total number of jobs that may be admitted (running + waiting)"""
+        return self.max_workers + self.max_queue
+
+    def submit(self, fn: Callable[..., Any], *args, **kwargs) -> asyncio.Future:
+        """
+        Admit a blocking callable to the worker pool and return an awaitable for its result
+
+        Admission is decided immediately, so callers can reject a request before
+        they start responding. Cancelling the returned future drops the job if no
+        worker has picked it up yet.
+
+        Raises:
+            QueueFullError: If the pool and admission queue are both full
+        """
+        ticket = object()
+        with self._lock:
+            if len(self._waiting) + self._running >= self.capacity:
+                self._rejected += 1
+                raise QueueFullError(
+                    f"Chat workers are busy ({self._running} running, {len(self._waiting)} queued)",
+                    retry_after=self._estimate_retry_after(),
+                )
+            self._waiting[ticket] = None
+            self._submitted += 1
+
+        enqueued_at = time.monotonic()
+        # Carry request-scoped context variables into the worker thread
+        context = contextvars.copy_context()
+        future = self._pool.submit(context.run, self._execute, ticket, enqueued_at, fn, args, kwargs)
+        with self._lock:
+            # A worker may already have picked the job up and released its ticket
+            if ticket in self._waiting:
+                self._waiting[ticket] = future
+        future.add_done_callback(lambda done: self._on_done(ticket, done))
+        return asyncio.wrap_future(future)
+
+    async def run(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """
+        Run a blocking callable on the worker pool and await its result
+
+        Raises:
+            QueueFullError: If the pool and admission queue are both full
+            QueueTimeoutError: If the job waited too long before a worker picked it up
+        """
+        return await self.submit(fn, *args, **kwargs)
+
+    def _on_done(self, ticket: object, future: Future):
+        """Release the queue slot of a job cancelled before a worker started it"""
+        if future.cancelled():
+            with self._lock:
+                if self._waiting.pop(ticket, ticket) is not ticket:
+                    self._cancelled += 1
+
+    def _execute(self, ticket: object, enqueued_at: float, fn: Callable[..., Any], args: tuple, kwargs: dict) -> Any:
+        """Worker-side wrapper that records queue wait and run time"""
+        started_at = time.monotonic()
+        wait = started_at - enqueued_at
+
+        with self._lock:
+            self._waiting.pop(ticket, None)
+            if self.queue_timeout and wait > self.queue_timeout:
+                self._expired += 1
+                self._total_expired_wait += wait
+                raise QueueTimeoutError(
+                    f"Request waited {wait:.1f}s for a chat worker",
+                    retry_after=self._estimate_retry_after(),
+                )
+            self._total_wait += wait
+            self._max_wait = max(self._max_wait, wait)
+            self._running += 1
+
+        failed = False
+        try:
+            return fn(*args, **kwargs)
+        except Exception:
+            failed = True
+            raise
+        finally:
+            with self._lock:
+                self._running -= 1
+                self._total_run += time.monotonic() - started_at
+                if failed:
+                    self._failed += 1
+                else:
+                    self._completed += 1
+
+    def _estimate_retry_after(self) -> int:
+        """Rough number of seconds until a slot frees up (caller holds the lock)"""
+        finished = self._completed + self._failed
+        avg_run = self._total_run / finished if finished else 5.0
+        waves = (len(self._waiting) + 1) / self.max_workers
+        return max(1, math.ceil(avg_run * waves))
+
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot of pool utilisation, queue depth and wait-time metrics"""
+        with self._lock:
+            started = self._completed + self._failed + self._running
+            finished = self._completed + self._failed
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "queue_timeout_seconds": self.queue_timeout,
+                "running": self._running,
+                "queue_depth": len(self._waiting),
+                "submitted": self._submitted,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "expired": self._expired,
+                "cancelled": self._cancelled,
+                "avg_wait_ms": round(self._total_wait / started * 1000, 2) if started else 0.0,
+                "max_wait_ms": round(self._max_wait * 1000, 2),
+                "avg_expired_wait_ms": round(self._total_expired_wait / self._expired * 1000, 2) if self._expired else 0.0,
+                "avg_run_ms": round(self._total_run / finished * 1000, 2) if finished else 0.0,
+            }
+
+    def shutdown(self, wait: bool = False):
+        """Stop accepting work, cancel jobs no worker has picked up and release the worker threads"""
+        with self._lock:
+            waiting = [future for future in self._waiting.values() if future is not None]
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        # Cancelling runs each job's done callback, which releases its queue slot
+        for future in waiting:
+            future.cancel()
+        if wait:
+            self._pool.shutdown(wait=True)
+
+
+# Create a singleton instance
+crew_executor = CrewExecutor(
+    max_workers=ChatConfig.CREW_WORKERS,
+    max_queue=ChatConfig.CREW_QUEUE_SIZE,
+    queue_timeout=ChatConfig.CREW_QUEUE_TIMEOUT,
+)
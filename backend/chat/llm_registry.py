@@ -0,0 +1,180 @@
+"""
+Lazily created watsonx clients shared across agents.
+
+Every agent used to build its own WatsonxLLM at import time, which meant one IAM
+token fetch and one HTTP session per agent before the service could start. The
+registry hands out cheap, unvalidated LLM objects instead. The first real call
+creates one ModelInference per (model, params), and all of them share a single
+authenticated APIClient whose token the SDK refreshes. Kept identical in
+backend/chat and backend/explore; change both copies together.
+"""
+
+import json
+import logging
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from llm_cache import CachedWatsonxLLM
+
+logger = logging.getLogger(__name__)
+
+
+def client_key(model_id: str, params: Optional[Dict[str, Any]]) -> Tuple[str, str]:
+    """Agents with the same model and generation params share a client"""
+    return model_id, json.dumps(params or {}, sort_keys=True)
+
+
+class _ClientSlot:
+    """One shared ModelInference plus its usage counters"""
+
+    def __init__(self, model_id: str, params: Dict[str, Any]):
+        self.model_id = model_id
+        self.params = params
+        self.model: Any = None
+        self.lock = threading.Lock()
+        self.agents: set = set()
+        self.init_seconds: Optional[float] = None
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests = 0
+        self.errors = 0
+        self.total_latency = 0.0
+        self.max_latency = 0.0
+
+
+class WatsonxClientRegistry:
+    """Creates watsonx clients on first use and shares them between agents"""
+
+    def __init__(
+        self,
+        url: Optional[str],
+        apikey: Optional[str],
+        project_id: Optional[str],
+        completion_cache: Any = None,
+    ):
+        self.url = url
+        self.apikey = apikey
+        self.project_id = project_id
+        self.completion_cache = completion_cache
+        self._lock = threading.Lock()
+        self._api_client: Any = None
+        self._api_client_seconds: Optional[float] = None
+        self._clients: Dict[Tuple[str, str], _ClientSlot] = {}
+
+    def llm(
+        self,
+        agent_name: str,
+        model_id: str,
+        params: Dict[str, Any],
+        streaming: bool = False,
+        callbacks: Optional[List[Any]] = None,
+    ) -> CachedWatsonxLLM:
+        """
+        Return an LLM for an agent without touching the network
+
+        The object skips WatsonxLLM's validator (which would authenticate immediately);
+        its `watsonx_model` is resolved from the registry on the first generate call.
+        """
+        key = client_key(model_id, params)
+        with self._lock:
+            slot = self._clients.get(key)
+            if slot is None:
+                slot = self._clients[key] = _ClientSlot(model_id, dict(params))
+            slot.agents.add(agent_name)
+
+        return CachedWatsonxLLM.construct(
+            model_id=model_id,
+            project_id=self.project_id or "",
+            params=dict(params),
+            streaming=streaming,
+            # Each LLM needs its own list: crewai appends per-agent handlers to it
+            callbacks=list(callbacks) if callbacks else None,
+            watsonx_model=None,
+            agent_name=agent_name,
+            completion_cache=self.completion_cache,
+            client_registry=self,
+            client_key=key,
+        )
+
+    def _get_api_client(self) -> Any:
+        """One authenticated APIClient (IAM token + HTTP session) for every model"""
+        if self._api_client is None:
+            with self._lock:
+                if self._api_client is None:
+                    from ibm_watsonx_ai import APIClient, Credentials
+
+                    started = time.perf_counter()
+                    self._api_client = APIClient(
+                        credentials=Credentials(url=self.url, api_key=self.apikey),
+                        project_id=self.project_id,
+                    )
+                    self._api_client_seconds = time.perf_counter() - started
+                    logger.info(f"Authenticated watsonx API client in {self._api_client_seconds:.2f}s")
+        return self._api_client
+
+    def model(self, key: Tuple[str, str]) -> Any:
+        """The shared ModelInference for `key`, created on first use"""
+        slot = self._clients[key]
+        if slot.model is None:
+            with slot.lock:
+                if slot.model is None:
+                    from ibm_watsonx_ai.foundation_models import ModelInference
+
+                    api_client = self._get_api_client()
+                    started = time.perf_counter()
+                    slot.model = ModelInference(
+                        model_id=slot.model_id,
+                        params=slot.params,
+                        api_client=api_client,
+                    )
+                    slot.init_seconds = time.perf_counter() - started
+                    logger.info(f"Created watsonx client for {slot.model_id} in {slot.init_seconds:.2f}s")
+        return slot.model
+
+    def warm(self):
+        """Create every registered client now instead of on the first request"""
+        for key in list(self._clients):
+            self.model(key)
+
+    def begin(self, key: Tuple[str, str]) -> float:
+        slot = self._clients[key]
+        with self._lock:
+            slot.in_flight += 1
+            slot.requests += 1
+            slot.peak_in_flight = max(slot.peak_in_flight, slot.in_flight)
+        return time.perf_counter()
+
+    def end(self, key: Tuple[str, str], started: float, error: Optional[BaseException] = None):
+        latency = time.perf_counter() - started
+        slot = self._clients[key]
+        with self._lock:
+            slot.in_flight -= 1
+            slot.total_latency += latency
+            slot.max_latency = max(slot.max_latency, latency)
+            if error is not None:
+                slot.errors += 1
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            clients = [
+                {
+                    "model_id": slot.model_id,
+                    "params": slot.params,
+                    "agents": sorted(slot.agents),
+                    "initialized": slot.model is not None,
+                    "init_seconds": round(slot.init_seconds, 3) if slot.init_seconds is not None else None,
+                    "in_flight": slot.in_flight,
+                    "peak_in_flight": slot.peak_in_flight,
+                    "requests": slot.requests,
+                    "errors": slot.errors,
+                    "avg_latency_ms": round(slot.total_latency / slot.requests * 1000, 1) if slot.requests else 0.0,
+                    "max_latency_ms": round(slot.max_latency * 1000, 1),
+                }
+                for slot in self._clients.values()
+            ]
+            return {
+                "authenticated": self._api_client is not None,
+                "auth_seconds": round(self._api_client_seconds, 3) if self._api_client_seconds is not None else None,
+                "clients": clients,
+            }
@@ -1,5 +1,6 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, WebSocket
+from fastapi import FastAPI, HTTPException, BackgroundTasks, WebSocket, Query, Header
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional, List
 import asyncio
@@ -10,12 +11,93 @@ import uuid
 import json
 
 from config import ChatConfig
-from chat_crew import chat_crew
+from executor import crew_executor, BackpressureError
+from streaming import TokenStream, current_token_stream
+from events import event_bus, RequestEvents, current_events, make_event
+from startup import Warmup
+from conversation_store import conversation_store
+from conversation_log import conversation_log
+from metrics import registry, MetricsMiddleware, CONTENT_TYPE as METRICS_CONTENT_TYPE, record_error
+from tracing import Tracer, JsonlExporter, current_span
+from token_usage import RequestUsage, current_usage, add_usage
+import token_usage
+from profiling import Profiler, ProfilingMiddleware, HeapTracker
 
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Heavy components (crewai, langchain, agents, crews) are loaded by the warmup thread
+# so the server can bind its port and answer /live straight away
+chat_crew = None
+exa_client = None
+completion_cache = None
+llm_registry = None
+local_router = None
+
+def load_agents():
+    """Import agents: EXA client, caches and the watsonx client registry"""
+    global exa_client, completion_cache, llm_registry
+    import agents
+    exa_client, completion_cache, llm_registry = agents.exa_client, agents.completion_cache, agents.llm_registry
+
+def load_router():
+    """Import and train the local router"""
+    global local_router
+    import router
+    local_router = router.local_router
+
+def load_chat_crew():
+    """Build the chat crew and prebuild its crew pool"""
+    global chat_crew
+    import chat_crew as chat_crew_module
+    chat_crew = chat_crew_module.chat_crew
+
+# Request traces: agent iterations, tool calls and watsonx calls per /chat request
+tracer = Tracer(
+    "chat",
+    JsonlExporter(ChatConfig.TRACE_DIR, max_queue=ChatConfig.TRACE_EXPORT_QUEUE) if ChatConfig.TRACE_DIR else None,
+    sample_rate=ChatConfig.TRACE_SAMPLE_RATE,
+    slow_seconds=ChatConfig.TRACE_SLOW_SECONDS,
+    max_spans=ChatConfig.TRACE_MAX_SPANS
+)
+
+# On-demand request profiles and heap snapshots, gated by PROFILE_TOKEN
+profiler = Profiler(
+    "chat",
+    ChatConfig.PROFILE_DIR,
+    token=ChatConfig.PROFILE_TOKEN,
+    interval=ChatConfig.PROFILE_INTERVAL,
+    max_seconds=ChatConfig.PROFILE_MAX_SECONDS,
+    keep=ChatConfig.PROFILE_KEEP
+)
+heap_tracker = HeapTracker(frames=ChatConfig.HEAP_TRACE_FRAMES, max_snapshots=ChatConfig.HEAP_MAX_SNAPSHOTS)
+
+warmup = Warmup("chat")
+warmup.step("import crewai", lambda: __import__("crewai"))
+warmup.step("import langchain", lambda: __import__("langchain_community.llms"))
+warmup.step("agents and caches", load_agents)
+warmup.step("local router", load_router)
+warmup.step("crew pool", load_chat_crew)
+if ChatConfig.WARMUP_CONNECT:
+    warmup.step("watsonx auth", lambda: llm_registry.warm(), retries=3)
+
+def require_profiling(token: Optional[str]):
+    """Heap and profile endpoints answer only to the profile token (404 while profiling is off)"""
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set PROFILE_TOKEN)")
+    if not profiler.authorized(token):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+def require_ready():
+    """Reject work that needs the crews until warmup has finished"""
+    if not warmup.ready:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "warming_up", "state": warmup.state},
+            headers={"Retry-After": "5"}
+        )
+
 # Validate configuration on startup
 try:
     ChatConfig.validate_config()
@@ -47,8 +129,35 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Store active WebSocket connections
-active_connections: Dict[str, WebSocket] = {}
+# Requests presenting the profile token are sampled and written to PROFILE_DIR
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+# Request counts, latency and in-flight requests for /metrics
+app.add_middleware(MetricsMiddleware)
+
+# Read at scrape time, so the request path does no extra work for these
+def crew_job_counts():
+    stats = crew_executor.stats()
+    return {"running": stats["running"], "queued": stats["queue_depth"]}
+
+registry.gauge("crew_jobs", "Crew jobs running on worker threads or waiting for one", ["state"]).set_function(crew_job_counts)
+registry.gauge("conversations_live", "Conversations held in memory").set_function(lambda: len(conversation_store))
+registry.gauge("event_subscribers", "Connected log WebSocket subscribers").set_function(
+    lambda: event_bus.stats()["subscribers"]
+)
+
+# Read with every heap snapshot, so a diff shows which of these grew alongside the allocations
+def conversation_memory():
+    stats = conversation_store.stats()
+    return {key: stats[key] for key in ("conversations", "turns", "bytes", "index_entries")}
+
+heap_tracker.add_probe("conversations", conversation_memory)
+heap_tracker.add_probe("crew_pool", lambda: chat_crew.pool.stats() if chat_crew else None)
+heap_tracker.add_probe("llm_cache", lambda: completion_cache.stats() if completion_cache else None)
+heap_tracker.add_probe("executor", crew_executor.stats)
+
+# The crews only look at the last few exchanges (see tasks.py), so only those are expanded
+CONTEXT_TURNS = 3
 
 # Pydantic models for request/response
 class ChatMessage(BaseModel):
@@ -77,36 +186,97 @@ class CrewInfoResponse(BaseModel):
     search_tools: list
     features: list
 
-# In-memory storage for conversations (in production, use proper database)
-conversations = {}
-chat_sessions = {}
-
 @app.websocket("/ws/{client_id}")
-async def websocket_endpoint(websocket: WebSocket, client_id: str):
+async def websocket_endpoint(websocket: WebSocket, client_id: str, policy: Optional[str] = None, batch: bool = False):
+    """
+    Stream the conversation's instrumentation events (agent steps, tool calls, answer chunks)
+
+    Any number of sockets may follow one conversation. Each gets its own bounded
+    buffer (`?policy=drop` or `?policy=coalesce` picks the overflow behaviour) and
+    receives one event per frame. Clients that opt in with `?batch=1` get bursts as
+    `batch` frames ({"type": "batch", "events": [...]}) and quiet periods as
+    `heartbeat` frames instead. Sockets idle for EVENT_IDLE_TIMEOUT are closed. A client that cannot keep up within
+    EVENT_SEND_TIMEOUT is disconnected rather than slowing anything else down.
+    """
     await websocket.accept()
-    active_connections[client_id] = websocket
+    subscription = event_bus.subscribe(client_id, policy=policy, batch=batch)
+
+    async def forward_events():
+        try:
+            async for frame in subscription.frames():
+                await asyncio.wait_for(websocket.send_json(frame), timeout=ChatConfig.EVENT_SEND_TIMEOUT)
+        except asyncio.TimeoutError:
+            subscription.evicted = "slow_consumer"
+        except Exception:
+            return
+        # Idle or too slow: close the socket so the receive loop below ends too
+        try:
+            await websocket.close()
+        except Exception:
+            pass
+
+    sender = asyncio.create_task(forward_events())
     try:
         while True:
-            # Keep connection alive
+            # Client messages (e.g. pings) count as activity; raises once the client disconnects
             await websocket.receive_text()
+            subscription.touch()
     except:
-        if client_id in active_connections:
-            del active_connections[client_id]
+        pass
+    finally:
+        event_bus.unsubscribe(subscription)
+        sender.cancel()
 
-async def send_log_update(client_id: str, log_type: str, data: Dict[str, Any], message: str = None, agent: str = None, hierarchy: int = None):
-    """Send a log update to the connected WebSocket client"""
-    if client_id in active_connections:
-        try:
-            await active_connections[client_id].send_json({
-                "type": log_type,
-                "data": data,
-                "message": message,
-                "agent": agent,
-                "hierarchy": hierarchy,
-                "timestamp": datetime.now().isoformat()
-            })
-        except:
-            logger.error(f"Error sending log update to client {client_id}")
+def send_log_update(client_id: str, log_type: str, data: Dict[str, Any], message: str = None, agent: str = None, hierarchy: int = None):
+    """Publish a log event to the client's WebSocket subscribers (never blocks)"""
+    event_bus.publish(client_id, make_event(log_type, data, message, agent, hierarchy))
+
+async def forward_chunks_to_websocket(client_id: str, stream: TokenStream):
+    """Relay streamed answer tokens to the client's log WebSocket as they arrive"""
+    async for chunk in stream:
+        send_log_update(client_id, "response_chunk", {"content": chunk})
+
+def store_conversation_turn(conversation_id: str, message: str, result: Dict[str, Any]):
+    """Append a completed exchange to the conversation (the store trims old turns)"""
+    conversation_store.append(conversation_id, {
+        "user": message,
+        "assistant": result["response"],
+        "timestamp": datetime.now().isoformat(),
+        "metadata": result.get("metadata", {})
+    })
+
+def trace_result(root, result: Dict[str, Any]):
+    """Tag the response with its trace id; a failed result keeps the trace like an exception would"""
+    result.setdefault("metadata", {})["trace_id"] = root.trace.trace_id
+    if not result.get("success"):
+        root.record_error(result.get("error", "chat failed"))
+
+def usage_result(usage: RequestUsage, result: Dict[str, Any]):
+    """Report the request's token usage in its metadata and metrics"""
+    result.setdefault("metadata", {})["token_usage"] = usage.summary()
+    usage.finish()
+
+def finish_usage(usage: RequestUsage, job: asyncio.Future):
+    """Report a streaming request's token usage once its crew job has finished"""
+    if job.cancelled() or job.exception() is not None:
+        usage.finish()
+    else:
+        usage_result(usage, job.result())
+
+def finish_trace(root, job: asyncio.Future):
+    """End a streaming request's trace once its crew job has finished"""
+    if job.cancelled():
+        root.set(cancelled=True)
+        root.end()
+    elif job.exception() is not None:
+        root.end(job.exception())
+    else:
+        trace_result(root, job.result())
+        root.end()
+
+def sse_event(event: str, data: Dict[str, Any]) -> str:
+    """Format a server-sent event frame"""
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
 
 @app.get("/")
 async def root():
@@ -117,26 +287,211 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "chat": "/chat",
+            "chat_stream": "/chat/stream",
             "conversation": "/conversation/{conversation_id}",
             "crew_info": "/crew/info",
             "health": "/health",
+            "live": "/live",
+            "ready": "/ready",
+            "executor_stats": "/executor/stats",
+            "search_stats": "/search/stats",
+            "llm_stats": "/llm/stats",
+            "llm_clients": "/llm/clients",
+            "router_stats": "/router/stats",
+            "speculation_stats": "/speculation/stats",
+            "research_stats": "/research/stats",
+            "event_stats": "/events/stats",
+            "trace_stats": "/traces/stats",
+            "token_stats": "/tokens/stats",
+            "profile_stats": "/profiles/stats",
+            "heap": "/heap",
+            "conversation_stats": "/conversations/stats",
+            "metrics": "/metrics",
             "websocket": "/ws/{client_id}"
         }
     }
 
+@app.on_event("startup")
+async def start_warmup():
+    """Warm up in the background (LAZY_STARTUP) or before accepting traffic"""
+    if conversation_log is not None:
+        # Replay persisted history before the first request can read it
+        await asyncio.get_running_loop().run_in_executor(None, conversation_log.open, conversation_store)
+    conversation_store.start_sweeper()
+    tracer.start()
+    if ChatConfig.LAZY_STARTUP:
+        warmup.start()
+    else:
+        await asyncio.get_running_loop().run_in_executor(None, warmup.run)
+
+@app.get("/live")
+async def liveness():
+    """Liveness probe: the process is up and serving HTTP"""
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 200 only once crews are built and watsonx is reachable"""
+    status = warmup.status()
+    if not warmup.ready:
+        return JSONResponse(status_code=503, content=status)
+    return status
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    return JSONResponse(
+        status_code=503 if warmup.state == "failed" else 200,
+        content={
+            "status": "healthy" if warmup.ready else warmup.state,
+            "timestamp": datetime.now().isoformat(),
+            "config_valid": True,
+            "agents_ready": warmup.ready,
+            "warmup": warmup.status(),
+            "executor": crew_executor.stats()
+        }
+    )
+
+@app.get("/executor/stats")
+async def executor_stats():
+    """Crew worker pool utilisation, queue depth and wait-time metrics"""
+    require_ready()
+    return {**crew_executor.stats(), "crew_pool": chat_crew.pool.stats()}
+
+@app.get("/search/stats")
+async def search_stats():
+    """EXA connection pool utilisation and latency"""
+    require_ready()
+    return exa_client.stats()
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """Completion cache size and per-agent hit rates"""
+    require_ready()
+    return completion_cache.stats() if completion_cache else {"enabled": False}
+
+@app.get("/llm/clients")
+async def llm_clients():
+    """Shared watsonx clients: which agents use them, in-flight calls and latency"""
+    require_ready()
+    return llm_registry.stats()
+
+@app.get("/router/stats")
+async def router_stats():
+    """Local routing decisions, latency and LLM fallback rate"""
+    require_ready()
+    return local_router.stats()
+
+@app.get("/speculation/stats")
+async def speculation_stats():
+    """Latency saved versus work wasted by speculative branches"""
+    require_ready()
+    return {"mode": chat_crew.speculative_mode, **chat_crew.speculation.stats()}
+
+@app.get("/research/stats")
+async def research_stats():
+    """Concurrent research fan-out: wall time versus the serial equivalent"""
+    require_ready()
+    return chat_crew.research.stats()
+
+@app.get("/events/stats")
+async def event_stats():
+    """Log WebSocket subscribers and events published/delivered"""
+    return event_bus.stats()
+
+@app.get("/traces/stats")
+async def trace_stats():
+    """Traces started, kept (sampled, slow, failed) and written by the JSONL exporter"""
+    return tracer.stats()
+
+@app.get("/tokens/stats")
+async def token_stats():
+    """watsonx tokens since startup per endpoint and agent, and the per-request budget"""
+    return {"budget_per_request": ChatConfig.TOKEN_BUDGET or None, **token_usage.stats()}
+
+@app.get("/profiles/stats")
+async def profile_stats():
+    """Request profiles written (newest first), and whether one is being sampled now"""
+    return profiler.stats()
+
+@app.get("/heap")
+async def heap_status(x_profile_token: Optional[str] = Header(None)):
+    """tracemalloc state, kept snapshots and the current probe readings"""
+    require_profiling(x_profile_token)
+    return heap_tracker.status()
+
+@app.post("/heap/snapshot")
+async def heap_snapshot(limit: int = Query(25, ge=1, le=500), x_profile_token: Optional[str] = Header(None)):
+    """
+    Take a tracemalloc snapshot: top allocations by line and package, diffed against the previous
+
+    The first call starts tracemalloc, so it is the baseline; allocations made earlier are not seen.
+    """
+    require_profiling(x_profile_token)
+    return await asyncio.get_running_loop().run_in_executor(None, heap_tracker.snapshot, limit)
+
+@app.get("/heap/diff")
+async def heap_diff(
+    base: Optional[int] = None,
+    target: Optional[int] = None,
+    group_by: str = "lineno",
+    filter: Optional[str] = None,
+    limit: int = Query(25, ge=1, le=500),
+    x_profile_token: Optional[str] = Header(None)
+):
+    """
+    Allocation growth between two snapshots (oldest and newest kept by default)
+
+    `group_by` is lineno, traceback or filename; `filter` keeps allocations made in matching
+    files, e.g. `conversation_store` for history or `crewai/memory` for crew memory.
+    """
+    require_profiling(x_profile_token)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, heap_tracker.diff, base, target, group_by, limit, filter
+        )
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+@app.delete("/heap")
+async def heap_stop(x_profile_token: Optional[str] = Header(None)):
+    """Stop tracemalloc (it slows every allocation) and drop the kept snapshots"""
+    require_profiling(x_profile_token)
+    return {"tracing": False, "snapshots_dropped": heap_tracker.stop()}
+
+@app.get("/conversations/stats")
+async def conversation_stats():
+    """Live conversations, bytes held, TTL/LRU evictions and write-ahead log activity"""
     return {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "config_valid": True,
-        "agents_ready": True
+        **conversation_store.stats(),
+        "persistence": conversation_log.stats() if conversation_log is not None else {"enabled": False}
     }
 
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition: stage latency histograms, routing/error counters, in-flight gauges"""
+    return PlainTextResponse(registry.render(), media_type=METRICS_CONTENT_TYPE)
+
+@app.on_event("shutdown")
+async def shutdown_executor():
+    """Release crew worker threads and pooled EXA connections on shutdown"""
+    crew_executor.shutdown()
+    conversation_store.stop_sweeper()
+    if conversation_log is not None:
+        conversation_log.close()
+    tracer.close()
+    if chat_crew is not None:
+        chat_crew.speculation.shutdown()
+        chat_crew.research.shutdown()
+    if exa_client is not None:
+        await exa_client.aclose()
+
 @app.get("/crew/info", response_model=CrewInfoResponse)
 async def get_crew_info():
     """Get information about the CrewAI setup"""
+    require_ready()
     try:
         info = chat_crew.get_crew_info()
         return CrewInfoResponse(**info)
@@ -145,10 +500,14 @@ async def get_crew_info():
         raise HTTPException(status_code=500, detail=f"Error getting crew info: {str(e)}")
 
 @app.post("/chat", response_model=ChatResponse)
-async def chat_endpoint(request: ChatMessage):
+async def chat_endpoint(request: ChatMessage, traceparent: Optional[str] = Header(None)):
     """
     Main chat endpoint for processing user messages
+
+    Agent steps, tool calls and answer chunks are published to the conversation's
+    log WebSocket as they happen; nothing here waits on the socket.
     """
+    require_ready()
     try:
         logger.info(f"Received chat message: {request.message[:100]}...")
         
@@ -156,225 +515,71 @@ async def chat_endpoint(request: ChatMessage):
         conversation_id = request.conversation_id or str(uuid.uuid4())
         
         # Get conversation history
-        conversation_history = conversations.get(conversation_id, [])
-        
-        # Send initial log updates
-        if conversation_id in active_connections:
-            await send_log_update(
-                conversation_id,
-                "user_input",
-                {"message": request.message},
-                f"User sent: {request.message}"
-            )
-
-            # Send workflow initialization log
-            if request.force_research:
-                await send_log_update(
-                    conversation_id,
-                    "agent_hierarchy",
-                    {
-                        "mode": "research",
-                        "expected_agents": ["Context Analyzer", "EXA Search Tool", "Conversational AI Assistant"]
-                    },
-                    "Initializing research workflow: Context Analysis → Web Search → Response Generation"
-                )
-                
-                await asyncio.sleep(0.2)  # Small delay for visual effect
-                
-                await send_log_update(
-                    conversation_id,
-                    "agent_start",
-                    {
-                        "agent": "Context Analyzer",
-                        "step": 1,
-                        "total_steps": 3
-                    },
-                    "Analyzing user query context and determining research strategy...",
-                    "Context Analyzer",
-                    0
-                )
-            else:
-                await send_log_update(
-                    conversation_id,
-                    "agent_hierarchy",
-                    {
-                        "mode": "simple",
-                        "expected_agents": ["Conversational AI Assistant"]
-                    },
-                    "Initializing simple chat workflow: Direct Response Generation"
-                )
-                
-                await asyncio.sleep(0.1)  # Small delay for visual effect
-                
-                await send_log_update(
-                    conversation_id,
-                    "agent_start",
-                    {
-                        "agent": "Conversational AI Assistant",
-                        "step": 1,
-                        "total_steps": 1
-                    },
-                    "Processing conversational response using IBM Granite-3-8B...",
-                    "Conversational AI Assistant",
-                    0
-                )
+        conversation_history = conversation_store.history(conversation_id, last=CONTEXT_TURNS)
         
-        # Process the chat message
-        result = chat_crew.chat(
-            user_message=request.message,
-            conversation_history=conversation_history,
-            force_simple=request.force_simple,
-            force_research=request.force_research
+        send_log_update(
+            conversation_id,
+            "user_input",
+            {"message": request.message},
+            f"User sent: {request.message}"
         )
         
-        if result["success"]:
-            # Send API call log
-            if conversation_id in active_connections:
-                await send_log_update(
-                    conversation_id,
-                    "api_call",
-                    {
-                        "model": "IBM Granite-3-8B",
-                        "think_mode": request.force_research,
-                        "force_research": request.force_research,
-                        "timestamp": datetime.now().isoformat()
-                    },
-                    f"Sending request to chat API {request.force_research and '[RESEARCH MODE]' or '[SIMPLE MODE]'}"
+        # Process the chat message on the crew worker pool so the event loop stays free.
+        # With a log socket connected, answer tokens are pushed to it as response_chunk events.
+        stream = None
+        forwarder = None
+        if event_bus.has_subscribers(conversation_id):
+            stream = TokenStream(asyncio.get_running_loop())
+            forwarder = asyncio.create_task(forward_chunks_to_websocket(conversation_id, stream))
+        stream_token = current_token_stream.set(stream)
+        events_token = current_events.set(RequestEvents(event_bus, conversation_id))
+        usage = RequestUsage("chat", ChatConfig.TOKEN_BUDGET, conversation_id)
+        usage_token = current_usage.set(usage)
+        try:
+            with tracer.trace(
+                "chat",
+                traceparent,
+                conversation_id=conversation_id,
+                message_chars=len(request.message),
+                force_research=request.force_research
+            ) as root:
+                result = await crew_executor.run(
+                    chat_crew.chat,
+                    user_message=request.message,
+                    conversation_history=conversation_history,
+                    force_simple=request.force_simple,
+                    force_research=request.force_research
                 )
-
-                # If research mode, show additional agent steps
-                if request.force_research:
-                    await asyncio.sleep(0.8)  # Delay for visual effect
-                    await send_log_update(
-                        conversation_id,
-                        "agent_complete",
-                        {
-                            "agent": "Context Analyzer",
-                            "step": 1,
-                            "total_steps": 3
-                        },
-                        "Context analysis complete - research keywords detected, proceeding to search",
-                        "Context Analyzer",
-                        0
-                    )
-                    
-                    await asyncio.sleep(0.3)
-                    await send_log_update(
-                        conversation_id,
-                        "agent_start",
-                        {
-                            "agent": "EXA Search Tool",
-                            "step": 2,
-                            "total_steps": 3
-                        },
-                        "Initiating semantic web search for real-time information...",
-                        "EXA Search Tool",
-                        1
-                    )
-                    
-                    await asyncio.sleep(0.5)
-                    await send_log_update(
-                        conversation_id,
-                        "agent_complete",
-                        {
-                            "agent": "EXA Search Tool",
-                            "step": 2,
-                            "total_steps": 3
-                        },
-                        "Web search complete - relevant information retrieved, synthesizing response",
-                        "EXA Search Tool",
-                        1
-                    )
-                    
-                    await asyncio.sleep(0.2)
-                    await send_log_update(
-                        conversation_id,
-                        "agent_start",
-                        {
-                            "agent": "Conversational AI Assistant",
-                            "step": 3,
-                            "total_steps": 3
-                        },
-                        "Generating research-enhanced response using IBM Granite-3-8B...",
-                        "Conversational AI Assistant",
-                        2
-                    )
-
+                usage_result(usage, result)
+                if root is not None:
+                    trace_result(root, result)
+        finally:
+            current_usage.reset(usage_token)
+            current_events.reset(events_token)
+            current_token_stream.reset(stream_token)
+            if stream:
+                stream.close()
+                await forwarder
+        
+        if result["success"]:
             # Store the conversation
-            if conversation_id not in conversations:
-                conversations[conversation_id] = []
-            
-            conversations[conversation_id].append({
-                "user": request.message,
-                "assistant": result["response"],
-                "timestamp": datetime.now().isoformat(),
-                "metadata": result.get("metadata", {})
-            })
+            store_conversation_turn(conversation_id, request.message, result)
             
-            # Limit conversation history
-            if len(conversations[conversation_id]) > ChatConfig.MAX_CONVERSATION_HISTORY:
-                conversations[conversation_id] = conversations[conversation_id][-ChatConfig.MAX_CONVERSATION_HISTORY:]
-            
-            # Send completion logs
-            if conversation_id in active_connections:
-                await asyncio.sleep(0.3)  # Small delay for visual effect
-                if request.force_research:
-                    await send_log_update(
-                        conversation_id,
-                        "agent_complete",
-                        {
-                            "agent": "Conversational AI Assistant",
-                            "step": 3,
-                            "total_steps": 3
-                        },
-                        "Research-enhanced response generated successfully",
-                        "Conversational AI Assistant",
-                        2
-                    )
-                else:
-                    await send_log_update(
-                        conversation_id,
-                        "agent_complete",
-                        {
-                            "agent": "Conversational AI Assistant",
-                            "step": 1,
-                            "total_steps": 1
-                        },
-                        "Conversational response generated successfully",
-                        "Conversational AI Assistant",
-                        0
-                    )
-
-                await asyncio.sleep(0.2)
-                await send_log_update(
-                    conversation_id,
-                    "response",
-                    {
-                        "content": result["response"],
-                        "type": result.get("metadata", {}).get("response_type", "unknown"),
-                        "research_used": result.get("metadata", {}).get("research_used", False),
-                        "agents_used": result.get("metadata", {}).get("agents_used", []),
-                        "response_length": len(result["response"]),
-                        "think_mode_was_on": request.force_research
-                    },
-                    f"Response ready: {len(result['response'])} characters {'with web search data' if result.get('metadata', {}).get('research_used', False) else 'from knowledge base'}"
-                )
-
-                # Log research summary if available
-                if result.get("metadata", {}).get("research_used") and request.force_research:
-                    await asyncio.sleep(0.1)
-                    await send_log_update(
-                        conversation_id,
-                        "response",
-                        {
-                            "research_summary": {
-                                "search_results_length": result.get("metadata", {}).get("search_results_length", 0),
-                                "sources_found": result.get("metadata", {}).get("sources_found", 0),
-                                "search_query": result.get("metadata", {}).get("search_query")
-                            }
-                        },
-                        f"Research summary: {result.get('metadata', {}).get('search_results_length', 0)} chars from web search, query: \"{result.get('metadata', {}).get('search_query', '')}\""
-                    )
+            metadata = result.get("metadata", {})
+            send_log_update(
+                conversation_id,
+                "response",
+                {
+                    "content": result["response"],
+                    "type": metadata.get("response_type", "unknown"),
+                    "research_used": metadata.get("research_used", False),
+                    "agents_used": metadata.get("agents_used", []),
+                    "sources_found": len(metadata.get("sources", [])),
+                    "response_length": len(result["response"]),
+                    "think_mode_was_on": request.force_research
+                },
+                f"Response ready: {len(result['response'])} characters {'with web search data' if metadata.get('research_used', False) else 'from knowledge base'}"
+            )
             
             return ChatResponse(
                 success=True,
@@ -385,13 +590,12 @@ async def chat_endpoint(request: ChatMessage):
                 timestamp=datetime.now().isoformat()
             )
         else:
-            if conversation_id in active_connections:
-                await send_log_update(
-                    conversation_id,
-                    "error",
-                    {"error": result.get("error", "Unknown error")},
-                    "Chat processing failed"
-                )
+            send_log_update(
+                conversation_id,
+                "error",
+                {"error": result.get("error", "Unknown error")},
+                "Chat processing failed"
+            )
             
             return ChatResponse(
                 success=False,
@@ -402,29 +606,158 @@ async def chat_endpoint(request: ChatMessage):
                 timestamp=datetime.now().isoformat()
             )
         
+    except BackpressureError as e:
+        logger.warning(f"Rejecting chat request: {str(e)}")
+        record_error(e, "admission")
+        send_log_update(
+            conversation_id,
+            "error",
+            {"error": str(e), "retry_after": e.retry_after},
+            "Chat service is busy"
+        )
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "error": "Chat service is at capacity, please retry shortly",
+                "reason": str(e),
+                "retry_after": e.retry_after,
+                "queue_depth": crew_executor.stats()["queue_depth"]
+            },
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         logger.error(f"Error processing chat request: {str(e)}")
-        if conversation_id in active_connections:
-            await send_log_update(
-                conversation_id,
-                "error",
-                {"error": str(e)},
-                "Chat API error"
-            )
+        send_log_update(
+            conversation_id,
+            "error",
+            {"error": str(e)},
+            "Chat API error"
+        )
         raise HTTPException(status_code=500, detail=f"Error processing chat: {str(e)}")
 
+@app.post("/chat/stream")
+async def chat_stream_endpoint(request: ChatMessage, traceparent: Optional[str] = Header(None)):
+    """
+    Streaming chat endpoint (server-sent events)
+
+    Emits a `start` frame, then `response_chunk` frames as the LLM generates the
+    answer, and a `final` frame with the full response and metadata (sources,
+    agent hierarchy). The same chunks are mirrored to a connected log WebSocket.
+    """
+    require_ready()
+    logger.info(f"Received streaming chat message: {request.message[:100]}...")
+    conversation_id = request.conversation_id or str(uuid.uuid4())
+    conversation_history = conversation_store.history(conversation_id, last=CONTEXT_TURNS)
+
+    send_log_update(conversation_id, "user_input", {"message": request.message}, f"User sent: {request.message}")
+    stream = TokenStream(asyncio.get_running_loop())
+    stream_token = current_token_stream.set(stream)
+    events_token = current_events.set(RequestEvents(event_bus, conversation_id))
+    # The trace ends when the crew job does, not when this handler returns
+    root = tracer.start_trace(
+        "chat.stream",
+        traceparent,
+        conversation_id=conversation_id,
+        message_chars=len(request.message),
+        force_research=request.force_research
+    )
+    span_token = current_span.set(root)
+    usage = RequestUsage("chat_stream", ChatConfig.TOKEN_BUDGET, conversation_id)
+    usage_token = current_usage.set(usage)
+    try:
+        # Admission happens here so a saturated pool answers 503 before streaming starts
+        job = crew_executor.submit(
+            chat_crew.chat,
+            user_message=request.message,
+            conversation_history=conversation_history,
+            force_simple=request.force_simple,
+            force_research=request.force_research
+        )
+    except BackpressureError as e:
+        logger.warning(f"Rejecting streaming chat request: {str(e)}")
+        record_error(e, "admission")
+        if root is not None:
+            root.end(e)
+        raise HTTPException(
+            status_code=503,
+            detail={
+                "error": "Chat service is at capacity, please retry shortly",
+                "reason": str(e),
+                "retry_after": e.retry_after,
+                "queue_depth": crew_executor.stats()["queue_depth"]
+            },
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    finally:
+        current_usage.reset(usage_token)
+        current_span.reset(span_token)
+        current_events.reset(events_token)
+        current_token_stream.reset(stream_token)
+    job.add_done_callback(lambda _: stream.close())
+    job.add_done_callback(lambda done: finish_usage(usage, done))
+    if root is not None:
+        job.add_done_callback(lambda done: finish_trace(root, done))
+
+    async def event_stream():
+        try:
+            yield sse_event("start", {
+                "conversation_id": conversation_id,
+                "message": request.message,
+                "timestamp": datetime.now().isoformat()
+            })
+
+            async for chunk in stream:
+                send_log_update(conversation_id, "response_chunk", {"content": chunk})
+                yield sse_event("response_chunk", {"content": chunk})
+
+            try:
+                result = await job
+            except Exception as e:
+                logger.error(f"Error processing streaming chat request: {str(e)}")
+                yield sse_event("error", {"conversation_id": conversation_id, "error": str(e)})
+                return
+
+            if result["success"]:
+                store_conversation_turn(conversation_id, request.message, result)
+
+            yield sse_event("final", {
+                "success": result["success"],
+                "conversation_id": conversation_id,
+                "response": result["response"],
+                "metadata": result.get("metadata"),
+                "error": result.get("error"),
+                "chunks_streamed": stream.chunks_sent,
+                "timestamp": datetime.now().isoformat()
+            })
+        finally:
+            # Client disconnected mid-stream: drop the job if it has not started yet
+            job.cancel()
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 @app.get("/conversation/{conversation_id}")
 async def get_conversation(conversation_id: str):
     """Get conversation history for a specific conversation ID"""
     try:
-        if conversation_id not in conversations:
+        history = conversation_store.get(conversation_id)
+        if history is None:
             raise HTTPException(status_code=404, detail="Conversation not found")
         
+        # Each turn's metadata carries the token usage of the request that produced it
+        usage = {}
+        for turn in history:
+            add_usage(usage, turn.get("metadata", {}).get("token_usage"))
+        
         return {
             "conversation_id": conversation_id,
-            "history": conversations[conversation_id],
-            "message_count": len(conversations[conversation_id]),
-            "last_updated": conversations[conversation_id][-1]["timestamp"] if conversations[conversation_id] else None
+            "history": history,
+            "message_count": len(history),
+            "last_updated": history[-1]["timestamp"] if history else None,
+            "token_usage": usage
         }
         
     except HTTPException:
@@ -437,11 +770,9 @@ async def get_conversation(conversation_id: str):
 async def clear_conversation(conversation_id: str):
     """Clear a specific conversation history"""
     try:
-        if conversation_id not in conversations:
+        if not conversation_store.delete(conversation_id):
             raise HTTPException(status_code=404, detail="Conversation not found")
         
-        del conversations[conversation_id]
-        
         return {
             "message": f"Conversation {conversation_id} cleared successfully",
             "timestamp": datetime.now().isoformat()
@@ -454,22 +785,38 @@ async def clear_conversation(conversation_id: str):
         raise HTTPException(status_code=500, detail=f"Error clearing conversation: {str(e)}")
 
 @app.get("/conversations")
-async def list_conversations():
-    """List all active conversations"""
+async def list_conversations(
+    limit: int = Query(50, ge=1, le=ChatConfig.CONVERSATION_PAGE_MAX),
+    after: Optional[str] = None,
+    since: Optional[str] = None
+):
+    """
+    List active conversations, most recently updated first
+
+    Pass the returned `next_cursor` as `after` to fetch the next page, and an ISO
+    timestamp as `since` to only list conversations updated at or after it.
+    """
+    try:
+        page, next_cursor = conversation_store.page(limit=limit, after=after, since=since)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid cursor or since timestamp: {str(e)}")
+
     try:
         conversation_list = []
-        for conv_id, history in conversations.items():
-            if history:  # Only include conversations with messages
-                conversation_list.append({
-                    "conversation_id": conv_id,
-                    "message_count": len(history),
-                    "last_message": history[-1]["user"][:50] + "..." if len(history[-1]["user"]) > 50 else history[-1]["user"],
-                    "last_updated": history[-1]["timestamp"]
-                })
+        for conv_id, message_count, last_turn in page:
+            last_message = last_turn["user"] or ""
+            conversation_list.append({
+                "conversation_id": conv_id,
+                "message_count": message_count,
+                "last_message": last_message[:50] + "..." if len(last_message) > 50 else last_message,
+                "last_updated": last_turn["timestamp"]
+            })
         
         return {
             "conversations": conversation_list,
-            "total_count": len(conversation_list)
+            "count": len(conversation_list),
+            "total_count": len(conversation_store),
+            "next_cursor": next_cursor
         }
         
     except Exception as e:
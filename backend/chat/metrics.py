@@ -0,0 +1,323 @@
+"""
+Prometheus-style metrics: counters, gauges and latency histograms served as text.
+
+Recording happens on the request path (middleware, pipeline stages, worker threads),
+so it must not contend. Every metric keeps one shard per thread: a thread registers
+its shard under the lock the first time it records, and after that increments only
+its own dict. Collection sums the shards, so a scrape never blocks a request.
+
+    with track_stage("exa_search"):
+        results = search()
+    routing_decisions.inc("research", "local")
+
+Kept identical in backend/chat and backend/explore; change both copies together.
+"""
+
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# Seconds; spans fast cache hits up to multi-minute crew runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0, 300.0)
+
+LabelValues = Tuple[str, ...]
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value == -math.inf:
+        return "-Inf"
+    if isinstance(value, int) or float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values)) + "}"
+
+
+class _Metric:
+    """Shared shard bookkeeping; subclasses define what a shard entry holds"""
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._local = threading.local()
+        self._shards: List[Dict[LabelValues, Any]] = []
+        self._lock = threading.Lock()
+
+    def _shard(self) -> Dict[LabelValues, Any]:
+        """This thread's shard; only the first call from a thread takes the lock"""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._local.shard = {}
+            with self._lock:
+                self._shards.append(shard)
+            return shard
+
+    def _snapshots(self) -> List[Dict[LabelValues, Any]]:
+        with self._lock:
+            shards = list(self._shards)
+        # dict() of a plain dict runs without releasing the GIL, so each copy is consistent
+        return [dict(shard) for shard in shards]
+
+    def samples(self) -> Iterator[Tuple[str, LabelValues, Tuple[str, ...], float]]:
+        """(suffix, label values, extra label pairs, value) for every series"""
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {_escape(self.documentation)}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, extra, value in self.samples():
+            names = self.labelnames + tuple(extra[0::2])
+            values = labels + tuple(extra[1::2])
+            lines.append(f"{self.name}{suffix}{_format_labels(names, values)} {_format_value(value)}")
+        return lines
+
+
+class Counter(_Metric):
+    """Monotonic count per label combination (name it `..._total`)"""
+
+    kind = "counter"
+
+    def inc(self, *labels: str, amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def values(self) -> Dict[LabelValues, float]:
+        totals: Dict[LabelValues, float] = {}
+        for shard in self._snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        return totals
+
+    def samples(self):
+        for labels, value in sorted(self.values().items()):
+            yield "", labels, (), value
+
+
+class Gauge(_Metric):
+    """
+    Value that goes up and down
+
+    `inc`/`dec` are sharded like counters (the value is the sum of every thread's
+    deltas), so a request may enter on one thread and leave on another.
+    `set_function` reports a value read at scrape time instead, e.g. a queue depth;
+    the function returns a number, or a dict of label values -> number.
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function: Optional[Callable[[], Any]] = None
+
+    def inc(self, *labels: str, amount: float = 1):
+        shard = self._shard()
+        shard[labels] = shard.get(labels, 0) + amount
+
+    def dec(self, *labels: str, amount: float = 1):
+        self.inc(*labels, amount=-amount)
+
+    @contextmanager
+    def track_inprogress(self, *labels: str) -> Iterator[None]:
+        self.inc(*labels)
+        try:
+            yield
+        finally:
+            self.dec(*labels)
+
+    def set_function(self, function: Callable[[], Any]):
+        self._function = function
+
+    def values(self) -> Dict[LabelValues, float]:
+        if self._function is not None:
+            try:
+                value = self._function()
+            except Exception:
+                return {}
+            if isinstance(value, dict):
+                return {labels if isinstance(labels, tuple) else (labels,): v for labels, v in value.items()}
+            return {(): value}
+        totals: Dict[LabelValues, float] = {}
+        for shard in self._snapshots():
+            for labels, value in shard.items():
+                totals[labels] = totals.get(labels, 0) + value
+        if not totals and not self.labelnames:
+            totals[()] = 0
+        return totals
+
+    def samples(self):
+        for labels, value in sorted(self.values().items()):
+            yield "", labels, (), value
+
+
+class Histogram(_Metric):
+    """
+    Distribution of observed values over fixed upper bounds
+
+    Each shard entry is a list of per-bucket counts (not cumulative, so an observation
+    touches one slot) followed by the running sum; cumulative counts are built at scrape.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(float(b) for b in buckets if b != math.inf))
+        self._slots = len(self.buckets) + 1
+
+    def observe(self, value: float, *labels: str):
+        shard = self._shard()
+        entry = shard.get(labels)
+        if entry is None:
+            entry = shard[labels] = [0] * self._slots + [0.0]
+        entry[bisect_left(self.buckets, value)] += 1
+        entry[-1] += value
+
+    @contextmanager
+    def time(self, *labels: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, *labels)
+
+    def values(self) -> Dict[LabelValues, List[float]]:
+        totals: Dict[LabelValues, List[float]] = {}
+        for shard in self._snapshots():
+            for labels, entry in shard.items():
+                entry = list(entry)
+                total = totals.get(labels)
+                if total is None:
+                    totals[labels] = entry
+                else:
+                    for i, value in enumerate(entry):
+                        total[i] += value
+        return totals
+
+    def samples(self):
+        for labels, entry in sorted(self.values().items()):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), entry[:-1]):
+                cumulative += count
+                yield "_bucket", labels, ("le", _format_value(bound)), cumulative
+            yield "_sum", labels, (), entry[-1]
+            yield "_count", labels, (), cumulative
+
+
+class MetricsRegistry:
+    """Named metrics rendered together in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: _Metric) -> Any:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                    raise ValueError(f"Metric {metric.name} is already registered differently")
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        with self._lock:
+            metrics = sorted(self._metrics.values(), key=lambda metric: metric.name)
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Metrics both services record
+pipeline_stage_seconds = registry.histogram(
+    "pipeline_stage_seconds", "Latency of each pipeline stage (LLM kickoffs, EXA search, routing)", ["stage"]
+)
+errors = registry.counter("errors_total", "Errors by exception type and the stage that raised them", ["type", "stage"])
+http_requests = registry.counter("http_requests_total", "HTTP requests by method, route template and status", ["method", "route", "status"])
+http_request_seconds = registry.histogram("http_request_seconds", "HTTP request latency by route template", ["method", "route"])
+http_requests_in_flight = registry.gauge("http_requests_in_flight", "HTTP requests currently being handled")
+
+
+def record_error(error: BaseException, stage: str):
+    errors.inc(type(error).__name__, stage)
+
+
+@contextmanager
+def track_stage(stage: str) -> Iterator[None]:
+    """Time a pipeline stage; an exception is counted against the stage and re-raised"""
+    started = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        record_error(e, stage)
+        raise
+    finally:
+        pipeline_stage_seconds.observe(time.perf_counter() - started, stage)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request counts, latency and in-flight requests
+
+    Routes are labelled by their template (`/explore/jobs/{job_id}`) rather than the
+    raw path so label cardinality stays bounded; unmatched paths share one label.
+    Streaming responses are timed until their last body chunk has been sent.
+    """
+
+    def __init__(self, app: Any, registry: MetricsRegistry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message: Dict[str, Any]):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        http_requests_in_flight.inc()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            http_requests_in_flight.dec()
+            route = scope.get("route")
+            template = getattr(route, "path", None) or "unmatched"
+            method = scope.get("method", "")
+            http_requests.inc(method, template, str(status[0]))
+            http_request_seconds.observe(time.perf_counter() - started, method, template)
@@ -0,0 +1,566 @@
+"""
+On-demand profiling: a sampling profiler for single requests and tracemalloc heap snapshots.
+
+Both stay off until a profile token is configured, and every use must present it.
+A request carrying the token (an `X-Profile-Token` header or `?profile=<token>`) runs
+under a stack sampler until its response has been sent. Every `interval` seconds the
+sampler reads the stack of every thread with `sys._current_frames()`, so crew worker
+threads, EXA fan-out threads and the event loop all show up, each rooted at its thread
+name. Two profiles are written, in the collapsed-stack format that flamegraph.pl,
+speedscope and inferno read directly:
+
+    <service>-<time>-<id>.wall.folded   one count per sample: where time went, waiting included
+    <service>-<time>-<id>.cpu.folded    microseconds of CPU each thread burned under that stack
+    <service>-<time>-<id>.json          request, durations, per-thread totals, hottest functions
+
+The sampler profiles the whole process, so requests running alongside appear too;
+only one profile runs at a time. The heap tracker starts tracemalloc on the first
+snapshot and compares snapshots by line, traceback or file, together with probes
+(e.g. conversations held) that the service registers, to find what keeps growing.
+
+Kept identical in backend/chat and backend/explore; change both copies together.
+"""
+
+import hmac
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+import uuid
+from collections import deque
+from datetime import datetime, timezone
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+HEADER = "x-profile-token"
+QUERY_PARAM = "profile"
+RECENT_FIELDS = ("id", "method", "path", "status", "started_at", "duration_seconds", "cpu_seconds", "files")
+
+_path_prefixes: Optional[List[str]] = None
+_labels: Dict[Any, str] = {}
+
+
+def _short_path(filename: str) -> str:
+    """A file path relative to the sys.path entry it was imported from"""
+    global _path_prefixes
+    if _path_prefixes is None:
+        entries = {os.path.abspath(entry) for entry in sys.path if entry}
+        _path_prefixes = sorted((entry.rstrip(os.sep) + os.sep for entry in entries), key=len, reverse=True)
+    for prefix in _path_prefixes:
+        if filename.startswith(prefix):
+            return filename[len(prefix):]
+    return filename
+
+
+def _package(filename: str) -> str:
+    """Top-level package (or module file) a path belongs to, e.g. `crewai` or `conversation_store.py`"""
+    return _short_path(filename).split(os.sep, 1)[0]
+
+
+def _frame_label(code: Any) -> str:
+    label = _labels.get(code)
+    if label is None:
+        # Semicolons separate frames in the collapsed format
+        label = f"{code.co_name} ({_short_path(code.co_filename)}:{code.co_firstlineno})".replace(";", ":")
+        if len(_labels) < 100_000:
+            _labels[code] = label
+    return label
+
+
+def _cpu_clock(ident: int) -> Optional[int]:
+    """Per-thread CPU clock; None where the platform has none (then only wall time is sampled)"""
+    try:
+        return time.pthread_getcpuclockid(ident)
+    except (AttributeError, OSError, OverflowError):
+        return None
+
+
+class StackSampler:
+    """Samples every thread's stack on a background thread until stopped or `max_seconds` pass"""
+
+    def __init__(self, interval: float = 0.005, max_seconds: float = 300.0):
+        self.interval = max(0.001, interval)
+        self.max_seconds = max_seconds
+        self.wall: Dict[Tuple[str, ...], int] = {}
+        self.cpu: Dict[Tuple[str, ...], float] = {}
+        self.ticks = 0
+        self.started = 0.0
+        self.duration = 0.0
+        self.truncated = False
+        self.cpu_supported = True
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self, on_done: Optional[Callable[["StackSampler"], None]] = None):
+        self.started = time.perf_counter()
+        self._thread = threading.Thread(target=self._run, args=(on_done,), name="profile-sampler", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+
+    def join(self, timeout: Optional[float] = None):
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _run(self, on_done: Optional[Callable[["StackSampler"], None]]):
+        own = threading.get_ident()
+        clocks: Dict[int, Optional[int]] = {}
+        cpu_seen: Dict[int, float] = {}
+        deadline = self.started + self.max_seconds
+        try:
+            while not self._stop.wait(self.interval):
+                if time.perf_counter() > deadline:
+                    self.truncated = True
+                    break
+                names = {thread.ident: thread.name for thread in threading.enumerate()}
+                for ident, frame in sys._current_frames().items():
+                    if ident == own:
+                        continue
+                    stack = []
+                    while frame is not None:
+                        stack.append(_frame_label(frame.f_code))
+                        frame = frame.f_back
+                    stack.append(names.get(ident, f"thread-{ident}"))
+                    stack.reverse()
+                    key = tuple(stack)
+                    self.wall[key] = self.wall.get(key, 0) + 1
+
+                    if ident not in clocks:
+                        clocks[ident] = _cpu_clock(ident)
+                    clock = clocks[ident]
+                    if clock is None:
+                        self.cpu_supported = False
+                        continue
+                    try:
+                        used = time.clock_gettime(clock)
+                    except OSError:
+                        continue
+                    # CPU burned since the last tick is charged to the stack seen now
+                    previous = cpu_seen.get(ident)
+                    cpu_seen[ident] = used
+                    if previous is not None and used > previous:
+                        self.cpu[key] = self.cpu.get(key, 0.0) + (used - previous)
+                self.ticks += 1
+        finally:
+            self.duration = time.perf_counter() - self.started
+            if on_done is not None:
+                on_done(self)
+
+
+class ProfileSession:
+    """One profiled request; the sampler's results are written once the response is done"""
+
+    def __init__(self, profiler: "Profiler", method: str, path: str):
+        self.profiler = profiler
+        self.id = uuid.uuid4().hex[:12]
+        self.method = method
+        self.path = path
+        self.status: Optional[int] = None
+        self.started_at = datetime.now(timezone.utc)
+        self.sampler = StackSampler(profiler.interval, profiler.max_seconds)
+
+    @property
+    def name(self) -> str:
+        return f"{self.profiler.service}-{self.started_at:%Y%m%dT%H%M%S}-{self.id}"
+
+    def finish(self, status: Optional[int] = None):
+        self.status = status
+        self.sampler.stop()
+
+    def summary(self, files: Dict[str, str], top: int = 20) -> Dict[str, Any]:
+        sampler = self.sampler
+        threads: Dict[str, Dict[str, Any]] = {}
+        self_cpu: Dict[str, float] = {}
+        self_wall: Dict[str, int] = {}
+        for stack, count in sampler.wall.items():
+            entry = threads.setdefault(stack[0], {"wall_samples": 0, "cpu_seconds": 0.0})
+            entry["wall_samples"] += count
+            self_wall[stack[-1]] = self_wall.get(stack[-1], 0) + count
+        for stack, seconds in sampler.cpu.items():
+            threads.setdefault(stack[0], {"wall_samples": 0, "cpu_seconds": 0.0})["cpu_seconds"] += seconds
+            self_cpu[stack[-1]] = self_cpu.get(stack[-1], 0.0) + seconds
+        for entry in threads.values():
+            entry["cpu_seconds"] = round(entry["cpu_seconds"], 4)
+        return {
+            "id": self.id,
+            "service": self.profiler.service,
+            "method": self.method,
+            "path": self.path,
+            "status": self.status,
+            "started_at": self.started_at.isoformat(),
+            "duration_seconds": round(sampler.duration, 4),
+            "interval_seconds": sampler.interval,
+            "ticks": sampler.ticks,
+            "truncated": sampler.truncated,
+            "cpu_sampled": sampler.cpu_supported,
+            "cpu_seconds": round(sum(sampler.cpu.values()), 4),
+            "threads": threads,
+            "top_self_cpu": [
+                {"function": function, "seconds": round(seconds, 4)}
+                for function, seconds in sorted(self_cpu.items(), key=lambda item: item[1], reverse=True)[:top]
+            ],
+            "top_self_wall": [
+                {"function": function, "samples": count}
+                for function, count in sorted(self_wall.items(), key=lambda item: item[1], reverse=True)[:top]
+            ],
+            "files": files,
+        }
+
+
+class Profiler:
+    """Runs at most one request profile at a time and writes the results to `directory`"""
+
+    def __init__(
+        self,
+        service: str,
+        directory: str,
+        token: str = "",
+        interval: float = 0.005,
+        max_seconds: float = 300.0,
+        keep: int = 100,
+    ):
+        self.service = service
+        self.directory = directory
+        self.token = token
+        self.interval = interval
+        self.max_seconds = max_seconds
+        self.keep = max(1, keep)
+        self._lock = threading.Lock()
+        self._active: Optional[ProfileSession] = None
+        self._recent: Deque[Dict[str, Any]] = deque(maxlen=20)
+        self._profiles = 0
+        self._busy = 0
+        self._denied = 0
+        self._write_errors = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.token)
+
+    def authorized(self, token: Optional[str]) -> bool:
+        if not self.enabled or not token:
+            return False
+        if hmac.compare_digest(token.encode(), self.token.encode()):
+            return True
+        with self._lock:
+            self._denied += 1
+        return False
+
+    def start(self, method: str, path: str) -> Optional[ProfileSession]:
+        """Begin profiling a request; None while another profile is running"""
+        with self._lock:
+            if self._active is not None:
+                self._busy += 1
+                return None
+            session = self._active = ProfileSession(self, method, path)
+        session.sampler.start(lambda _: self._write(session))
+        return session
+
+    def _write(self, session: ProfileSession):
+        """Runs on the sampler thread once sampling stops, off the request path"""
+        sampler = session.sampler
+        files = {"wall": f"{session.name}.wall.folded"}
+        if sampler.cpu:
+            files["cpu"] = f"{session.name}.cpu.folded"
+        files["summary"] = f"{session.name}.json"
+        summary = session.summary(files)
+        written = False
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            with open(os.path.join(self.directory, files["wall"]), "w", encoding="utf-8") as f:
+                f.writelines(f"{';'.join(stack)} {count}\n" for stack, count in sampler.wall.items())
+            if "cpu" in files:
+                with open(os.path.join(self.directory, files["cpu"]), "w", encoding="utf-8") as f:
+                    f.writelines(
+                        f"{';'.join(stack)} {round(seconds * 1_000_000)}\n"
+                        for stack, seconds in sampler.cpu.items()
+                        if seconds >= 0.0000005
+                    )
+            with open(os.path.join(self.directory, files["summary"]), "w", encoding="utf-8") as f:
+                json.dump(summary, f, indent=2)
+            self._prune()
+            written = True
+            logger.info(f"Profiled {session.method} {session.path} in {sampler.duration:.2f}s -> {session.name}")
+        except OSError as e:
+            logger.error(f"Writing profile {session.name} failed: {e}")
+        finally:
+            with self._lock:
+                if written:
+                    self._profiles += 1
+                    self._recent.appendleft({key: summary[key] for key in RECENT_FIELDS})
+                else:
+                    self._write_errors += 1
+                if self._active is session:
+                    self._active = None
+
+    def _prune(self):
+        """Keep the newest `keep` profiles; older files are removed"""
+        names = sorted(name for name in os.listdir(self.directory) if name.startswith(f"{self.service}-") and name.endswith(".json"))
+        for name in names[:-self.keep]:
+            stem = name[: -len(".json")]
+            for suffix in (".json", ".wall.folded", ".cpu.folded"):
+                try:
+                    os.remove(os.path.join(self.directory, stem + suffix))
+                except FileNotFoundError:
+                    pass
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            active = self._active
+            return {
+                "enabled": self.enabled,
+                "directory": self.directory,
+                "interval_seconds": self.interval,
+                "max_seconds": self.max_seconds,
+                "running": None if active is None else {"id": active.id, "method": active.method, "path": active.path},
+                "profiles_written": self._profiles,
+                "busy_skipped": self._busy,
+                "denied": self._denied,
+                "write_errors": self._write_errors,
+                "recent": list(self._recent),
+            }
+
+
+class ProfilingMiddleware:
+    """
+    ASGI middleware profiling requests that present the profile token
+
+    The response gets an `X-Profile-Id` header naming the written files, or
+    `X-Profile: busy` when another profile was running. A wrong token is refused with 403.
+    Streaming responses are sampled until their last body chunk has been sent. Paths under
+    `exclude` (the heap endpoints, which take the same token) are never sampled.
+    """
+
+    def __init__(self, app: Any, profiler: Profiler, exclude: Sequence[str] = ("/heap",)):
+        self.app = app
+        self.profiler = profiler
+        self.exclude = tuple(exclude)
+
+    def _token(self, scope: Dict[str, Any]) -> Optional[str]:
+        for name, value in scope.get("headers", ()):
+            if name == HEADER.encode():
+                return value.decode("latin-1")
+        query = scope.get("query_string", b"")
+        if query and QUERY_PARAM.encode() in query:
+            values = parse_qs(query.decode("latin-1")).get(QUERY_PARAM)
+            if values:
+                return values[0]
+        return None
+
+    async def __call__(self, scope: Dict[str, Any], receive: Callable, send: Callable):
+        if scope["type"] != "http" or not self.profiler.enabled or scope.get("path", "").startswith(self.exclude):
+            await self.app(scope, receive, send)
+            return
+        token = self._token(scope)
+        if token is None:
+            await self.app(scope, receive, send)
+            return
+        if not self.profiler.authorized(token):
+            await send({"type": "http.response.start", "status": 403, "headers": [(b"content-type", b"application/json")]})
+            await send({"type": "http.response.body", "body": b'{"detail":"Invalid profile token"}'})
+            return
+
+        session = self.profiler.start(scope.get("method", ""), scope.get("path", ""))
+        header = (b"x-profile", b"busy") if session is None else (b"x-profile-id", session.name.encode())
+        status = [500]
+
+        async def send_wrapper(message: Dict[str, Any]):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+                message = {**message, "headers": list(message.get("headers", [])) + [header]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            if session is not None:
+                session.finish(status[0])
+
+
+def _stat_dict(stat: Any, diff: bool = False) -> Dict[str, Any]:
+    frames = [f"{_short_path(frame.filename)}:{frame.lineno}" for frame in stat.traceback]
+    entry: Dict[str, Any] = {"location": frames[0] if frames else "?", "size": stat.size, "count": stat.count}
+    if len(frames) > 1:
+        entry["traceback"] = frames
+    if diff:
+        entry["size_diff"] = stat.size_diff
+        entry["count_diff"] = stat.count_diff
+    return entry
+
+
+def _probe_diff(before: Any, after: Any) -> Any:
+    """Numeric change between two probe readings, recursing into dicts"""
+    if isinstance(before, dict) and isinstance(after, dict):
+        changes = {key: _probe_diff(before.get(key), value) for key, value in after.items()}
+        return {key: value for key, value in changes.items() if value is not None}
+    if isinstance(before, (int, float)) and isinstance(after, (int, float)) and not isinstance(after, bool):
+        return after - before
+    return None
+
+
+class HeapTracker:
+    """
+    tracemalloc snapshots kept in memory and compared on demand
+
+    tracemalloc slows allocation while it runs (more so with deeper tracebacks), so it
+    starts with the first snapshot and `stop()` turns it off again. Only allocations
+    made after it starts are seen: take a baseline, run traffic, snapshot, then diff.
+    """
+
+    GROUPINGS = ("lineno", "traceback", "filename")
+
+    def __init__(self, frames: int = 10, max_snapshots: int = 4):
+        self.frames = max(1, frames)
+        self.max_snapshots = max(2, max_snapshots)
+        self._lock = threading.Lock()
+        self._snapshots: Deque[Dict[str, Any]] = deque()
+        self._probes: Dict[str, Callable[[], Any]] = {}
+        self._sequence = 0
+
+    def add_probe(self, name: str, probe: Callable[[], Any]):
+        """Record `probe()` (a number or a dict of numbers) with every snapshot"""
+        self._probes[name] = probe
+
+    def _read_probes(self) -> Dict[str, Any]:
+        readings = {}
+        for name, probe in self._probes.items():
+            try:
+                readings[name] = probe()
+            except Exception as e:
+                readings[name] = {"error": str(e)}
+        return readings
+
+    def _find(self, snapshot_id: Optional[int]) -> Dict[str, Any]:
+        with self._lock:
+            snapshots = list(self._snapshots)
+        if not snapshots:
+            raise KeyError("No heap snapshots taken yet")
+        if snapshot_id is None:
+            return snapshots[-1]
+        for entry in snapshots:
+            if entry["id"] == snapshot_id:
+                return entry
+        raise KeyError(f"Heap snapshot {snapshot_id} not found (kept: {[entry['id'] for entry in snapshots]})")
+
+    def snapshot(self, limit: int = 25) -> Dict[str, Any]:
+        """Take a snapshot (starting tracemalloc if needed); diffed against the previous one"""
+        started = not tracemalloc.is_tracing()
+        if started:
+            tracemalloc.start(self.frames)
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+            tracemalloc.Filter(False, "<unknown>"),
+        ))
+        current, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            self._sequence += 1
+            entry = {
+                "id": self._sequence,
+                "taken_at": datetime.now(timezone.utc).isoformat(),
+                "snapshot": snapshot,
+                "traced_bytes": current,
+                "peak_bytes": peak,
+                "probes": self._read_probes(),
+            }
+            previous = self._snapshots[-1] if self._snapshots else None
+            self._snapshots.append(entry)
+            while len(self._snapshots) > self.max_snapshots:
+                self._snapshots.popleft()
+
+        packages: Dict[str, Dict[str, int]] = {}
+        for stat in snapshot.statistics("filename"):
+            totals = packages.setdefault(_package(stat.traceback[0].filename), {"size": 0, "count": 0})
+            totals["size"] += stat.size
+            totals["count"] += stat.count
+        result = {
+            **self._describe(entry),
+            "tracing_started": started,
+            "top": [_stat_dict(stat) for stat in snapshot.statistics("lineno")[:limit]],
+            "by_package": dict(sorted(packages.items(), key=lambda item: item[1]["size"], reverse=True)[:limit]),
+        }
+        if previous is not None:
+            result["diff"] = self._compare(previous, entry, "lineno", limit, None)
+        return result
+
+    def diff(
+        self,
+        base: Optional[int] = None,
+        target: Optional[int] = None,
+        group_by: str = "lineno",
+        limit: int = 25,
+        path_filter: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """
+        Largest allocation changes between two snapshots
+
+        `base` defaults to the oldest kept snapshot and `target` to the newest;
+        `path_filter` keeps allocations made in files whose path contains it
+        (e.g. `conversation_store` or `crewai/memory`).
+        """
+        if group_by not in self.GROUPINGS:
+            raise ValueError(f"group_by must be one of {', '.join(self.GROUPINGS)}")
+        if base is None:
+            with self._lock:
+                base = self._snapshots[0]["id"] if self._snapshots else None
+        return self._compare(self._find(base), self._find(target), group_by, limit, path_filter)
+
+    def _compare(
+        self,
+        before: Dict[str, Any],
+        after: Dict[str, Any],
+        group_by: str,
+        limit: int,
+        path_filter: Optional[str],
+    ) -> Dict[str, Any]:
+        old, new = before["snapshot"], after["snapshot"]
+        if path_filter:
+            keep = (tracemalloc.Filter(True, f"*{path_filter}*", all_frames=True),)
+            old, new = old.filter_traces(keep), new.filter_traces(keep)
+        stats = new.compare_to(old, group_by)
+        return {
+            "base": before["id"],
+            "target": after["id"],
+            "group_by": group_by,
+            "filter": path_filter,
+            "traced_bytes_diff": after["traced_bytes"] - before["traced_bytes"],
+            "size_diff": sum(stat.size_diff for stat in stats),
+            "count_diff": sum(stat.count_diff for stat in stats),
+            "growth": [_stat_dict(stat, diff=True) for stat in stats[:limit] if stat.size_diff > 0],
+            "shrink": [_stat_dict(stat, diff=True) for stat in sorted(stats, key=lambda stat: stat.size_diff)[:limit] if stat.size_diff < 0],
+            "probes": _probe_diff(before["probes"], after["probes"]),
+        }
+
+    @staticmethod
+    def _describe(entry: Dict[str, Any]) -> Dict[str, Any]:
+        return {key: entry[key] for key in ("id", "taken_at", "traced_bytes", "peak_bytes", "probes")}
+
+    def stop(self) -> int:
+        """Stop tracemalloc and drop the kept snapshots; returns how many were dropped"""
+        if tracemalloc.is_tracing():
+            tracemalloc.stop()
+        with self._lock:
+            dropped = len(self._snapshots)
+            self._snapshots.clear()
+        return dropped
+
+    def status(self) -> Dict[str, Any]:
+        tracing = tracemalloc.is_tracing()
+        current, peak = tracemalloc.get_traced_memory() if tracing else (0, 0)
+        with self._lock:
+            snapshots = [self._describe(entry) for entry in self._snapshots]
+        return {
+            "tracing": tracing,
+            "frames": self.frames,
+            "traced_bytes": current,
+            "peak_bytes": peak,
+            "max_snapshots": self.max_snapshots,
+            "snapshots": snapshots,
+            "probes": self._read_probes(),
+        }
@@ -0,0 +1,251 @@
+import contextvars
+import hashlib
+import logging
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+import httpx
+
+from exa_client import EXAClient, EXASearchError
+from search_cache import normalize_query
+from metrics import pipeline_stage_seconds, record_error
+from tracing import span
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Analyzer output keys that end the needs_research section
+_SECTION_END = re.compile(
+    r"^\W*(topic_tag|intent|response_type|sensitivity|language|depth|follow_up|route)\b", re.IGNORECASE
+)
+_NEEDS_RESEARCH = re.compile(r"needs[_ ]research", re.IGNORECASE)
+# The field itself ("needs_research: yes", "**needs_research** = no", '"needs_research": true')
+_NEEDS_RESEARCH_FIELD = re.compile(r"needs[_ ]research[\"'*`\s]*[:=]", re.IGNORECASE)
+_ANSWER = re.compile(r"^[\W_]*(yes|true|no|false)\b", re.IGNORECASE)
+_QUOTED = re.compile(r"[\"“]([^\"“”]{3,200})[\"”]")
+_LIST_PREFIX = re.compile(r"^\s*(?:[-*•]|\d+[.)])\s*")
+_URL_SCHEME = re.compile(r"^https?://(www\.)?", re.IGNORECASE)
+
+
+def research_section(analysis: str) -> List[str]:
+    """
+    Lines of the analyzer's needs_research field, starting with the text after the key
+
+    The field runs until the next analyzer key. Prefers a line where needs_research is
+    written as a key, so a later mention (e.g. in the route rationale) is not mistaken for it.
+    """
+    if not analysis:
+        return []
+    lines = analysis.splitlines()
+    start = next((i for i, line in enumerate(lines) if _NEEDS_RESEARCH_FIELD.search(line)), None)
+    pattern = _NEEDS_RESEARCH_FIELD
+    if start is None:
+        start = next((i for i, line in enumerate(lines) if _NEEDS_RESEARCH.search(line)), None)
+        pattern = _NEEDS_RESEARCH
+    if start is None:
+        return []
+    section = [pattern.split(lines[start], 1)[1]]
+    for following in lines[start + 1:]:
+        if _SECTION_END.match(following):
+            break
+        section.append(following)
+    return section
+
+
+def parse_needs_research(analysis: str) -> Optional[bool]:
+    """The analyzer's needs_research answer, or None when it did not give one"""
+    section = research_section(analysis)
+    if not section:
+        return None
+    answer = _ANSWER.match(section[0])
+    if answer is None:
+        return None
+    return answer.group(1).lower() in ("yes", "true")
+
+
+def parse_search_queries(analysis: str, limit: int = 3) -> List[str]:
+    """
+    Pull the analyzer's proposed search queries out of its free-form output
+
+    The context analysis task asks for "needs_research: yes/no. If yes → list 3 precise
+    search queries", which Granite renders as quoted strings, numbered lines or a
+    comma/semicolon separated list. Returns [] when research was not requested.
+    """
+    section = research_section(analysis)
+    if not section or parse_needs_research(analysis) is False:
+        return []
+
+    text = "\n".join(section)
+    candidates = _QUOTED.findall(text)
+    if not candidates:
+        # Drop the "yes →" preamble, then treat list items / separators as boundaries
+        text = re.sub(r"^\W*(?:yes|true)\W*", "", text, flags=re.IGNORECASE)
+        text = re.sub(r"^.*?queries?\s*(?:/keywords)?\s*[:\-→]+", "", text, count=1, flags=re.IGNORECASE | re.DOTALL)
+        candidates = []
+        for line in text.splitlines():
+            line = _LIST_PREFIX.sub("", line).strip()
+            candidates.extend(part.strip() for part in re.split(r"[;|]|,(?=\s)", line) if part.strip())
+
+    queries: List[str] = []
+    seen = set()
+    for candidate in candidates:
+        query = candidate.strip(" .`'[]{}")
+        key = normalize_query(query)
+        if len(query) < 3 or key in ("yes", "no") or key in seen:
+            continue
+        seen.add(key)
+        queries.append(query)
+        if len(queries) == limit:
+            break
+    return queries
+
+
+def _url_key(url: str) -> str:
+    return _URL_SCHEME.sub("", url.split("#", 1)[0]).rstrip("/").lower()
+
+
+def _content_key(text: str) -> str:
+    normalized = " ".join((text or "").lower().split())[:500]
+    return hashlib.sha1(normalized.encode("utf-8")).hexdigest()
+
+
+def merge_results(result_sets: List[List[Dict[str, Any]]], max_results: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    Interleave results round-robin across queries, dropping duplicates
+
+    A result is a duplicate if its URL (ignoring scheme, www, fragment and trailing
+    slash) or the start of its text has already been seen, which catches mirrors and
+    syndicated copies. Round-robin keeps every query's best hits near the top.
+    """
+    merged: List[Dict[str, Any]] = []
+    seen_urls = set()
+    seen_content = set()
+    depth = max((len(results) for results in result_sets), default=0)
+    for position in range(depth):
+        for results in result_sets:
+            if position >= len(results):
+                continue
+            result = results[position]
+            url_key = _url_key(result.get("url") or "")
+            text = result.get("text") or ""
+            content_key = _content_key(text) if text.strip() else None
+            if (url_key and url_key in seen_urls) or (content_key and content_key in seen_content):
+                continue
+            if url_key:
+                seen_urls.add(url_key)
+            if content_key:
+                seen_content.add(content_key)
+            merged.append(result)
+            if max_results is not None and len(merged) == max_results:
+                return merged
+    return merged
+
+
+class ResearchFanOut:
+    """Runs several EXA searches concurrently on the shared pooled client and merges them"""
+
+    def __init__(self, client: EXAClient, max_workers: int, num_results: int, max_results: int):
+        self.client = client
+        self.num_results = num_results
+        self.max_results = max_results
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="chat-research")
+        self._lock = threading.Lock()
+        self._runs = 0
+        self._queries = 0
+        self._failed_queries = 0
+        self._duplicates_dropped = 0
+        self._total_wall = 0.0
+        self._total_serial = 0.0
+
+    def _search(self, query: str) -> Tuple[List[Dict[str, Any]], float, Optional[str]]:
+        started = time.perf_counter()
+        with span("exa.search", query_chars=len(query)) as traced:
+            try:
+                results, error = self.client.search(query, num_results=self.num_results), None
+            except (EXASearchError, httpx.HTTPError, OSError) as e:
+                # One failed query (status, transport error or timeout) must not fail the whole fan-out
+                record_error(e, "exa_query")
+                results, error = [], str(e) or type(e).__name__
+            if traced is not None:
+                traced.set(results=len(results), error=error)
+        latency = time.perf_counter() - started
+        pipeline_stage_seconds.observe(latency, "exa_query")
+        return results, latency, error
+
+    def run(self, queries: List[str], prefetched: Optional[Dict[str, List[Dict[str, Any]]]] = None) -> Dict[str, Any]:
+        """
+        Search all queries at once and merge the results
+
+        `prefetched` maps queries already searched (e.g. speculatively) to their results.
+        Wall time is bounded by the slowest search rather than their sum.
+        """
+        prefetched = prefetched or {}
+        started = time.perf_counter()
+        # Each search runs in a copy of the caller's context so its span joins the request's trace
+        futures = {
+            query: self._pool.submit(contextvars.copy_context().run, self._search, query)
+            for query in queries if query not in prefetched
+        }
+
+        result_sets = []
+        per_query = []
+        serial = 0.0
+        failed = 0
+        for query in queries:
+            if query in prefetched:
+                results, latency, error = prefetched[query], 0.0, None
+            else:
+                results, latency, error = futures[query].result()
+            serial += latency
+            failed += error is not None
+            result_sets.append(results)
+            per_query.append({
+                "query": query,
+                "results": len(results),
+                "latency_ms": round(latency * 1000, 1),
+                "prefetched": query in prefetched,
+                "error": error,
+            })
+            if error:
+                logger.warning(f"Fan-out search failed for '{query}': {error}")
+
+        unique = merge_results(result_sets)
+        merged = unique[:self.max_results]
+        wall = time.perf_counter() - started
+        with self._lock:
+            self._runs += 1
+            self._queries += len(queries)
+            self._failed_queries += failed
+            self._duplicates_dropped += sum(len(r) for r in result_sets) - len(unique)
+            self._total_wall += wall
+            self._total_serial += serial
+
+        logger.info(
+            f"Research fan-out: {len(queries)} queries, {len(merged)} merged results "
+            f"in {wall * 1000:.0f}ms (serial would be {serial * 1000:.0f}ms)"
+        )
+        return {
+            "results": merged,
+            "queries": per_query,
+            "wall_ms": round(wall * 1000, 1),
+            "serial_ms": round(serial * 1000, 1),
+            "all_failed": bool(queries) and failed == len(queries),
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "runs": self._runs,
+                "queries": self._queries,
+                "failed_queries": self._failed_queries,
+                "duplicates_dropped": self._duplicates_dropped,
+                "avg_wall_ms": round(self._total_wall / self._runs * 1000, 1) if self._runs else 0.0,
+                "avg_serial_ms": round(self._total_serial / self._runs * 1000, 1) if self._runs else 0.0,
+            }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,253 @@
+"""
+Local routing engine that decides between simple chat and research mode.
+
+A precompiled keyword matcher and a small logistic-regression classifier over hashed
+text features run in well under a millisecond. The LLM context analyzer is only
+consulted when their combined confidence is below the configured threshold.
+"""
+
+import json
+import logging
+import math
+import re
+import threading
+import time
+import zlib
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import ChatConfig
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# Keywords that have always forced research mode (previously checked one by one in ChatCrew)
+RESEARCH_KEYWORDS = [
+    "latest", "current", "recent", "today", "news", "update", "what's happening",
+    "when did", "current price", "stock price", "weather", "score", "results",
+    "search", "find", "look up", "what is", "who is", "where is", "how is",
+    "trending", "breaking", "live", "now", "2024", "2025", "this year"
+]
+
+# Seed examples the classifier is trained on at startup (label 1 = needs research)
+TRAINING_EXAMPLES = [
+    ("What are the opening hours of the Brihadeeswarar Temple?", 1),
+    ("Is the Konark Sun Temple open for visitors this month?", 1),
+    ("When is the Hornbill Festival held next year?", 1),
+    ("Entry fee for Hampi monuments", 1),
+    ("Any recent archaeological discoveries at Keezhadi?", 1),
+    ("Which temples in Warangal are UNESCO heritage sites?", 1),
+    ("Give me sources about the history of the Chola navy", 1),
+    ("Who built the Ramappa temple and when was it listed by UNESCO?", 1),
+    ("Latest news about the restoration of Jagannath Puri temple", 1),
+    ("How many visitors came to the Taj Mahal last year?", 1),
+    ("Dates of Durga Puja celebrations in Kolkata", 1),
+    ("What did the government announce about the Ayodhya temple?", 1),
+    ("List museums in Chennai with bronze collections", 1),
+    ("Where can I see Warli paintings exhibited in Mumbai?", 1),
+    ("Find scholarly articles on Harappan script decipherment", 1),
+    ("Population of Varanasi in the last census", 1),
+    ("Schedule for Kumbh Mela bathing dates", 1),
+    ("Cite references for the Ashokan edicts locations", 1),
+    ("Which excavations are ongoing in Rakhigarhi?", 1),
+    ("Is there a ticket to enter Ellora caves and how much does it cost?", 1),
+    ("Upcoming classical dance festivals in Odisha", 1),
+    ("Best time to visit Angkor Wat considering weather", 1),
+    ("Which dynasty ruled Vijayanagara in 1520 and what do historians say?", 1),
+    ("Statistics on handloom weavers in Varanasi", 1),
+    ("Give me 5 more temples like those", 1),
+    ("Hi there!", 0),
+    ("Hello, how are you?", 0),
+    ("Thanks, that was helpful", 0),
+    ("Thank you so much", 0),
+    ("Good morning", 0),
+    ("Can you explain the meaning of dharma in simple words?", 0),
+    ("Tell me a story from the Panchatantra", 0),
+    ("Write a short poem about Diwali lamps", 0),
+    ("Summarize the Ramayana in a few lines", 0),
+    ("What do you think about classical music?", 0),
+    ("Explain the difference between Nagara and Dravida temple styles", 0),
+    ("Describe the symbolism of the lotus in Indian art", 0),
+    ("Why is Ganesha worshipped first?", 0),
+    ("Can you simplify that explanation?", 0),
+    ("Translate namaste into English", 0),
+    ("Tell me a fun fact about Indian mythology", 0),
+    ("How should I greet elders respectfully in Japanese culture?", 0),
+    ("What does the word itihas mean?", 0),
+    ("Help me plan questions for a quiz on Indian festivals", 0),
+    ("Please rephrase your last answer more briefly", 0),
+    ("Who are you?", 0),
+    ("Okay, got it", 0),
+    ("Describe the general significance of rangoli", 0),
+    ("Compare Bharatanatyam and Kathak in general terms", 0),
+    ("Give me an overview of Buddhist philosophy", 0),
+]
+
+_TOKEN = re.compile(r"[a-z0-9']+")
+_YEAR = re.compile(r"\b(19|20)\d{2}\b")
+
+
+class KeywordMatcher:
+    """Matches many keywords/phrases in one pass using a single precompiled alternation"""
+
+    def __init__(self, keywords: Iterable[str]):
+        # Longest first so multi-word phrases win over their prefixes
+        ordered = sorted(set(k.lower() for k in keywords), key=len, reverse=True)
+        self._pattern = re.compile(r"(?<!\w)(?:" + "|".join(re.escape(k) for k in ordered) + r")(?!\w)")
+
+    def findall(self, text: str) -> List[str]:
+        return self._pattern.findall(text.lower())
+
+
+class HashedLogisticClassifier:
+    """Binary logistic regression over hashed word, bigram and shape features"""
+
+    def __init__(self, dimensions: int = 1 << 14):
+        self.dimensions = dimensions
+        self.weights = [0.0] * dimensions
+        self.bias = 0.0
+
+    def features(self, text: str, extra: Iterable[str] = ()) -> List[int]:
+        tokens = _TOKEN.findall(text.lower())
+        names = [f"w:{t}" for t in tokens]
+        names += [f"b:{a}_{b}" for a, b in zip(tokens, tokens[1:])]
+        if tokens:
+            names.append(f"first:{tokens[0]}")
+        if text.rstrip().endswith("?"):
+            names.append("shape:question")
+        if _YEAR.search(text):
+            names.append("shape:year")
+        names.append(f"shape:len{min(len(tokens) // 4, 5)}")
+        names.extend(extra)
+        # crc32 is stable across processes, unlike hash()
+        return sorted({zlib.crc32(name.encode("utf-8")) % self.dimensions for name in names})
+
+    def _score(self, indices: List[int]) -> float:
+        return self.bias + sum(self.weights[i] for i in indices)
+
+    def predict_proba(self, indices: List[int]) -> float:
+        z = max(-30.0, min(30.0, self._score(indices)))
+        return 1.0 / (1.0 + math.exp(-z))
+
+    def fit(self, samples: List[Tuple[List[int], int]], epochs: int = 30, learning_rate: float = 0.3, l2: float = 1e-4):
+        """Plain SGD; the sample order is fixed so training is deterministic"""
+        for _ in range(epochs):
+            for indices, label in samples:
+                error = self.predict_proba(indices) - label
+                self.bias -= learning_rate * error
+                for i in indices:
+                    self.weights[i] -= learning_rate * (error + l2 * self.weights[i])
+
+
+class LocalRouter:
+    """
+    Decides whether a message needs research, with a confidence score.
+
+    Legacy research keywords are treated as a strong signal; otherwise the hashed-feature
+    classifier decides. Decisions below `threshold` confidence are flagged so the caller
+    can fall back to the LLM context analyzer.
+    """
+
+    def __init__(self, threshold: float, log_path: Optional[str] = None):
+        self.threshold = threshold
+        self.log_path = log_path
+        self.keywords = KeywordMatcher(RESEARCH_KEYWORDS)
+        self.classifier = HashedLogisticClassifier()
+        self.classifier.fit([
+            (self.classifier.features(text, self._extra_features(text)), label)
+            for text, label in TRAINING_EXAMPLES
+        ])
+
+        self._lock = threading.Lock()
+        self._stats = {"routed": 0, "keyword": 0, "classifier": 0, "llm_fallback": 0, "research": 0, "simple": 0}
+        self._total_latency = 0.0
+        self._fallback_agreements = 0
+
+    def _extra_features(self, text: str, conversation_history: Optional[List[Dict]] = None) -> List[str]:
+        extra = [f"kw:{k}" for k in self.keywords.findall(text)]
+        if conversation_history:
+            previous = conversation_history[-1].get("metadata", {}) or {}
+            extra.append("prev:research" if previous.get("research_used") else "prev:simple")
+        return extra
+
+    def route(self, user_message: str, conversation_history: Optional[List[Dict]] = None) -> Dict[str, Any]:
+        started = time.perf_counter()
+        matched = self.keywords.findall(user_message)
+        indices = self.classifier.features(user_message, self._extra_features(user_message, conversation_history))
+        probability = self.classifier.predict_proba(indices)
+
+        if matched:
+            needs_research = True
+            confidence = max(0.9, probability)
+            source = "keyword"
+        else:
+            needs_research = probability >= 0.5
+            confidence = abs(probability - 0.5) * 2
+            source = "classifier"
+
+        latency_ms = (time.perf_counter() - started) * 1000
+        decision = {
+            "needs_research": needs_research,
+            "confidence": round(confidence, 4),
+            "probability": round(probability, 4),
+            "matched_keywords": matched,
+            "source": source,
+            "confident": confidence >= self.threshold,
+            "latency_ms": round(latency_ms, 3),
+        }
+
+        with self._lock:
+            self._stats["routed"] += 1
+            self._stats[source] += 1
+            self._total_latency += latency_ms
+        return decision
+
+    def record(self, user_message: str, decision: Dict[str, Any], final_needs_research: bool, llm_latency_ms: Optional[float] = None):
+        """Log the final routing outcome so thresholds can be tuned from real traffic"""
+        with self._lock:
+            self._stats["research" if final_needs_research else "simple"] += 1
+            if llm_latency_ms is not None:
+                self._stats["llm_fallback"] += 1
+                if decision["needs_research"] == final_needs_research:
+                    self._fallback_agreements += 1
+
+        entry = {
+            "timestamp": datetime.now().isoformat(),
+            "message": user_message[:200],
+            "local": decision,
+            "needs_research": final_needs_research,
+            "llm_fallback": llm_latency_ms is not None,
+            "llm_latency_ms": round(llm_latency_ms, 1) if llm_latency_ms is not None else None,
+        }
+        logger.info(
+            f"ROUTING - {'research' if final_needs_research else 'simple'} via "
+            f"{'llm' if llm_latency_ms is not None else decision['source']} "
+            f"(confidence {decision['confidence']}, local {decision['latency_ms']}ms)"
+        )
+        if self.log_path:
+            try:
+                with self._lock, open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(json.dumps(entry) + "\n")
+            except OSError as e:
+                logger.error(f"Could not write routing log: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            routed = self._stats["routed"]
+            fallbacks = self._stats["llm_fallback"]
+            return {
+                **self._stats,
+                "threshold": self.threshold,
+                "avg_local_latency_ms": round(self._total_latency / routed, 4) if routed else 0.0,
+                "llm_fallback_rate": round(fallbacks / routed, 4) if routed else 0.0,
+                # How often the LLM agreed with the low-confidence local guess
+                "fallback_agreement_rate": round(self._fallback_agreements / fallbacks, 4) if fallbacks else None,
+            }
+
+
+# Create a singleton instance
+local_router = LocalRouter(
+    threshold=ChatConfig.ROUTER_CONFIDENCE_THRESHOLD,
+    log_path=ChatConfig.ROUTER_LOG_PATH or None
+)
@@ -0,0 +1,149 @@
+"""
+In-process TTL + LRU cache for EXA search results.
+
+Kept identical in backend/chat and backend/explore; change both copies together.
+"""
+
+import json
+import logging
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+# Words that do not change what a semantic search returns
+# Interrogatives are kept: "who is X" and "where is X" ask for different results
+STOPWORDS = frozenset("""
+    a an the of in on at to for from by with about and or is are was were be
+    me my i you your please tell show find list give some any all most
+""".split())
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^\w\s]")
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_query(query: str) -> str:
+    """Fold case, punctuation, whitespace and stopwords so near-identical queries share a key"""
+    words = _WHITESPACE.split(_NON_WORD.sub(" ", query.lower()).strip())
+    kept = [word for word in words if word and word not in STOPWORDS]
+    # A query made only of stopwords still deserves a stable key
+    return " ".join(kept or [word for word in words if word])
+
+
+class SearchCache:
+    """
+    Memory-capped cache of raw EXA results keyed on (normalized query, numResults).
+
+    Entries expire after `ttl` seconds. When the total estimated size exceeds
+    `max_bytes` (or the entry count exceeds `max_entries`), least recently used
+    entries are evicted first. An optional `backing` tier (see disk_cache.py) is
+    consulted on a miss and written through on every put.
+    """
+
+    def __init__(
+        self,
+        ttl: float = 3600.0,
+        max_bytes: int = 32 * 1024 * 1024,
+        max_entries: int = 2048,
+        backing: Optional[Any] = None,
+    ):
+        self.backing = backing
+        self.ttl = ttl
+        self.max_bytes = max_bytes
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple[str, int], Tuple[float, int, List[Dict[str, Any]]]]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+
+    @staticmethod
+    def key(query: str, num_results: int) -> Tuple[str, int]:
+        return normalize_query(query), num_results
+
+    @staticmethod
+    def _size_of(results: List[Dict[str, Any]]) -> int:
+        return len(json.dumps(results, ensure_ascii=False))
+
+    def get(self, query: str, num_results: int) -> Optional[List[Dict[str, Any]]]:
+        results = self._get_memory(query, num_results)
+        if results is None and self.backing is not None:
+            try:
+                results = self.backing.get(query, num_results)
+            except Exception as e:
+                logger.warning(f"Search cache backing tier read failed: {e}")
+                return None
+            if results is not None:
+                # Promote warm disk hits so repeats are served from memory
+                self._put_memory(query, num_results, results)
+        return results
+
+    def _get_memory(self, query: str, num_results: int) -> Optional[List[Dict[str, Any]]]:
+        key = self.key(query, num_results)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            expires_at, size, results = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self._bytes -= size
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return results
+
+    def put(self, query: str, num_results: int, results: List[Dict[str, Any]]):
+        self._put_memory(query, num_results, results)
+        if self.backing is not None:
+            try:
+                self.backing.put(query, num_results, results)
+            except Exception as e:
+                logger.warning(f"Search cache backing tier write failed: {e}")
+
+    def _put_memory(self, query: str, num_results: int, results: List[Dict[str, Any]]):
+        key = self.key(query, num_results)
+        size = self._size_of(results)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (time.monotonic() + self.ttl, size, results)
+            self._bytes += size
+            while self._entries and (self._bytes > self.max_bytes or len(self._entries) > self.max_entries):
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl,
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "expirations": self._expirations,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+                "disk": self.backing.stats() if self.backing is not None else None,
+            }
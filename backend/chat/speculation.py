@@ -0,0 +1,130 @@
+import contextvars
+import logging
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, Optional
+
+from streaming import current_token_stream
+from events import current_events
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+
+class SpeculativeBranch:
+    """A unit of work started before routing is known; either used or discarded"""
+
+    def __init__(self, runner: "SpeculativeRunner", name: str, future: Future):
+        self.runner = runner
+        self.name = name
+        self.future = future
+        self.submitted_at = time.perf_counter()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+
+    def use(self, timeout: Optional[float] = None) -> Any:
+        """Wait for the branch and return its result; the head start counts as latency saved"""
+        decided_at = time.perf_counter()
+        try:
+            return self.future.result(timeout=timeout)
+        finally:
+            self.runner._record_used(self, decided_at)
+
+    def discard(self):
+        """Drop the branch; if it already started, its run time is counted as wasted work"""
+        if self.future.cancel():
+            self.runner._record_discarded(self, cancelled=True)
+        else:
+            self.future.add_done_callback(lambda _: self.runner._record_discarded(self, cancelled=False))
+
+
+class SpeculativeRunner:
+    """
+    Runs speculative branches on their own small pool so they never compete with the
+    admission-controlled crew workers, and keeps wasted-vs-saved accounting.
+    """
+
+    def __init__(self, max_workers: int):
+        self._pool = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="chat-speculative")
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    def start(self, name: str, fn: Callable[..., Any], *args, mute_stream: bool = False, **kwargs) -> SpeculativeBranch:
+        """
+        Start `fn` in the caller's context
+
+        With `mute_stream`, tokens are not forwarded to the request's TokenStream and no
+        log events are published, so a branch that ends up discarded never reaches the client.
+        """
+        context = contextvars.copy_context()
+        branch = SpeculativeBranch(self, name, Future())
+
+        def run():
+            branch.started_at = time.perf_counter()
+            try:
+                if mute_stream:
+                    current_token_stream.set(None)
+                    current_events.set(None)
+                return fn(*args, **kwargs)
+            finally:
+                branch.finished_at = time.perf_counter()
+
+        branch.future = self._pool.submit(context.run, run)
+        with self._lock:
+            self._branch_stats(name)["launched"] += 1
+        return branch
+
+    def _branch_stats(self, name: str) -> Dict[str, float]:
+        """Per-branch counters (caller holds the lock)"""
+        if name not in self._stats:
+            self._stats[name] = {
+                "launched": 0,
+                "used": 0,
+                "discarded": 0,
+                "cancelled_before_start": 0,
+                "failed": 0,
+                "seconds_saved": 0.0,
+                "seconds_wasted": 0.0,
+            }
+        return self._stats[name]
+
+    def _record_used(self, branch: SpeculativeBranch, decided_at: float):
+        finished_at = branch.finished_at or time.perf_counter()
+        started_at = branch.started_at or finished_at
+        # Work done before the routing decision is latency the caller did not have to wait for
+        saved = max(0.0, min(finished_at, decided_at) - started_at)
+        failed = branch.future.done() and not branch.future.cancelled() and branch.future.exception() is not None
+        with self._lock:
+            stats = self._branch_stats(branch.name)
+            if failed:
+                stats["failed"] += 1
+                stats["seconds_wasted"] += finished_at - started_at
+            else:
+                stats["used"] += 1
+                stats["seconds_saved"] += saved
+
+    def _record_discarded(self, branch: SpeculativeBranch, cancelled: bool):
+        with self._lock:
+            stats = self._branch_stats(branch.name)
+            stats["discarded"] += 1
+            if cancelled:
+                stats["cancelled_before_start"] += 1
+            elif branch.started_at is not None and branch.finished_at is not None:
+                stats["seconds_wasted"] += branch.finished_at - branch.started_at
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            branches = {
+                name: {**stats, "seconds_saved": round(stats["seconds_saved"], 3), "seconds_wasted": round(stats["seconds_wasted"], 3)}
+                for name, stats in self._stats.items()
+            }
+        return {
+            "branches": branches,
+            "seconds_saved": round(sum(b["seconds_saved"] for b in branches.values()), 3),
+            "seconds_wasted": round(sum(b["seconds_wasted"] for b in branches.values()), 3),
+        }
+
+    def shutdown(self):
+        self._pool.shutdown(wait=False, cancel_futures=True)
@@ -38,22 +38,22 @@ def check_environment():
         return False
 
 def test_basic_functionality():
-    """Test basic functionality before starting server"""
-    print("\n🧪 Testing basic functionality...")
+    """Check that the heavy dependencies are installed without importing them"""
+    print("\n🧪 Checking dependencies...")
     
-    try:
-        from chat_crew import chat_crew
-        print("✅ Chat crew initialized successfully")
-        
-        # Quick test
-        info = chat_crew.get_crew_info()
-        print(f"✅ Found {len(info['agents'])} agents ready")
-        
-        return True
-        
-    except Exception as e:
-        print(f"❌ Functionality test failed: {e}")
+    # Importing chat_crew here would build every agent before the server even binds;
+    # the API's warmup thread does that in the background and reports it on /ready
+    import importlib.util
+    missing = [
+        name for name in ("crewai", "langchain_community", "ibm_watsonx_ai", "httpx")
+        if importlib.util.find_spec(name) is None
+    ]
+    if missing:
+        print(f"❌ Missing packages: {', '.join(missing)}")
         return False
+    
+    print("✅ Dependencies installed (crews are built by the warmup thread)")
+    return True
 
 def start_server():
     """Start the FastAPI server"""
@@ -68,6 +68,8 @@ def start_server():
     print(f"   Main API: http://{ChatConfig.HOST}:{ChatConfig.PORT}")
     print(f"   Chat: http://{ChatConfig.HOST}:{ChatConfig.PORT}/chat")
     print(f"   Health: http://{ChatConfig.HOST}:{ChatConfig.PORT}/health")
+    print(f"   Live: http://{ChatConfig.HOST}:{ChatConfig.PORT}/live")
+    print(f"   Ready: http://{ChatConfig.HOST}:{ChatConfig.PORT}/ready")
     print(f"   Docs: http://{ChatConfig.HOST}:{ChatConfig.PORT}/docs")
     
     print("\n" + "="*50)
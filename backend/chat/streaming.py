@@ -0,0 +1,99 @@
+import asyncio
+import contextvars
+import logging
+from typing import Any, AsyncIterator, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+# Configure logging
+logging.basicConfig(level=logging.INFO)
+logger = logging.getLogger(__name__)
+
+# CrewAI agents reply in ReAct format; only text after this marker is the user-facing answer
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+_CLOSED = object()
+
+
+class TokenStream:
+    """
+    Per-request channel carrying answer tokens from a crew worker thread to the event loop
+
+    Tokens before the agent's "Final Answer:" marker (its Thought/Action scratchpad)
+    are held back, so consumers only ever see the answer itself.
+    """
+
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._buffer = ""
+        self._passthrough = False
+        self.chunks_sent = 0
+
+    def reset(self):
+        """Start matching the answer marker afresh for a new LLM call"""
+        self._buffer = ""
+        self._passthrough = False
+
+    def feed(self, token: str):
+        """Accept a raw LLM token (called from the worker thread)"""
+        if not token:
+            return
+        if self._passthrough:
+            self._emit(token)
+            return
+
+        self._buffer += token
+        index = self._buffer.find(FINAL_ANSWER_MARKER)
+        if index == -1:
+            return
+        self._passthrough = True
+        remainder = self._buffer[index + len(FINAL_ANSWER_MARKER):].lstrip()
+        self._buffer = ""
+        if remainder:
+            self._emit(remainder)
+
+    def feed_answer(self, text: str):
+        """Push an already-final answer, e.g. one generated while the stream was muted"""
+        self.reset()
+        self._passthrough = True
+        self.feed(text)
+
+    def _emit(self, text: str):
+        self.chunks_sent += 1
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, text)
+
+    def close(self):
+        """Signal that no more tokens will arrive (safe to call from any thread)"""
+        self._loop.call_soon_threadsafe(self._queue.put_nowait, _CLOSED)
+
+    async def __aiter__(self) -> AsyncIterator[str]:
+        while True:
+            item = await self._queue.get()
+            if item is _CLOSED:
+                return
+            yield item
+
+
+# Stream for the request currently executing in this context; copied into crew worker threads
+current_token_stream: contextvars.ContextVar[Optional[TokenStream]] = contextvars.ContextVar(
+    "current_token_stream", default=None
+)
+
+
+class TokenStreamHandler(BaseCallbackHandler):
+    """LangChain callback that forwards streamed LLM tokens to the active request's TokenStream"""
+
+    def on_llm_start(self, serialized: Any, prompts: Any, **kwargs: Any) -> None:
+        stream = current_token_stream.get()
+        if stream is not None:
+            stream.reset()
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        stream = current_token_stream.get()
+        if stream is not None:
+            stream.feed(token)
+
+
+# Shared handler instance attached to streaming-capable LLMs
+token_stream_handler = TokenStreamHandler()
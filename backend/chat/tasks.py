@@ -1,7 +1,6 @@
-from crewai import Task
-from agents import chat_researcher, chat_assistant, context_analyzer
+from crewai import Agent, Task
 
-def create_context_analysis_task(user_message: str, conversation_history: list = None):
+def create_context_analysis_task(agent: Agent, user_message: str, conversation_history: list = None):
     """Task for analyzing user message context and determining response strategy"""
     history_context = ""
     if conversation_history:
@@ -43,7 +42,7 @@ def create_context_analysis_task(user_message: str, conversation_history: list =
         - Avoid speculation; mark uncertainty and recommend research when needed.
         - Keep output ≤ 8 bullets for easy orchestration.
         """,
-        agent=context_analyzer,
+        agent=agent,
         expected_output="""
         A structured analysis containing:
         - Topic tag and intent classification
@@ -55,7 +54,7 @@ def create_context_analysis_task(user_message: str, conversation_history: list =
         """
     )
 
-def create_research_task(query: str, research_focus: str = None):
+def create_research_task(agent: Agent, query: str, research_focus: str = None):
     """Task for researching information to answer user queries"""
     focus_instruction = f"Focus specifically on: {research_focus}" if research_focus else ""
     
@@ -98,7 +97,7 @@ def create_research_task(query: str, research_focus: str = None):
 
         CRITICAL: ALWAYS use the "Search the internet" tool BEFORE providing any response.
         """,
-        agent=chat_researcher,
+        agent=agent,
         expected_output="""
         A comprehensive research package in markdown format containing:
         - Summary of findings with bold key terms
@@ -109,7 +108,7 @@ def create_research_task(query: str, research_focus: str = None):
         """
     )
 
-def create_response_task(user_message: str, requires_search: bool = False):
+def create_response_task(agent: Agent, user_message: str, requires_search: bool = False):
     """Task for generating the final conversational response"""
     search_instruction = "Use the research findings to inform your response." if requires_search else "Use your knowledge to provide a helpful response."
     
@@ -157,7 +156,7 @@ def create_response_task(user_message: str, requires_search: bool = False):
 
         Tone: friendly, calm, scholarly — accessible for general users but able to provide deeper references on request.
         """,
-        agent=chat_assistant,
+        agent=agent,
         expected_output="""
         A well-structured markdown response that:
         - Uses proper heading levels (##, ###)
@@ -170,7 +169,7 @@ def create_response_task(user_message: str, requires_search: bool = False):
         """
     )
 
-def create_simple_chat_task(user_message: str, conversation_history: list = None):
+def create_simple_chat_task(agent: Agent, user_message: str, conversation_history: list = None):
     """Task for simple conversational responses that don't require research"""
     history_context = ""
     if conversation_history:
@@ -235,7 +234,7 @@ def create_simple_chat_task(user_message: str, conversation_history: list = None
 
         Tone: friendly, calm, scholarly — accessible for general users but able to provide deeper references on request.
         """,
-        agent=chat_assistant,
+        agent=agent,
         expected_output="""
         A well-structured markdown response that:
         - Uses proper heading levels (##, ###)
@@ -0,0 +1,14 @@
+import os
+import sys
+
+# The service imports its modules flat (as it does when run from backend/chat)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Placeholder credentials so config-driven modules import; tests never reach watsonx or EXA
+for name in ("IBM_API_KEY", "IBM_WATSONX_URL", "IBM_PROJECT_ID", "EXA_API_KEY"):
+    os.environ.setdefault(name, "test")
+# Keep tests from leaving runtime state in the working directory
+for name in ("SEARCH_DISK_CACHE_PATH", "CONVERSATION_LOG_DIR", "TRACE_DIR", "PROFILE_DIR", "ROUTER_LOG_PATH"):
+    os.environ.setdefault(name, "")
+os.environ.setdefault("LAZY_STARTUP", "False")
+os.environ.setdefault("WARMUP_CONNECT", "False")
@@ -0,0 +1,53 @@
+import pytest
+
+from research_fanout import parse_needs_research, parse_search_queries
+
+# Shaped like Granite's answers to create_context_analysis_task
+RESEARCH_ANALYSIS = """- topic_tag: [Architecture]
+- intent: informational
+- needs_research: yes. Search queries:
+  1. "Ramappa temple UNESCO inscription 2021"
+  2. "Kakatiya architecture floating bricks"
+  3. "Ramappa temple sandbox foundation technique"
+- response_type: long-explain
+- sensitivity: none
+- language: English
+- depth: detailed / general
+- follow_up: none
+- route: chat_researcher, because the user asks for current heritage status and this needs research"""
+
+SIMPLE_ANALYSIS = """- topic_tag: [Folklore]
+- intent: other
+- needs_research: no
+- response_type: short-summary
+- route: chat_assistant, no research is needed for a greeting"""
+
+
+def test_analyzer_asking_for_research():
+    assert parse_needs_research(RESEARCH_ANALYSIS) is True
+    assert parse_search_queries(RESEARCH_ANALYSIS) == [
+        "Ramappa temple UNESCO inscription 2021",
+        "Kakatiya architecture floating bricks",
+        "Ramappa temple sandbox foundation technique",
+    ]
+
+
+def test_analyzer_declining_research():
+    assert parse_needs_research(SIMPLE_ANALYSIS) is False
+    assert parse_search_queries(SIMPLE_ANALYSIS) == []
+
+
+@pytest.mark.parametrize("analysis, expected", [
+    ('{"topic_tag": "[Religion]", "needs_research": "yes", "route": "chat_researcher"}', True),
+    ("**needs_research**: No", False),
+    ("needs_research=true → queries: Hampi entry fee; Hampi opening hours", True),
+    ("Analysis unavailable", None),
+    ("- route: chat_researcher because it needs research", None),
+])
+def test_needs_research_field_variants(analysis, expected):
+    assert parse_needs_research(analysis) is expected
+
+
+def test_unquoted_queries_split_on_separators():
+    analysis = "- needs_research: yes → queries: Hampi entry fee; Hampi opening hours, Vittala temple chariot\n- route: chat_researcher"
+    assert parse_search_queries(analysis) == ["Hampi entry fee", "Hampi opening hours", "Vittala temple chariot"]
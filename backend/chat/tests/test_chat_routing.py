@@ -0,0 +1,157 @@
+import threading
+from contextlib import contextmanager
+
+import pytest
+
+import chat_crew as chat_crew_module
+from test_analyzer_parsing import RESEARCH_ANALYSIS, SIMPLE_ANALYSIS
+
+MESSAGE = "Tell me about the Ramappa temple"
+
+
+class FakeCrew:
+    def __init__(self):
+        self.tasks = []
+
+    def kickoff(self):
+        return "## Ramappa Temple\nA Kakatiya-era temple."
+
+
+class FakeAgent:
+    role = "Conversational AI Assistant"
+
+
+class FakeCrewSet:
+    chat_assistant = FakeAgent()
+
+    def __init__(self):
+        self.crew = FakeCrew()
+        self.simple_crew = FakeCrew()
+
+
+class FakePool:
+    @contextmanager
+    def acquire(self, timeout=None):
+        yield FakeCrewSet()
+
+
+@pytest.fixture
+def crew(monkeypatch):
+    """The chat orchestrator with an unsure router, a scripted analyzer and recorded EXA searches"""
+    instance = chat_crew_module.chat_crew
+    searched = []
+    lock = threading.Lock()
+
+    def search(query, num_results=5, timeout=None):
+        with lock:
+            searched.append(query)
+        return [{"title": query, "url": f"https://example.org/{len(searched)}", "text": f"About {query}"}]
+
+    monkeypatch.setattr(chat_crew_module.exa_client, "search", search)
+    monkeypatch.setattr(chat_crew_module.local_router, "route", lambda message, history=None: {
+        "needs_research": False,
+        "confidence": 0.2,
+        "probability": 0.4,
+        "matched_keywords": [],
+        "source": "classifier",
+        "confident": False,
+        "latency_ms": 0.1,
+    })
+    monkeypatch.setattr(chat_crew_module, "create_response_task", lambda *args, **kwargs: None)
+    monkeypatch.setattr(chat_crew_module, "create_simple_chat_task", lambda *args, **kwargs: None)
+    monkeypatch.setattr(instance, "pool", FakePool())
+    monkeypatch.setattr(instance, "speculative_mode", "prefetch")
+    instance.searched = searched
+    yield instance
+    del instance.searched
+
+
+def test_analyzer_research_uses_the_speculative_prefetch(crew, monkeypatch):
+    monkeypatch.setattr(crew, "_analyze_context", lambda message, history=None: RESEARCH_ANALYSIS)
+    before = crew.speculation.stats()["branches"].get("prefetch", {}).get("used", 0)
+
+    result = crew.chat(MESSAGE)
+
+    metadata = result["metadata"]
+    assert result["success"], result
+    assert metadata["response_type"] == "research_chat"
+    assert metadata["speculation"]["used"] == "prefetch"
+    assert crew.speculation.stats()["branches"]["prefetch"]["used"] == before + 1
+    # The raw message was searched once, speculatively, and reused by the fan-out
+    assert crew.searched.count(MESSAGE) == 1
+    assert [query["prefetched"] for query in metadata["search_queries"]] == [True, False, False, False]
+    assert metadata["agents_used"][0] == "Context Analyzer"
+    assert metadata["routing"]["source"] == "llm"
+    assert metadata["routing"]["llm_fallback"] is True
+    assert metadata["routing"]["needs_research"] is True
+    assert metadata["routing"]["local"]["source"] == "classifier"
+    assert metadata["routing"]["local"]["needs_research"] is False
+
+
+def test_analyzer_simple_discards_the_prefetch(crew, monkeypatch):
+    monkeypatch.setattr(crew, "_analyze_context", lambda message, history=None: SIMPLE_ANALYSIS)
+
+    result = crew.chat(MESSAGE)
+
+    assert result["metadata"]["response_type"] == "simple_chat"
+    assert result["metadata"]["speculation"]["used"] is None
+
+
+def test_analyzer_queries_reach_the_fanout(crew, monkeypatch):
+    monkeypatch.setattr(crew, "_analyze_context", lambda message, history=None: RESEARCH_ANALYSIS)
+    runs = []
+    original = crew.research.run
+
+    def run(queries, prefetched=None):
+        runs.append(list(queries))
+        return original(queries, prefetched=prefetched)
+
+    monkeypatch.setattr(crew.research, "run", run)
+
+    crew.chat(MESSAGE)
+
+    assert runs == [[
+        MESSAGE,
+        "Ramappa temple UNESCO inscription 2021",
+        "Kakatiya architecture floating bricks",
+        "Ramappa temple sandbox foundation technique",
+    ]]
+    assert set(crew.searched) == set(runs[0])
+
+
+def test_confident_router_decides_without_the_analyzer(crew, monkeypatch):
+    monkeypatch.setattr(chat_crew_module.local_router, "route", lambda message, history=None: {
+        "needs_research": True,
+        "confidence": 0.93,
+        "probability": 0.93,
+        "matched_keywords": ["latest"],
+        "source": "keyword",
+        "confident": True,
+        "latency_ms": 0.1,
+    })
+    monkeypatch.setattr(crew, "_analyze_context", lambda message, history=None: pytest.fail("analyzer ran"))
+
+    metadata = crew.chat(MESSAGE)["metadata"]
+
+    assert "Context Analyzer" not in metadata["agents_used"]
+    assert metadata["routing"] == {
+        "source": "keyword",
+        "needs_research": True,
+        "confidence": 0.93,
+        "llm_fallback": False,
+        "local": {
+            "source": "keyword",
+            "needs_research": True,
+            "confidence": 0.93,
+            "probability": 0.93,
+            "matched_keywords": ["latest"],
+            "latency_ms": 0.1,
+        },
+    }
+
+
+def test_forced_route_is_reported_as_forced(crew):
+    metadata = crew.chat(MESSAGE, force_simple=True)["metadata"]
+
+    assert metadata["routing"]["source"] == "forced"
+    assert metadata["routing"]["local"] is None
@@ -0,0 +1,80 @@
+import os
+
+from conversation_log import SEGMENT_PREFIX, SNAPSHOT_FILE, ConversationLog
+from conversation_store import ConversationStore
+
+
+def turn(index, conversation="a"):
+    return {
+        "user": f"question {index} in {conversation}",
+        "assistant": f"answer {index} in {conversation}",
+        "timestamp": f"2026-10-17T10:{index // 60:02d}:{index % 60:02d}",
+        "metadata": {"response_type": "simple_chat", "research_used": False, "trace_id": f"t{index}"},
+    }
+
+
+def open_log(directory, snapshot_every=0):
+    store = ConversationStore(max_turns=50, sweep_interval=0)
+    log = ConversationLog(str(directory), commit_interval=0.01, snapshot_every=snapshot_every)
+    log.open(store)
+    return store, log
+
+
+def segments(directory):
+    return sorted(name for name in os.listdir(directory) if name.startswith(SEGMENT_PREFIX))
+
+
+def test_replay_after_crash_mid_batch(tmp_path):
+    store, log = open_log(tmp_path)
+    for index in range(5):
+        store.append("a", turn(index))
+    log.close(snapshot=False)
+
+    # A crash during the batch's write leaves its last record half written
+    (segment,) = segments(tmp_path)
+    path = tmp_path / segment
+    data = path.read_bytes()
+    last_line = data.rstrip(b"\n").rfind(b"\n") + 1
+    path.write_bytes(data[: last_line + (len(data) - last_line) // 2])
+
+    recovered, log = open_log(tmp_path)
+    assert [t["user"] for t in recovered.get("a")] == [f"question {i} in a" for i in range(4)]
+    replay = log.stats()["replay"]
+    assert (replay["records_applied"], replay["torn_lines"]) == (4, 1)
+    # New records go to a fresh segment, never after the torn tail, and keep their order
+    recovered.append("a", turn(5))
+    log.close(snapshot=False)
+    assert len(segments(tmp_path)) == 2
+
+    again, log = open_log(tmp_path)
+    assert [t["user"] for t in again.get("a")][-2:] == ["question 3 in a", "question 5 in a"]
+    assert log.last_seq == 5
+    log.close(snapshot=False)
+
+
+def test_snapshot_plus_wal_recovery(tmp_path):
+    store, log = open_log(tmp_path, snapshot_every=4)
+    for index in range(4):
+        store.append("a" if index % 2 else "b", turn(index, "a" if index % 2 else "b"))
+    # The writer snapshots once four records are committed; wait for it by closing
+    log.close(snapshot=False)
+    assert (tmp_path / SNAPSHOT_FILE).exists()
+
+    store, log = open_log(tmp_path, snapshot_every=0)
+    store.append("c", turn(4, "c"))
+    store.delete("b")
+    expected = {conversation: store.get(conversation) for conversation in ("a", "c")}
+    log.close(snapshot=False)
+
+    recovered, log = open_log(tmp_path)
+    replay = log.stats()["replay"]
+    assert replay["snapshot_seq"] == 4 and replay["snapshot_conversations"] == 2
+    assert replay["records_applied"] == 2 and replay["torn_lines"] == 0
+    assert recovered.get("b") is None
+    assert {conversation: recovered.get(conversation) for conversation in ("a", "c")} == expected
+
+    # A clean shutdown snapshots everything, so the next start replays no records
+    log.close(snapshot=True)
+    _, log = open_log(tmp_path)
+    assert log.stats()["replay"]["records_applied"] == 0
+    log.close(snapshot=False)
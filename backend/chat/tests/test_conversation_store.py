@@ -0,0 +1,101 @@
+import pytest
+
+import conversation_store
+from conversation_store import ConversationStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(conversation_store.time, "monotonic", clock)
+    return clock
+
+
+def turn(minute, text="hello"):
+    return {
+        "user": text,
+        "assistant": f"reply to {text}",
+        "timestamp": f"2026-10-17T10:{minute:02d}:00",
+        "metadata": {"response_type": "simple_chat", "research_used": False},
+    }
+
+
+def test_idle_conversations_expire_lazily_and_on_sweep(clock):
+    store = ConversationStore(ttl=60, sweep_interval=0)
+    store.append("idle", turn(0))
+    store.append("busy", turn(1))
+
+    clock.now += 45
+    assert store.get("busy") is not None  # reading refreshes the TTL
+    clock.now += 30
+    assert store.get("idle") is None
+    assert store.sweep() == 0
+
+    clock.now += 61
+    assert store.sweep() == 1
+    assert len(store) == 0
+    assert store.stats()["expirations"] == 2
+
+
+def test_least_recently_used_is_evicted_first(clock):
+    store = ConversationStore(max_conversations=2, sweep_interval=0)
+    store.append("a", turn(0))
+    store.append("b", turn(1))
+    store.get("a")
+    store.append("c", turn(2))
+
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.get("c") is not None
+    assert store.stats()["evictions"] == 1
+
+
+def test_byte_budget_evicts_but_keeps_the_conversation_being_written(clock):
+    store = ConversationStore(max_bytes=1, compress=False, sweep_interval=0)
+    store.append("a", turn(0))
+    store.append("b", turn(1))
+
+    assert len(store) == 1 and store.get("b") is not None
+    store.append("b", turn(2))
+    assert len(store.get("b")) == 2
+
+
+def test_page_orders_by_last_update_with_cursors(clock):
+    store = ConversationStore(sweep_interval=0)
+    for minute, conversation_id in enumerate("abcde"):
+        store.append(conversation_id, turn(minute, conversation_id))
+    store.append("b", turn(10, "b again"))
+
+    first, cursor = store.page(limit=2)
+    assert [entry[0] for entry in first] == ["b", "e"]
+    assert first[0][1] == 2 and first[0][2]["user"] == "b again"
+
+    second, cursor = store.page(limit=2, after=cursor)
+    assert [entry[0] for entry in second] == ["d", "c"]
+    third, cursor = store.page(limit=2, after=cursor)
+    assert [entry[0] for entry in third] == ["a"] and cursor is None
+
+    recent, cursor = store.page(limit=10, since="2026-10-17T10:03:00")
+    assert [entry[0] for entry in recent] == ["b", "e", "d"] and cursor is None
+
+
+def test_page_skips_deleted_and_expired_conversations(clock):
+    store = ConversationStore(ttl=60, sweep_interval=0)
+    store.append("old", turn(0))
+    clock.now += 45
+    store.append("gone", turn(1))
+    store.append("kept", turn(2))
+    store.delete("gone")
+    clock.now += 30
+
+    page, cursor = store.page(limit=1)
+    assert [entry[0] for entry in page] == ["kept"] and cursor is None
+    with pytest.raises(ValueError):
+        store.page(after="not-a-cursor")
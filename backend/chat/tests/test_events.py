@@ -0,0 +1,47 @@
+import asyncio
+
+from events import EventBus, make_event
+
+
+def collect(batch, events, heartbeat_interval=15.0):
+    """Frames a subscriber receives for `events` published in one burst"""
+    async def run():
+        bus = EventBus(batch_interval=0.01, heartbeat_interval=heartbeat_interval)
+        subscription = bus.subscribe("c", batch=batch)
+        for event in events:
+            bus.publish("c", event)
+        frames = []
+
+        async def read():
+            async for frame in subscription.frames():
+                frames.append(frame)
+
+        reader = asyncio.ensure_future(read())
+        await asyncio.sleep(0.1)
+        bus.unsubscribe(subscription)
+        await asyncio.wait_for(reader, timeout=1)
+        return frames, subscription
+
+    return asyncio.run(run())
+
+
+EVENTS = [make_event("agent_start", {"step": i}, f"step {i}", "Context Analyzer") for i in range(3)]
+
+
+def test_default_sends_one_event_per_frame_without_heartbeats():
+    frames, subscription = collect(False, EVENTS, heartbeat_interval=0.02)
+    assert frames == EVENTS
+    assert subscription.frames_sent == 3 and subscription.heartbeats == 0
+
+
+def test_batch_opt_in_groups_a_burst_into_one_frame():
+    frames, subscription = collect(True, EVENTS)
+    assert len(frames) == 1
+    assert frames[0]["type"] == "batch" and frames[0]["events"] == EVENTS
+    assert subscription.events_sent == 3
+
+
+def test_batch_opt_in_sends_heartbeats_when_quiet():
+    frames, subscription = collect(True, [], heartbeat_interval=0.02)
+    assert frames and all(frame["type"] == "heartbeat" for frame in frames)
+    assert subscription.heartbeats == len(frames)
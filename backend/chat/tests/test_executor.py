@@ -0,0 +1,47 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from executor import CrewExecutor, QueueTimeoutError
+
+
+def test_expired_waits_do_not_inflate_the_average_wait():
+    async def run():
+        executor = CrewExecutor(max_workers=1, max_queue=4, queue_timeout=0.1)
+        release = threading.Event()
+        blocker = executor.submit(release.wait, 5)
+        late = [executor.submit(lambda: None) for _ in range(2)]
+        await asyncio.sleep(0.3)
+        release.set()
+        await blocker
+        for future in late:
+            with pytest.raises(QueueTimeoutError):
+                await future
+        await executor.run(lambda: None)
+        stats = executor.stats()
+        executor.shutdown()
+        return stats
+
+    stats = asyncio.run(run())
+    assert stats["expired"] == 2 and stats["completed"] == 2
+    # Only the two jobs that ran count towards the average, and neither waited long
+    assert stats["avg_wait_ms"] < 100 <= stats["avg_expired_wait_ms"]
+    assert stats["max_wait_ms"] < 100
+
+
+def test_shutdown_releases_the_slots_of_cancelled_jobs():
+    async def run():
+        executor = CrewExecutor(max_workers=1, max_queue=4, queue_timeout=0)
+        futures = [executor.submit(time.sleep, 0.2) for _ in range(4)]
+        await asyncio.sleep(0.05)
+        assert executor.stats()["queue_depth"] == 3
+        executor.shutdown()
+        stats = executor.stats()
+        await asyncio.gather(*futures, return_exceptions=True)
+        return stats, executor.stats()
+
+    at_shutdown, finished = asyncio.run(run())
+    assert at_shutdown["queue_depth"] == 0 and at_shutdown["cancelled"] == 3
+    assert finished["running"] == 0 and finished["completed"] == 1
@@ -0,0 +1,76 @@
+from llm_cache import CachedWatsonxLLM, CompletionCache
+
+
+class FakeModel:
+    """Stands in for ModelInference: streams a fixed completion in word-sized chunks"""
+
+    def __init__(self, text="Thought: I now can give a great answer\nFinal Answer: Hampi"):
+        self.text = text
+        self.calls = 0
+
+    def generate_text_stream(self, prompt, raw_response=False, params=None, **kwargs):
+        self.calls += 1
+        words = self.text.split(" ")
+        for index, word in enumerate(words):
+            last = index == len(words) - 1
+            yield {"results": [{
+                "generated_text": word if last else word + " ",
+                "generated_token_count": index + 1,
+                "input_token_count": len(prompt) // 4,
+                "stop_reason": "eos_token" if last else "not_finished",
+            }]}
+
+
+def make_llm(model, cache=None, params=None):
+    return CachedWatsonxLLM.construct(
+        model_id="ibm/granite-3-8b-instruct",
+        project_id="",
+        params=params or {"decoding_method": "greedy", "max_new_tokens": 200},
+        streaming=True,
+        watsonx_model=model,
+        agent_name="chat_assistant",
+        completion_cache=cache,
+    )
+
+
+def test_disk_tier_survives_a_new_cache(tmp_path):
+    path = str(tmp_path / "completions.db")
+    CompletionCache(disk_path=path).put("key", "model", "cached text", "planner", 1.5)
+
+    cache = CompletionCache(disk_path=path)
+    assert cache.get("key", "planner") == "cached text"
+    assert cache.get("key", "planner") == "cached text"
+    agent = cache.stats()["agents"]["planner"]
+    assert (agent["disk_hits"], agent["hits"], agent["misses"]) == (1, 1, 0)
+
+
+def test_expired_disk_entries_miss(tmp_path):
+    path = str(tmp_path / "completions.db")
+    CompletionCache(disk_path=path).put("key", "model", "cached text", "planner", 1.0)
+    assert CompletionCache(disk_path=path, ttl=-1).get("key", "planner") is None
+
+
+def test_stream_replays_cached_completion_as_one_chunk():
+    model = FakeModel()
+    cache = CompletionCache()
+    llm = make_llm(model, cache)
+
+    first = list(llm.stream("Current Task: temples of Hampi"))
+    second = list(llm.stream("Current Task: temples of Hampi"))
+
+    assert model.calls == 1
+    assert "".join(first) == model.text
+    assert second == [model.text]
+    assert cache.stats()["agents"]["chat_assistant"]["hits"] == 1
+
+
+def test_sampled_stream_bypasses_cache():
+    model = FakeModel()
+    cache = CompletionCache()
+    llm = make_llm(model, cache, {"decoding_method": "sample", "temperature": 0.7})
+
+    list(llm.stream("prompt"))
+    list(llm.stream("prompt"))
+
+    assert model.calls == 2
+    assert cache.stats()["entries"] == 0
@@ -0,0 +1,100 @@
+"""crewai agents call LLM.stream(); the registry, cache, budget and tracing must all apply on that path"""
+
+import ibm_watsonx_ai.foundation_models as foundation_models
+import pytest
+
+from llm_registry import WatsonxClientRegistry
+from test_llm_cache import FakeModel
+from token_usage import BUDGET_NOTICE, RequestUsage, current_usage
+from tracing import Tracer
+
+PARAMS = {"decoding_method": "greedy", "max_new_tokens": 200}
+
+
+class FakeModelInference(FakeModel):
+    created = 0
+
+    def __init__(self, model_id, params, api_client):
+        super().__init__()
+        FakeModelInference.created += 1
+
+
+class CapturingExporter:
+    def __init__(self):
+        self.records = []
+
+    def start(self):
+        pass
+
+    def close(self):
+        pass
+
+    def export(self, record):
+        self.records.append(record)
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    monkeypatch.setattr(foundation_models, "ModelInference", FakeModelInference)
+    registry = WatsonxClientRegistry("https://us-south.ml.cloud.ibm.com", "key", "project")
+    monkeypatch.setattr(registry, "_get_api_client", lambda: object())
+    FakeModelInference.created = 0
+    return registry
+
+
+def stream(llm, prompt="Current Task: temples of Hampi"):
+    return "".join(llm.stream(prompt))
+
+
+def test_stream_resolves_the_shared_model_from_the_registry(registry):
+    planner = registry.llm("planner", "ibm/granite-3-8b-instruct", PARAMS, streaming=True)
+    synthesis = registry.llm("synthesis", "ibm/granite-3-8b-instruct", PARAMS, streaming=True)
+
+    assert stream(planner) == FakeModel().text
+    stream(synthesis, "Current Task: forts of Rajasthan")
+
+    assert FakeModelInference.created == 1
+    assert planner.watsonx_model is synthesis.watsonx_model
+    client = registry.stats()["clients"][0]
+    assert client["requests"] == 2 and client["errors"] == 0
+
+
+def test_stream_records_span_and_usage(registry):
+    exporter = CapturingExporter()
+    tracer = Tracer("chat", exporter, sample_rate=1.0)
+    usage = RequestUsage("chat")
+    llm = registry.llm("chat_assistant", "ibm/granite-3-8b-instruct", PARAMS, streaming=True)
+
+    token = current_usage.set(usage)
+    try:
+        with tracer.trace("chat.request"):
+            stream(llm)
+    finally:
+        current_usage.reset(token)
+
+    (record,) = exporter.records
+    (generate,) = [span for span in record["spans"] if span["name"] == "llm.generate"]
+    assert generate["attributes"]["agent"] == "chat_assistant"
+    assert generate["attributes"]["generated_token_count"] > 0
+    summary = usage.summary()
+    assert summary["llm_calls"] == 1 and summary["estimated_calls"] == 0
+    assert summary["by_agent"]["chat_assistant"]["output_tokens"] == generate["attributes"]["generated_token_count"]
+
+
+def test_stream_enforces_the_token_budget(registry):
+    usage = RequestUsage("chat", budget=60)
+    llm = registry.llm("chat_assistant", "ibm/granite-3-8b-instruct", PARAMS, streaming=True)
+    prompt = "Current Task: " + "temples of Hampi " * 8
+
+    token = current_usage.set(usage)
+    try:
+        stream(llm, prompt)
+        answer = stream(llm, prompt + "again")
+    finally:
+        current_usage.reset(token)
+
+    summary = usage.summary()
+    assert summary["capped_calls"] == 1
+    assert summary["skipped_calls"] == 1 and summary["budget_exhausted"]
+    assert BUDGET_NOTICE in answer
+    assert registry.stats()["clients"][0]["requests"] == 1
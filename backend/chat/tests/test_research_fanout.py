@@ -0,0 +1,44 @@
+import httpx
+
+from exa_client import EXASearchError
+from research_fanout import ResearchFanOut, merge_results
+
+
+class FakeClient:
+    def __init__(self, failures):
+        self.failures = failures
+
+    def search(self, query, num_results=5, timeout=None):
+        if query in self.failures:
+            raise self.failures[query]
+        return [{"title": query, "url": f"https://example.org/{query.replace(' ', '-')}", "text": f"About {query}"}]
+
+
+def test_failed_queries_do_not_fail_the_fanout():
+    fanout = ResearchFanOut(FakeClient({
+        "timeout": httpx.ReadTimeout("read timed out"),
+        "refused": httpx.ConnectError("connection refused"),
+        "status": EXASearchError("Search failed with status 502", status_code=502),
+    }), max_workers=4, num_results=5, max_results=10)
+
+    result = fanout.run(["Hampi", "timeout", "refused", "status", "Badami caves"])
+
+    assert [r["title"] for r in result["results"]] == ["Hampi", "Badami caves"]
+    assert not result["all_failed"]
+    errors = {q["query"]: q["error"] for q in result["queries"]}
+    assert errors["Hampi"] is None and errors["timeout"] and errors["refused"] and errors["status"]
+    assert fanout.stats()["failed_queries"] == 3
+    fanout.shutdown()
+
+
+def test_all_failed_is_reported():
+    fanout = ResearchFanOut(FakeClient({"a b c": TimeoutError()}), max_workers=2, num_results=5, max_results=10)
+    result = fanout.run(["a b c"])
+    assert result["all_failed"] and result["results"] == []
+    fanout.shutdown()
+
+
+def test_merge_drops_mirrors_and_interleaves():
+    first = [{"url": "https://www.example.org/a/", "text": "A"}, {"url": "https://example.org/b", "text": "B"}]
+    second = [{"url": "http://example.org/a#top", "text": "A mirror"}, {"url": "https://other.org/c", "text": "B"}]
+    assert [r["url"] for r in merge_results([first, second])] == ["https://www.example.org/a/", "https://example.org/b"]
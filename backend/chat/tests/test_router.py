@@ -0,0 +1,43 @@
+import pytest
+
+from router import LocalRouter
+
+
+@pytest.fixture(scope="module")
+def router():
+    return LocalRouter(threshold=0.6)
+
+
+def test_keyword_match_is_a_confident_research_decision(router):
+    decision = router.route("What is the latest news about the Konark temple?")
+    assert decision["source"] == "keyword"
+    assert decision["needs_research"] is True
+    assert "latest" in decision["matched_keywords"]
+    assert decision["confidence"] >= 0.9 and decision["confident"] is True
+
+
+def test_keyword_confidence_still_respects_a_stricter_threshold(router):
+    message = "Latest news about the restoration of Jagannath Puri temple"
+    decision = LocalRouter(threshold=0.99).route(message)
+    assert decision["source"] == "keyword"
+    assert decision["confident"] is (decision["confidence"] >= 0.99)
+
+
+def test_classifier_confidence_is_distance_from_even_odds(router):
+    decision = router.route("Tell me a short poem about monsoon rain")
+    assert decision["source"] == "classifier" and not decision["matched_keywords"]
+    assert decision["needs_research"] is (decision["probability"] >= 0.5)
+    assert decision["confidence"] == pytest.approx(abs(decision["probability"] - 0.5) * 2, abs=1e-3)
+
+
+@pytest.mark.parametrize("message", [
+    "Tell me a short poem about monsoon rain",
+    "Entry fee for Hampi monuments",
+    "Thanks, that was helpful",
+])
+def test_threshold_decides_when_to_fall_back(router, message):
+    # The reported confidence is rounded to four places
+    confidence = router.route(message)["confidence"]
+    assert LocalRouter(threshold=confidence - 0.001).route(message)["confident"] is True
+    assert LocalRouter(threshold=confidence + 0.01).route(message)["confident"] is False
+
@@ -0,0 +1,18 @@
+from search_cache import SearchCache, normalize_query
+
+
+def test_interrogatives_keep_queries_apart():
+    assert normalize_query("Where is Hampi?") != normalize_query("Who is Hampi?")
+    assert normalize_query("When was the Konark temple built") != normalize_query("How was the Konark temple built")
+
+
+def test_near_identical_queries_share_a_key():
+    assert normalize_query("What is  the Ramappa temple?") == normalize_query("what is ramappa temple")
+    assert normalize_query("Tell me about Warangal fort") == normalize_query("warangal fort")
+
+
+def test_cached_results_are_not_shared_across_interrogatives():
+    cache = SearchCache(ttl=60)
+    cache.put("Where is Hampi", 5, [{"url": "https://example.org/map"}])
+    assert cache.get("where is hampi?", 5) == [{"url": "https://example.org/map"}]
+    assert cache.get("Who is Hampi", 5) is None
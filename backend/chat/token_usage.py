@@ -0,0 +1,195 @@
+"""
+Token accounting for watsonx calls, rolled up per request, agent and endpoint.
+
+Each request (a /chat call, an explore job) gets a RequestUsage through a context
+variable; crew worker threads see it because they run in a copy of the request
+context. Every LLM call records its input and output tokens there and in the
+`llm_tokens_total` metric. Counts come from watsonx (`token_usage` on the result,
+or the token counts on streamed chunks); when a response carries none, they are
+estimated from text length and the call is marked as estimated.
+
+A request may carry a token budget. Before each call the remaining budget caps
+`max_new_tokens`, so the answer is cut off by the model stopping rather than by an
+error. Once the budget is spent, further calls are not sent: they return a final
+answer built from the last output, so the agent finishes instead of failing.
+
+Kept identical in backend/chat and backend/explore; change both copies together.
+"""
+
+import contextvars
+import threading
+from typing import Any, Dict, Optional
+
+from metrics import registry
+
+# Granite's tokenizer averages roughly four characters of English text per token
+CHARS_PER_TOKEN = 4
+# Below this many tokens of headroom a call could not produce a useful answer
+MIN_CALL_TOKENS = 16
+
+BUDGET_NOTICE = "The token budget for this request was exhausted before the answer was complete."
+
+llm_tokens = registry.counter(
+    "llm_tokens_total",
+    "watsonx tokens by endpoint, agent, direction (input/output) and source (reported/estimated)",
+    ["endpoint", "agent", "direction", "source"],
+)
+llm_calls = registry.counter(
+    "llm_calls_total",
+    "watsonx calls by endpoint, agent and outcome (live, cached, capped, skipped)",
+    ["endpoint", "agent", "outcome"],
+)
+request_tokens = registry.histogram(
+    "request_tokens",
+    "Total tokens (input + output) used per request",
+    ["endpoint"],
+    buckets=(250, 500, 1000, 2000, 4000, 8000, 16000, 32000, 64000, 128000),
+)
+
+
+def estimate_tokens(text: Optional[str]) -> int:
+    if not text:
+        return 0
+    return max(1, (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN)
+
+
+class RequestUsage:
+    """Token totals for one request, with an optional budget on input + output tokens"""
+
+    def __init__(self, endpoint: str, budget: int = 0, conversation_id: Optional[str] = None):
+        self.endpoint = endpoint
+        self.budget = max(0, budget)
+        self.conversation_id = conversation_id
+        self._lock = threading.Lock()
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.calls = 0
+        self.cached_calls = 0
+        self.estimated_calls = 0
+        self.capped_calls = 0
+        self.skipped_calls = 0
+        self.by_agent: Dict[str, Dict[str, int]] = {}
+        self.last_output = ""
+
+    @property
+    def total_tokens(self) -> int:
+        return self.input_tokens + self.output_tokens
+
+    def allowance(self, prompt: str, max_new_tokens: Optional[int]) -> Optional[int]:
+        """
+        Output tokens this call may generate: None for no cap, 0 when the budget is spent
+
+        The prompt's tokens are estimated up front; the real count is charged afterwards.
+        """
+        if not self.budget:
+            return None
+        with self._lock:
+            remaining = self.budget - self.total_tokens - estimate_tokens(prompt)
+        if remaining < MIN_CALL_TOKENS:
+            return 0
+        if max_new_tokens is not None and max_new_tokens <= remaining:
+            return None
+        return remaining
+
+    def _agent(self, agent: str) -> Dict[str, int]:
+        totals = self.by_agent.get(agent)
+        if totals is None:
+            totals = self.by_agent[agent] = {"input_tokens": 0, "output_tokens": 0, "calls": 0}
+        return totals
+
+    def record(
+        self,
+        agent: str,
+        input_tokens: int,
+        output_tokens: int,
+        estimated: bool = False,
+        capped: bool = False,
+        output: str = "",
+    ):
+        with self._lock:
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self.calls += 1
+            self.estimated_calls += estimated
+            self.capped_calls += capped
+            totals = self._agent(agent)
+            totals["input_tokens"] += input_tokens
+            totals["output_tokens"] += output_tokens
+            totals["calls"] += 1
+            if output:
+                self.last_output = output
+        source = "estimated" if estimated else "reported"
+        llm_tokens.inc(self.endpoint, agent, "input", source, amount=input_tokens)
+        llm_tokens.inc(self.endpoint, agent, "output", source, amount=output_tokens)
+        llm_calls.inc(self.endpoint, agent, "capped" if capped else "live")
+
+    def record_cached(self, agent: str):
+        with self._lock:
+            self.cached_calls += 1
+            self._agent(agent)
+        llm_calls.inc(self.endpoint, agent, "cached")
+
+    def record_skipped(self, agent: str) -> str:
+        """Count a call refused by the budget; returns the text that stands in for its answer"""
+        with self._lock:
+            self.skipped_calls += 1
+            self._agent(agent)
+            partial = self.last_output
+        llm_calls.inc(self.endpoint, agent, "skipped")
+        # A final answer lets the crewai executor stop instead of retrying the call
+        answer = partial.split("Final Answer:", 1)[-1].strip() if partial else ""
+        return f"Thought: {BUDGET_NOTICE}\nFinal Answer: {answer or BUDGET_NOTICE}"
+
+    def finish(self):
+        """Observe the request's total in the per-request histogram"""
+        request_tokens.observe(self.total_tokens, self.endpoint)
+
+    def summary(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "input_tokens": self.input_tokens,
+                "output_tokens": self.output_tokens,
+                "total_tokens": self.total_tokens,
+                "llm_calls": self.calls,
+                "cached_calls": self.cached_calls,
+                "estimated_calls": self.estimated_calls,
+                "budget": self.budget or None,
+                "capped_calls": self.capped_calls,
+                "skipped_calls": self.skipped_calls,
+                "budget_exhausted": bool(self.skipped_calls) or bool(self.budget and self.total_tokens >= self.budget),
+                "by_agent": {agent: dict(totals) for agent, totals in self.by_agent.items()},
+            }
+
+
+# Usage of the request running in this context; None outside a request (warmup, tests)
+current_usage: contextvars.ContextVar[Optional[RequestUsage]] = contextvars.ContextVar("current_usage", default=None)
+
+
+def add_usage(totals: Dict[str, int], usage: Optional[Dict[str, Any]]):
+    """Add a summary's token counts into `totals` (e.g. summing a conversation's turns)"""
+    if not usage:
+        return
+    for key in ("input_tokens", "output_tokens", "total_tokens", "llm_calls"):
+        totals[key] = totals.get(key, 0) + (usage.get(key) or 0)
+
+
+def stats() -> Dict[str, Any]:
+    """Tokens and calls since startup, per endpoint and per agent"""
+    endpoints: Dict[str, Dict[str, int]] = {}
+    agents: Dict[str, Dict[str, int]] = {}
+    for (endpoint, agent, direction, source), value in llm_tokens.values().items():
+        for bucket in (endpoints.setdefault(endpoint, {}), agents.setdefault(agent, {})):
+            bucket[f"{direction}_tokens"] = bucket.get(f"{direction}_tokens", 0) + int(value)
+            if source == "estimated":
+                bucket[f"estimated_{direction}_tokens"] = bucket.get(f"estimated_{direction}_tokens", 0) + int(value)
+    for (endpoint, agent, outcome), value in llm_calls.values().items():
+        for bucket in (endpoints.setdefault(endpoint, {}), agents.setdefault(agent, {})):
+            bucket[f"{outcome}_calls"] = bucket.get(f"{outcome}_calls", 0) + int(value)
+    requests = {labels[0]: entry for labels, entry in request_tokens.values().items()}
+    for endpoint, entry in requests.items():
+        count = sum(entry[:-1])
+        endpoints.setdefault(endpoint, {}).update({
+            "requests": count,
+            "avg_tokens_per_request": round(entry[-1] / count, 1) if count else 0.0,
+        })
+    return {"endpoints": endpoints, "agents": agents}
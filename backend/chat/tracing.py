@@ -0,0 +1,417 @@
+"""
+Request tracing: nested spans per request, exported as JSONL without a collector.
+
+A trace starts at the edge of a request (the /chat handler, an explore job) and every
+span opened while it runs becomes a child of the innermost open span, found through a
+context variable. Crew worker threads run with a copy of the request context, so agent
+iterations, tool calls and watsonx calls made there land in the same trace. When no
+trace is active (warmup, speculative drafts that were muted) `span()` is a no-op.
+
+    with tracer.trace("chat", traceparent=header, conversation_id=cid):
+        with span("llm.generate", agent="chat_assistant", prompt_chars=n) as s:
+            ...
+            if s: s.set(output_chars=m)
+
+Sampling is decided at both ends. A W3C `traceparent` header with the sampled flag
+keeps the trace (and adopts its trace id); otherwise `sample_rate` picks traces up
+front. When the root ends, traces slower than `slow_seconds` or ending in an error are
+kept anyway, so slow requests can be reconstructed offline. Kept traces go to a
+writer thread that appends one JSON line per trace to `traces-YYYYMMDD.jsonl`.
+
+Kept identical in backend/chat and backend/explore; change both copies together.
+"""
+
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+_TRACEPARENT = re.compile(r"^[0-9a-f]{2}-([0-9a-f]{32})-([0-9a-f]{16})-([0-9a-f]{2})$")
+_CLOSE = object()
+
+
+def _new_id(bits: int) -> str:
+    return f"{random.getrandbits(bits):0{bits // 4}x}"
+
+
+class Span:
+    """One timed operation; `set` adds attributes, `end` closes it once"""
+
+    __slots__ = ("trace", "parent", "span_id", "name", "start", "_started", "duration", "attributes", "error", "mark")
+
+    def __init__(self, trace: "Trace", parent: Optional["Span"], name: str, attributes: Dict[str, Any]):
+        self.trace = trace
+        self.parent = parent
+        self.span_id = _new_id(64)
+        self.name = name
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+        # Iteration counter for agent spans (see agent_span / record_step)
+        self.mark = 0
+
+    def set(self, **attributes: Any):
+        self.attributes.update(attributes)
+
+    def record_error(self, error: Any):
+        """Mark the span failed (e.g. an error that was handled); the trace is then kept"""
+        self.error = f"{type(error).__name__}: {error}" if isinstance(error, BaseException) else str(error)
+        self.trace.errored = True
+
+    def end(self, error: Optional[BaseException] = None):
+        if self.duration is not None:
+            return
+        self.duration = time.perf_counter() - self._started
+        if error is not None:
+            self.record_error(error)
+        if self.parent is None:
+            self.trace.tracer._finish(self.trace)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent.span_id if self.parent is not None else self.trace.remote_parent,
+            "name": self.name,
+            "start": self.start,
+            "duration_ms": round(self.duration * 1000, 3) if self.duration is not None else None,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class Trace:
+    """Spans of one request, buffered until the root span ends"""
+
+    def __init__(self, tracer: "Tracer", trace_id: str, sampled: bool, remote_parent: Optional[str]):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.sampled = sampled
+        self.remote_parent = remote_parent
+        self.errored = False
+        self.spans: List[Span] = []
+        self.dropped_spans = 0
+
+    def add(self, span: Span) -> bool:
+        # list.append is atomic, so fan-out threads may add spans concurrently
+        if len(self.spans) >= self.tracer.max_spans:
+            self.dropped_spans += 1
+            return False
+        self.spans.append(span)
+        return True
+
+
+# Innermost open span of the request running in this context
+current_span: contextvars.ContextVar[Optional[Span]] = contextvars.ContextVar("current_span", default=None)
+
+
+def start_span(name: str, **attributes: Any) -> Optional[Span]:
+    """Open a child of the current span without activating it; None outside a trace"""
+    parent = current_span.get()
+    if parent is None:
+        return None
+    span = Span(parent.trace, parent, name, attributes)
+    return span if parent.trace.add(span) else None
+
+
+@contextmanager
+def span(name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """Time a block as a child of the current span and make it the current span"""
+    child = start_span(name, **attributes)
+    if child is None:
+        yield None
+        return
+    token = current_span.set(child)
+    try:
+        yield child
+    except Exception as e:
+        child.end(e)
+        raise
+    finally:
+        current_span.reset(token)
+        child.end()
+
+
+def trace_id() -> Optional[str]:
+    """Trace id of the active request, for response metadata and logs"""
+    current = current_span.get()
+    return current.trace.trace_id if current is not None else None
+
+
+@contextmanager
+def agent_span(agent: str, **attributes: Any) -> Iterator[Optional[Span]]:
+    """
+    Span for one agent run, with a child span per executor iteration
+
+    The first iteration span opens here; `record_step` (the agent's step callback)
+    closes it with what the step did and opens the next, so LLM and tool spans nest
+    under the iteration that made them.
+    """
+    with span("agent", agent=agent, **attributes) as run:
+        if run is None:
+            yield None
+            return
+        token = current_span.set(_open_iteration(run))
+        try:
+            yield run
+        finally:
+            iteration = current_span.get()
+            if iteration is not None and iteration.parent is run:
+                iteration.end()
+            current_span.reset(token)
+            run.set(iterations=run.mark)
+
+
+def _open_iteration(run: Span) -> Span:
+    run.mark += 1
+    iteration = Span(run.trace, run, "agent.iteration", {"iteration": run.mark})
+    run.trace.add(iteration)
+    return iteration
+
+
+def record_step(step: Any):
+    """
+    Close the current agent iteration from a crewai step callback
+
+    `step` is an AgentFinish, or a list of (AgentAction, observation) pairs for the
+    tool calls made in that iteration.
+    """
+    iteration = current_span.get()
+    if iteration is None or iteration.name != "agent.iteration":
+        return
+    if isinstance(step, list):
+        tools = []
+        observation_chars = 0
+        for entry in step:
+            action = getattr(entry, "action", None) or (entry[0] if isinstance(entry, tuple) else None)
+            observation = getattr(entry, "observation", None) or (entry[1] if isinstance(entry, tuple) else "")
+            if action is not None:
+                tools.append(getattr(action, "tool", None))
+            observation_chars += len(str(observation or ""))
+        iteration.set(tools=tools, observation_chars=observation_chars)
+        iteration.end()
+        current_span.set(_open_iteration(iteration.parent))
+    else:
+        output = getattr(step, "return_values", {}) or {}
+        iteration.set(finished=True, output_chars=len(str(output.get("output", ""))))
+        iteration.end()
+
+
+def step_callback(then: Optional[Callable[[Any], None]] = None) -> Callable[[Any], None]:
+    """Agent step callback that records the iteration, then calls `then`"""
+
+    def on_step(step: Any):
+        record_step(step)
+        if then is not None:
+            then(step)
+
+    return on_step
+
+
+def parse_traceparent(header: Optional[str]):
+    """(trace id, parent span id, sampled) from a W3C traceparent header, or None"""
+    if not header:
+        return None
+    match = _TRACEPARENT.match(header.strip().lower())
+    if match is None or match.group(1) == "0" * 32:
+        return None
+    return match.group(1), match.group(2), bool(int(match.group(3), 16) & 1)
+
+
+class JsonlExporter:
+    """Appends finished traces to a daily JSONL file from a background thread"""
+
+    def __init__(self, directory: str, max_queue: int = 1000):
+        self.directory = directory
+        self._queue: "queue.Queue[Any]" = queue.Queue(maxsize=max(1, max_queue))
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._exported = 0
+        self._dropped = 0
+        self._bytes_written = 0
+        self._write_errors = 0
+
+    def start(self):
+        if self._thread is not None:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._write_loop, name="trace-exporter", daemon=True)
+        self._thread.start()
+
+    def export(self, record: Dict[str, Any]):
+        """Queue a trace for writing; drops it (and counts) when the writer falls behind"""
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+
+    def _path(self) -> str:
+        return os.path.join(self.directory, f"traces-{datetime.now(timezone.utc):%Y%m%d}.jsonl")
+
+    def _write_loop(self):
+        while True:
+            record = self._queue.get()
+            batch = [record]
+            while len(batch) < 256:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            closing = _CLOSE in batch
+            batch = [record for record in batch if record is not _CLOSE]
+            if batch:
+                data = "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in batch)
+                try:
+                    with open(self._path(), "a", encoding="utf-8") as f:
+                        f.write(data)
+                    with self._lock:
+                        self._exported += len(batch)
+                        self._bytes_written += len(data.encode("utf-8"))
+                except OSError as e:
+                    with self._lock:
+                        self._write_errors += 1
+                    logger.error(f"Writing {len(batch)} traces failed: {e}")
+            if closing:
+                return
+
+    def close(self):
+        """Write everything queued so far and stop the writer"""
+        if self._thread is None:
+            return
+        self._queue.put(_CLOSE)
+        self._thread.join(timeout=10)
+        self._thread = None
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "directory": self.directory,
+                "queue_depth": self._queue.qsize(),
+                "exported": self._exported,
+                "dropped": self._dropped,
+                "bytes_written": self._bytes_written,
+                "write_errors": self._write_errors,
+            }
+
+
+class Tracer:
+    """Starts request traces and decides which finished ones are exported"""
+
+    def __init__(
+        self,
+        service: str,
+        exporter: Optional[JsonlExporter],
+        sample_rate: float = 0.1,
+        slow_seconds: float = 10.0,
+        max_spans: int = 2000,
+    ):
+        self.service = service
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_seconds = slow_seconds
+        self.max_spans = max(1, max_spans)
+        self._lock = threading.Lock()
+        self._started = 0
+        self._kept: Dict[str, int] = {"sampled": 0, "slow": 0, "error": 0}
+        self._discarded = 0
+        self._dropped_spans = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def start(self):
+        if self.exporter is not None:
+            self.exporter.start()
+
+    def close(self):
+        if self.exporter is not None:
+            self.exporter.close()
+
+    def start_trace(self, name: str, traceparent: Optional[str] = None, **attributes: Any) -> Optional[Span]:
+        """Open a root span (not activated); None when tracing is disabled"""
+        if self.exporter is None:
+            return None
+        remote = parse_traceparent(traceparent)
+        if remote is not None:
+            trace = Trace(self, remote[0], remote[2], remote[1])
+        else:
+            trace = Trace(self, _new_id(128), random.random() < self.sample_rate, None)
+        root = Span(trace, None, name, attributes)
+        trace.add(root)
+        with self._lock:
+            self._started += 1
+        return root
+
+    @contextmanager
+    def trace(self, name: str, traceparent: Optional[str] = None, **attributes: Any) -> Iterator[Optional[Span]]:
+        """Run a block as the root span of a new trace"""
+        root = self.start_trace(name, traceparent, **attributes)
+        if root is None:
+            yield None
+            return
+        token = current_span.set(root)
+        try:
+            yield root
+        except Exception as e:
+            root.end(e)
+            raise
+        finally:
+            current_span.reset(token)
+            root.end()
+
+    def _finish(self, trace: Trace):
+        root = trace.spans[0]
+        if trace.sampled:
+            reason = "sampled"
+        elif trace.errored:
+            reason = "error"
+        elif root.duration >= self.slow_seconds:
+            reason = "slow"
+        else:
+            reason = None
+        with self._lock:
+            self._dropped_spans += trace.dropped_spans
+            if reason is None:
+                self._discarded += 1
+                return
+            self._kept[reason] += 1
+        self.exporter.export({
+            "trace_id": trace.trace_id,
+            "service": self.service,
+            "name": root.name,
+            "start": root.start,
+            "duration_ms": round(root.duration * 1000, 3),
+            "reason": reason,
+            "error": trace.errored,
+            "dropped_spans": trace.dropped_spans,
+            "spans": [span.to_dict() for span in list(trace.spans)],
+        })
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = {
+                "enabled": self.enabled,
+                "sample_rate": self.sample_rate,
+                "slow_seconds": self.slow_seconds,
+                "max_spans": self.max_spans,
+                "started": self._started,
+                "kept": dict(self._kept),
+                "discarded": self._discarded,
+                "dropped_spans": self._dropped_spans,
+            }
+        if self.exporter is not None:
+            stats["exporter"] = self.exporter.stats()
+        return stats
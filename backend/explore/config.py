@@ -1,13 +1,25 @@
 import os
+import tempfile
 from dotenv import load_dotenv, find_dotenv
 
 # Load environment variables (search upwards so running from subdirs works)
 load_dotenv(find_dotenv(), override=False)
 
 
+def data_path(name: str) -> str:
+    """`name` inside DATA_DIR, or an empty string when DATA_DIR is unset."""
+    data_dir = os.getenv("DATA_DIR", "")
+    return os.path.join(data_dir, name) if data_dir else ""
+
+
 class ExploreConfig:
     """Configuration for the Explore agentic workflow."""
 
+    # Runtime state: set DATA_DIR to a mounted volume to keep jobs, caches, traces and profiles
+    # on disk. Unset, nothing is written to the working directory; each path below can also be
+    # set on its own.
+    DATA_DIR = os.getenv("DATA_DIR", "")
+
     # IBM Watson Configuration
     IBM_API_KEY = os.getenv("IBM_API_KEY")
     IBM_WATSONX_URL = os.getenv("IBM_WATSONX_URL")
@@ -17,6 +29,34 @@ class ExploreConfig:
     EXA_API_KEY = os.getenv("EXA_API_KEY")
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # Only for embeddings if memory is enabled
 
+    # EXA HTTP client
+    EXA_BASE_URL = os.getenv("EXA_BASE_URL", "https://api.exa.ai")
+    EXA_TIMEOUT = float(os.getenv("EXA_TIMEOUT", "15"))
+    EXA_MAX_CONNECTIONS = int(os.getenv("EXA_MAX_CONNECTIONS", "20"))
+    EXA_MAX_KEEPALIVE = int(os.getenv("EXA_MAX_KEEPALIVE", "10"))
+
+    # EXA search result cache (in-process TTL + LRU)
+    SEARCH_CACHE_TTL = float(os.getenv("SEARCH_CACHE_TTL", "3600"))
+    SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(32 * 1024 * 1024)))
+    SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2048"))
+    # Persistent tier under the memory cache; point it at a mounted volume to survive redeploys.
+    # Defaults to DATA_DIR/search_cache.db; empty (the default without DATA_DIR) disables it.
+    SEARCH_DISK_CACHE_PATH = os.getenv("SEARCH_DISK_CACHE_PATH", data_path("search_cache.db"))
+    SEARCH_DISK_CACHE_TTL = float(os.getenv("SEARCH_DISK_CACHE_TTL", str(7 * 24 * 3600)))
+    SEARCH_DISK_CACHE_MAX_BYTES = int(os.getenv("SEARCH_DISK_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+
+    # Completion cache for greedy watsonx calls (LLM_CACHE_DISK_PATH enables the SQLite tier)
+    LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "True").lower() == "true"
+    LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "512"))
+    LLM_CACHE_MAX_BYTES = int(os.getenv("LLM_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+    LLM_CACHE_TTL = float(os.getenv("LLM_CACHE_TTL", str(24 * 3600)))
+    LLM_CACHE_DISK_PATH = os.getenv("LLM_CACHE_DISK_PATH", "")
+
+    # Startup: LAZY_STARTUP binds the port first and warms crews in the background;
+    # WARMUP_CONNECT also authenticates with watsonx before reporting ready.
+    LAZY_STARTUP = os.getenv("LAZY_STARTUP", "True").lower() == "true"
+    WARMUP_CONNECT = os.getenv("WARMUP_CONNECT", "True").lower() == "true"
+
     # Application Settings
     DEBUG = os.getenv("DEBUG", "False").lower() == "true"
     HOST = os.getenv("HOST", "0.0.0.0")
@@ -26,6 +66,41 @@ class ExploreConfig:
     # LLM defaults
     DEFAULT_TEMPERATURE = float(os.getenv("EXPLORE_TEMPERATURE", os.getenv("DEFAULT_TEMPERATURE", "0.3")))
     MAX_TOKENS = int(os.getenv("EXPLORE_MAX_TOKENS", os.getenv("MAX_TOKENS", "2000")))
+    # Input + output tokens one job may spend across all its watsonx calls; 0 is unlimited.
+    # Near the limit max_new_tokens is lowered, then further calls return the partial answer.
+    TOKEN_BUDGET = int(os.getenv("EXPLORE_TOKEN_BUDGET", os.getenv("TOKEN_BUDGET", "0")))
+
+    # Background job execution
+    # Each running job checks out its own pooled crew set, so workers run in parallel.
+    JOB_WORKERS = int(os.getenv("EXPLORE_JOB_WORKERS", "3"))
+    # Without DATA_DIR or EXPLORE_JOB_DB jobs are kept in memory and not resumed after a restart.
+    JOB_DB_PATH = os.getenv("EXPLORE_JOB_DB", data_path("explore_jobs.db")) or ":memory:"
+
+    # Crew set pool; 0 sizes it to JOB_WORKERS
+    CREW_POOL_SIZE = int(os.getenv("EXPLORE_CREW_POOL_SIZE", "0"))
+    CREW_POOL_PREBUILD = int(os.getenv("EXPLORE_CREW_POOL_PREBUILD", "1"))
+
+    # Tracing: one JSONL line per kept job trace in TRACE_DIR (defaults to DATA_DIR/traces;
+    # empty disables). A fraction TRACE_SAMPLE_RATE is kept up front; slower or failed jobs
+    # are always kept.
+    TRACE_DIR = os.getenv("TRACE_DIR", data_path("traces"))
+    TRACE_SAMPLE_RATE = float(os.getenv("TRACE_SAMPLE_RATE", "0.1"))
+    TRACE_SLOW_SECONDS = float(os.getenv("EXPLORE_TRACE_SLOW_SECONDS", os.getenv("TRACE_SLOW_SECONDS", "60")))
+    TRACE_MAX_SPANS = int(os.getenv("TRACE_MAX_SPANS", "2000"))
+    TRACE_EXPORT_QUEUE = int(os.getenv("TRACE_EXPORT_QUEUE", "1000"))
+
+    # Profiling: requests presenting PROFILE_TOKEN (X-Profile-Token header or ?profile=) run under
+    # a stack sampler and leave collapsed-stack profiles in PROFILE_DIR; the /heap endpoints take
+    # tracemalloc snapshots. Both are disabled while PROFILE_TOKEN is empty. Profile /explore or
+    # /explore/stream, which last as long as the job, rather than the /explore/jobs submission.
+    PROFILE_TOKEN = os.getenv("PROFILE_TOKEN", "")
+    # Profiles go to DATA_DIR/profiles, or the system temp directory without DATA_DIR
+    PROFILE_DIR = os.getenv("PROFILE_DIR", data_path("profiles") or os.path.join(tempfile.gettempdir(), "explore-profiles"))
+    PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.005"))
+    PROFILE_MAX_SECONDS = float(os.getenv("EXPLORE_PROFILE_MAX_SECONDS", os.getenv("PROFILE_MAX_SECONDS", "600")))
+    PROFILE_KEEP = int(os.getenv("PROFILE_KEEP", "100"))
+    HEAP_TRACE_FRAMES = int(os.getenv("HEAP_TRACE_FRAMES", "10"))
+    HEAP_MAX_SNAPSHOTS = int(os.getenv("HEAP_MAX_SNAPSHOTS", "4"))
 
     @classmethod
     def validate_config(cls):
@@ -1,31 +1,80 @@
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List, Optional
 
 from crewai import Crew, Process
 
-from agents import planner_agent, research_agent, coordinate_extraction_agent, synthesis_agent, exa_search_tool
+from agents import (
+    create_planner_agent,
+    create_research_agent,
+    create_coordinate_extraction_agent,
+    create_synthesis_agent,
+    exa_search_tool,
+)
+from crew_pool import CrewPool
+from metrics import track_stage
+from tracing import agent_span, span, step_callback
 from tasks import create_planning_task, create_research_task, create_coordinate_extraction_task, create_synthesis_task
 from config import ExploreConfig
 
 
-class ExploreCrew:
-    """Agentic workflow to plan, search (EXA), and synthesize results using IBM Watsonx."""
+class ExploreCrewSet:
+    """A private set of agents plus the crew that runs them, checked out per job."""
 
     def __init__(self) -> None:
+        self.planner = create_planner_agent()
+        self.researcher = create_research_agent()
+        self.coordinate_extractor = create_coordinate_extraction_agent()
+        self.synthesizer = create_synthesis_agent()
+        # Each executor iteration becomes a span in the job's trace
+        for agent in (self.planner, self.researcher, self.coordinate_extractor, self.synthesizer):
+            agent.step_callback = step_callback()
         self.crew = Crew(
-            agents=[planner_agent, research_agent, coordinate_extraction_agent, synthesis_agent],
+            agents=[self.planner, self.researcher, self.coordinate_extractor, self.synthesizer],
             tasks=[],
             process=Process.sequential,
             verbose=True,
             memory=False,
         )
 
-    def run(self, query: str, user_location: Dict[str, float] = None) -> Dict[str, Any]:
+    def kickoff(self, task) -> str:
+        """Run a single task through this set's crew and return its output as text."""
+        self.crew.tasks = [task]
+        with agent_span(task.agent.role):
+            return str(self.crew.kickoff())
+
+    def reset(self) -> None:
+        """Drop the finished job's tasks before the set is reused."""
+        self.crew.tasks = []
+
+
+class ExploreCrew:
+    """Agentic workflow to plan, search (EXA), and synthesize results using IBM Watsonx."""
+
+    def __init__(self) -> None:
+        # One crew set per concurrently running job, so workers never share agents or tasks
+        self.pool = CrewPool(
+            "explore",
+            ExploreCrewSet,
+            size=ExploreConfig.CREW_POOL_SIZE or ExploreConfig.JOB_WORKERS,
+            prebuild=ExploreConfig.CREW_POOL_PREBUILD,
+            reset=ExploreCrewSet.reset,
+        )
+
+    def run(
+        self,
+        query: str,
+        user_location: Dict[str, float] = None,
+        completed: Optional[Dict[str, str]] = None,
+        on_stage: Optional[Callable[[str, str], None]] = None,
+    ) -> Dict[str, Any]:
         """
         Run the exploration crew with optional user location context.
         
         Args:
             query: The user's search query
             user_location: Optional dict with user's location {'lat': float, 'lng': float}
+            completed: Outputs of stages that already finished, keyed by stage name (see jobs.STAGES).
+                Those stages are skipped, which lets an interrupted job resume.
+            on_stage: Called with (stage_name, output) as soon as each stage finishes
         """
         # Validate and format location for strict geographic search
         location_context = {}
@@ -47,35 +96,45 @@ class ExploreCrew:
                         query = f"{query} near current location"
             except (ValueError, TypeError):
                 location_context = None
-        # 1) Planning
-        planning_task = create_planning_task(query, user_location)
-
-        # 2) Research (uses EXA tool). We will force at least one pre-search to ensure data present.
-        #    This bypasses any tool-calling quirks by injecting results context if needed.
-        forced_search = exa_search_tool._run(query)
-        research_preamble = f"Forced initial EXA search for context:\n{forced_search}\n\nUse EXA again per plan steps."
-        research_task = create_research_task(query, plan_text=f"{research_preamble}\n\n(Plan will follow)\n{{PLAN_PLACEHOLDER}}", user_location=user_location)
-
-        # 3) Synthesis
-        synthesis_task = create_synthesis_task(query, research_notes="{RESEARCH_NOTES_PLACEHOLDER}", user_location=user_location)
-
-        # Wire sequentially by running step-by-step to pass outputs
-        self.crew.tasks = [planning_task]
-        plan_result = str(self.crew.kickoff())
-
-        research_task = create_research_task(query, plan_text=plan_result + "\n\n" + research_preamble, user_location=user_location)
-        self.crew.tasks = [research_task]
-        research_result = str(self.crew.kickoff())
-
-        # 3) Coordinate & Image Extraction
-        coordinate_task = create_coordinate_extraction_task(query, research_notes=research_result, user_location=user_location)
-        self.crew.tasks = [coordinate_task]
-        coordinate_result = str(self.crew.kickoff())
-
-        # 4) Synthesis
-        synthesis_task = create_synthesis_task(query, research_notes=research_result, coordinate_data=coordinate_result, user_location=user_location)
-        self.crew.tasks = [synthesis_task]
-        synthesis_result = str(self.crew.kickoff())
+
+        completed = dict(completed or {})
+
+        def stage(name: str, produce: Callable[[], str]) -> str:
+            # Reuse output persisted by a previous (interrupted) run of the same job
+            if name in completed:
+                return completed[name]
+            with track_stage(name), span("stage", stage=name) as traced:
+                output = produce()
+                if traced is not None:
+                    traced.set(output_chars=len(output))
+            completed[name] = output
+            if on_stage:
+                on_stage(name, output)
+            return output
+
+        with self.pool.acquire() as crews:
+            # 1) Research preamble (uses EXA tool). We force at least one pre-search to ensure data present.
+            #    This bypasses any tool-calling quirks by injecting results context if needed.
+            forced_search = stage("search", lambda: exa_search_tool._run(query))
+            research_preamble = f"Forced initial EXA search for context:\n{forced_search}\n\nUse EXA again per plan steps."
+
+            # 2) Planning
+            plan_result = stage("plan", lambda: crews.kickoff(create_planning_task(crews.planner, query, user_location)))
+
+            # 3) Research
+            research_result = stage("research", lambda: crews.kickoff(
+                create_research_task(crews.researcher, query, plan_text=plan_result + "\n\n" + research_preamble, user_location=user_location)
+            ))
+
+            # 4) Coordinate & Image Extraction
+            coordinate_result = stage("coordinates", lambda: crews.kickoff(
+                create_coordinate_extraction_task(crews.coordinate_extractor, query, research_notes=research_result, user_location=user_location)
+            ))
+
+            # 5) Synthesis
+            synthesis_result = stage("synthesis", lambda: crews.kickoff(
+                create_synthesis_task(crews.synthesizer, query, research_notes=research_result, coordinate_data=coordinate_result, user_location=user_location)
+            ))
 
         # Expect synthesis_result to be JSON; return parsed if possible
         import json
@@ -0,0 +1,249 @@
+"""
+Pooled EXA search client shared by the chat and explore services.
+
+Both services deploy from their own directory, so this module is kept identical
+in backend/chat and backend/explore; change both copies together.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+import weakref
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from search_cache import SearchCache
+
+try:
+    import h2  # noqa: F401  (enables HTTP/2 in httpx)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+
+class EXASearchError(Exception):
+    """Raised when an EXA search fails at the HTTP or network level"""
+
+    def __init__(self, message: str, status_code: Optional[int] = None, body: str = ""):
+        super().__init__(message)
+        self.status_code = status_code
+        self.body = body
+
+
+class EXAClient:
+    """
+    EXA /search client with keep-alive connection pooling and per-call timeouts.
+
+    `search` serves the synchronous crew tools running in worker threads and shares one
+    thread-safe connection pool. `asearch` is the non-blocking path for coroutines; each
+    event loop gets its own pooled AsyncClient because httpx clients are loop-bound.
+    """
+
+    def __init__(
+        self,
+        api_key: str,
+        base_url: str = "https://api.exa.ai",
+        timeout: float = 15.0,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 60.0,
+        http2: bool = True,
+        cache: Optional[SearchCache] = None,
+    ):
+        self.cache = cache
+        self.base_url = base_url.rstrip("/")
+        self.timeout = timeout
+        self.max_connections = max_connections
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self._client_kwargs = {
+            "base_url": self.base_url,
+            "http2": self.http2,
+            "timeout": httpx.Timeout(timeout, connect=min(timeout, 5.0)),
+            "limits": httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+            "headers": {
+                "accept": "application/json",
+                "content-type": "application/json",
+                "x-api-key": api_key or "",
+            },
+        }
+        if http2 and not HTTP2_AVAILABLE:
+            logger.warning("h2 is not installed; EXA client falling back to HTTP/1.1 keep-alive")
+
+        self._sync_client: Optional[httpx.Client] = None
+        self._async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+            weakref.WeakKeyDictionary()
+        )
+        self._lock = threading.Lock()
+
+        # Pool utilisation stats
+        self._in_flight = 0
+        self._peak_in_flight = 0
+        self._requests = 0
+        self._errors = 0
+        self._timeouts = 0
+        self._total_latency = 0.0
+        self._max_latency = 0.0
+
+    # -- clients ---------------------------------------------------------------
+
+    def _get_sync_client(self) -> httpx.Client:
+        if self._sync_client is None:
+            with self._lock:
+                if self._sync_client is None:
+                    self._sync_client = httpx.Client(**self._client_kwargs)
+        return self._sync_client
+
+    def _get_async_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        client = self._async_clients.get(loop)
+        if client is None or client.is_closed:
+            client = httpx.AsyncClient(**self._client_kwargs)
+            self._async_clients[loop] = client
+        return client
+
+    # -- requests --------------------------------------------------------------
+
+    @staticmethod
+    def _payload(query: str, num_results: int) -> Dict[str, Any]:
+        return {
+            "query": query,
+            "numResults": num_results,
+            "type": "neural",
+            "contents": {"text": True},
+        }
+
+    def _begin(self) -> float:
+        with self._lock:
+            self._in_flight += 1
+            self._requests += 1
+            self._peak_in_flight = max(self._peak_in_flight, self._in_flight)
+        return time.perf_counter()
+
+    def _end(self, started: float, error: Optional[Exception] = None):
+        latency = time.perf_counter() - started
+        with self._lock:
+            self._in_flight -= 1
+            self._total_latency += latency
+            self._max_latency = max(self._max_latency, latency)
+            if error is not None:
+                self._errors += 1
+                if isinstance(error, httpx.TimeoutException):
+                    self._timeouts += 1
+
+    @staticmethod
+    def _parse(response: httpx.Response) -> List[Dict[str, Any]]:
+        if response.status_code != 200:
+            raise EXASearchError(
+                f"Search failed with status {response.status_code}: {response.text}",
+                status_code=response.status_code,
+                body=response.text,
+            )
+        try:
+            return response.json().get("results", [])
+        except ValueError as e:
+            raise EXASearchError(f"EXA returned invalid JSON: {e}", status_code=response.status_code) from e
+
+    def search(self, query: str, num_results: int = 5, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Run a search and return EXA's raw result dicts (title, url, text, ...)"""
+        if self.cache is not None:
+            cached = self.cache.get(query, num_results)
+            if cached is not None:
+                return cached
+
+        started = self._begin()
+        error = None
+        try:
+            response = self._get_sync_client().post(
+                "/search",
+                json=self._payload(query, num_results),
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+            )
+            results = self._parse(response)
+        except httpx.HTTPError as e:
+            error = e
+            raise EXASearchError(f"EXA request failed: {e}") from e
+        except EXASearchError as e:
+            error = e
+            raise
+        finally:
+            self._end(started, error)
+
+        if self.cache is not None:
+            self.cache.put(query, num_results, results)
+        return results
+
+    async def _cache_call(self, method, *args):
+        """Run a cache method, in a worker thread when it may reach the SQLite disk tier"""
+        if self.cache.backing is None:
+            return method(*args)
+        return await asyncio.to_thread(method, *args)
+
+    async def asearch(self, query: str, num_results: int = 5, timeout: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Async variant of `search` that never blocks the event loop"""
+        if self.cache is not None:
+            cached = await self._cache_call(self.cache.get, query, num_results)
+            if cached is not None:
+                return cached
+
+        started = self._begin()
+        error = None
+        try:
+            response = await self._get_async_client().post(
+                "/search",
+                json=self._payload(query, num_results),
+                timeout=timeout if timeout is not None else httpx.USE_CLIENT_DEFAULT,
+            )
+            results = self._parse(response)
+        except httpx.HTTPError as e:
+            error = e
+            raise EXASearchError(f"EXA request failed: {e}") from e
+        except EXASearchError as e:
+            error = e
+            raise
+        finally:
+            self._end(started, error)
+
+        if self.cache is not None:
+            await self._cache_call(self.cache.put, query, num_results, results)
+        return results
+
+    # -- lifecycle / stats -----------------------------------------------------
+
+    def close(self):
+        """Close the shared sync pool"""
+        with self._lock:
+            client, self._sync_client = self._sync_client, None
+        if client is not None:
+            client.close()
+
+    async def aclose(self):
+        """Close the sync pool and the async pool bound to the running loop"""
+        self.close()
+        client = self._async_clients.pop(asyncio.get_running_loop(), None)
+        if client is not None:
+            await client.aclose()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "http2": self.http2,
+                "max_connections": self.max_connections,
+                "in_flight": self._in_flight,
+                "peak_in_flight": self._peak_in_flight,
+                "pool_utilization": round(self._in_flight / self.max_connections, 3) if self.max_connections else 0.0,
+                "requests": self._requests,
+                "errors": self._errors,
+                "timeouts": self._timeouts,
+                "avg_latency_ms": round(self._total_latency / self._requests * 1000, 2) if self._requests else 0.0,
+                "max_latency_ms": round(self._max_latency * 1000, 2),
+                "async_pools": len(self._async_clients),
+                "cache": self.cache.stats() if self.cache is not None else None,
+            }
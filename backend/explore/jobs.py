@@ -0,0 +1,330 @@
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional
+
+from config import ExploreConfig
+from metrics import registry, record_error
+from streaming import ItemStreamParser, current_item_parser
+from token_usage import RequestUsage, current_usage
+from tracing import JsonlExporter, Span, Tracer
+
+# Pipeline stages in execution order (see ExploreCrew.run); each one's output feeds the next
+STAGES = ("search", "plan", "research", "coordinates", "synthesis")
+
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = ("completed", "failed")
+
+jobs_in_flight = registry.gauge("explore_jobs", "Explore jobs waiting for a worker or running", ["state"])
+
+
+class JobStore:
+    """SQLite-backed persistence for explore jobs and the output of each finished stage."""
+
+    def __init__(self, path: str) -> None:
+        if path == ":memory:":
+            logger.warning("Explore jobs are kept in memory; set DATA_DIR or EXPLORE_JOB_DB to resume them after a restart")
+        else:
+            os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            with self._conn:
+                self._conn.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS jobs (
+                        id TEXT PRIMARY KEY,
+                        query TEXT NOT NULL,
+                        user_location TEXT,
+                        status TEXT NOT NULL,
+                        current_stage TEXT,
+                        stages TEXT NOT NULL DEFAULT '{}',
+                        result TEXT,
+                        error TEXT,
+                        created_at TEXT NOT NULL,
+                        updated_at TEXT NOT NULL
+                    )
+                    """
+                )
+                self._conn.execute("CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, created_at)")
+
+    @staticmethod
+    def _to_dict(row: sqlite3.Row) -> Dict[str, Any]:
+        stages = json.loads(row["stages"])
+        return {
+            "id": row["id"],
+            "query": row["query"],
+            "user_location": json.loads(row["user_location"]) if row["user_location"] else None,
+            "status": row["status"],
+            "current_stage": row["current_stage"],
+            "stages_completed": [name for name in STAGES if name in stages],
+            "stages": stages,
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def create(self, query: str, user_location: Optional[Dict[str, float]] = None) -> Dict[str, Any]:
+        job_id = uuid.uuid4().hex
+        now = datetime.now().isoformat()
+        with self._lock, self._conn:
+            self._conn.execute(
+                "INSERT INTO jobs (id, query, user_location, status, current_stage, created_at, updated_at) "
+                "VALUES (?, ?, ?, 'queued', ?, ?, ?)",
+                (job_id, query, json.dumps(user_location) if user_location else None, STAGES[0], now, now),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return self._to_dict(row) if row else None
+
+    def unfinished(self) -> List[str]:
+        """Ids of jobs that were queued or running when the process last stopped."""
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id FROM jobs WHERE status IN ('queued', 'running') ORDER BY created_at"
+            ).fetchall()
+        return [row["id"] for row in rows]
+
+    def _update(self, job_id: str, **fields: Any) -> None:
+        fields["updated_at"] = datetime.now().isoformat()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock, self._conn:
+            self._conn.execute(f"UPDATE jobs SET {assignments} WHERE id = ?", (*fields.values(), job_id))
+
+    def mark_running(self, job_id: str) -> None:
+        self._update(job_id, status="running")
+
+    def save_stage(self, job_id: str, stage: str, output: str) -> None:
+        with self._lock:
+            row = self._conn.execute("SELECT stages FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        stages = json.loads(row["stages"]) if row else {}
+        stages[stage] = output
+        remaining = [name for name in STAGES if name not in stages]
+        self._update(job_id, stages=json.dumps(stages), current_stage=remaining[0] if remaining else None)
+
+    def complete(self, job_id: str, result: Dict[str, Any]) -> None:
+        self._update(job_id, status="completed", current_stage=None, result=json.dumps(result))
+
+    def fail(self, job_id: str, error: str) -> None:
+        self._update(job_id, status="failed", error=error)
+
+
+class JobManager:
+    """Runs explore jobs on a worker pool and fans their progress out to async listeners."""
+
+    def __init__(self, store: JobStore, workers: int, tracer: Tracer) -> None:
+        self.store = store
+        self.tracer = tracer
+        # traceparent headers of submitted jobs, picked up when a worker starts the job
+        self._traceparents: Dict[str, Optional[str]] = {}
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="explore-job")
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._listeners: Dict[str, List[asyncio.Queue]] = {}
+        self._listeners_lock = threading.Lock()
+        # Items streamed out of an in-progress synthesis stage, for clients that connect late
+        self._partial_items: Dict[str, List[Dict[str, Any]]] = {}
+
+    def start(self, loop: asyncio.AbstractEventLoop) -> None:
+        """Bind to the server's event loop and requeue jobs interrupted by a restart."""
+        self._loop = loop
+        for job_id in self.store.unfinished():
+            logger.info("Resuming explore job %s", job_id)
+            jobs_in_flight.inc("queued")
+            self._pool.submit(self._execute, job_id)
+
+    def shutdown(self) -> None:
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def submit(
+        self,
+        query: str,
+        user_location: Optional[Dict[str, float]] = None,
+        traceparent: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        job = self.store.create(query, user_location)
+        if traceparent:
+            self._traceparents[job["id"]] = traceparent
+        jobs_in_flight.inc("queued")
+        self._pool.submit(self._execute, job["id"])
+        return job
+
+    async def asubmit(
+        self,
+        query: str,
+        user_location: Optional[Dict[str, float]] = None,
+        traceparent: Optional[str] = None,
+    ) -> Dict[str, Any]:
+        """Like submit, but the job row is written off the event loop."""
+        return await asyncio.to_thread(self.submit, query, user_location, traceparent)
+
+    async def get(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Read a job off the event loop: the store's connection is shared with workers
+        writing stage output, so a read may wait behind their commits.
+        """
+        return await asyncio.to_thread(self.store.get, job_id)
+
+    def _execute(self, job_id: str) -> None:
+        jobs_in_flight.dec("queued")
+        traceparent = self._traceparents.pop(job_id, None)
+        with jobs_in_flight.track_inprogress("running"), self.tracer.trace(
+            "explore.job", traceparent=traceparent, job_id=job_id
+        ) as root:
+            self._run_job(job_id, root)
+
+    def _run_job(self, job_id: str, root: Optional[Span] = None) -> None:
+        job = self.store.get(job_id)
+        if job is None or job["status"] in TERMINAL_STATUSES:
+            return
+
+        self.store.mark_running(job_id)
+        if root is not None:
+            root.set(query_chars=len(job["query"]), resumed_stages=job["stages_completed"])
+        self._publish(job_id, {
+            "type": "status",
+            "status": "running",
+            "resumed_stages": job["stages_completed"],
+            "trace_id": root.trace.trace_id if root is not None else None,
+        })
+
+        def on_stage(stage: str, output: str) -> None:
+            self.store.save_stage(job_id, stage, output)
+            self._publish(job_id, {"type": "stage", "stage": stage, "output": output})
+
+        partial_items = self._partial_items.setdefault(job_id, [])
+
+        def on_item(item: Dict[str, Any]) -> None:
+            partial_items.append(item)
+            self._publish(job_id, {"type": "item", "index": len(partial_items) - 1, "item": item})
+
+        # Synthesis tokens are parsed as they stream so each place is published once complete
+        parser_token = current_item_parser.set(ItemStreamParser(on_item))
+        usage = RequestUsage("explore", ExploreConfig.TOKEN_BUDGET)
+        usage_token = current_usage.set(usage)
+        try:
+            # Imported here so the API can start before crewai and the agents are loaded
+            from crew import explore_crew
+
+            result = explore_crew.run(
+                job["query"],
+                user_location=job["user_location"],
+                completed=job["stages"],
+                on_stage=on_stage,
+            )
+        except Exception as e:
+            logger.exception("Explore job %s failed", job_id)
+            record_error(e, "job")
+            if root is not None:
+                root.record_error(e)
+            self.store.fail(job_id, str(e))
+            self._publish(job_id, {"type": "failed", "error": str(e)})
+            return
+        finally:
+            current_usage.reset(usage_token)
+            current_item_parser.reset(parser_token)
+            self._partial_items.pop(job_id, None)
+            usage.finish()
+
+        # Stages resumed from a previous run are not counted again
+        result["token_usage"] = usage.summary()
+        self.store.complete(job_id, result)
+        self._publish(job_id, {"type": "completed", "result": result})
+
+    def _publish(self, job_id: str, event: Dict[str, Any]) -> None:
+        """Deliver an event to every listener of a job; safe to call from worker threads."""
+        if self._loop is None:
+            return
+        event = {**event, "job_id": job_id, "timestamp": datetime.now().isoformat()}
+        with self._listeners_lock:
+            queues = list(self._listeners.get(job_id, ()))
+        for queue in queues:
+            self._loop.call_soon_threadsafe(queue.put_nowait, event)
+
+    def _listen(self, job_id: str) -> asyncio.Queue:
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._listeners_lock:
+            self._listeners.setdefault(job_id, []).append(queue)
+        return queue
+
+    def _unlisten(self, job_id: str, queue: asyncio.Queue) -> None:
+        with self._listeners_lock:
+            queues = self._listeners.get(job_id, [])
+            if queue in queues:
+                queues.remove(queue)
+            if not queues:
+                self._listeners.pop(job_id, None)
+
+    async def events(self, job_id: str) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Yield a job's progress: first what is already persisted, then live events
+        until the job completes or fails.
+        """
+        # Subscribe before reading the snapshot so nothing slips in between
+        queue = self._listen(job_id)
+        try:
+            job = await self.get(job_id)
+            if job is None:
+                return
+
+            sent_stages = set()
+            yield {"type": "status", "job_id": job_id, "status": job["status"], "timestamp": job["updated_at"]}
+            for stage in job["stages_completed"]:
+                sent_stages.add(stage)
+                yield {"type": "stage", "job_id": job_id, "stage": stage, "output": job["stages"][stage]}
+
+            sent_items = 0
+            if job["status"] == "running":
+                for index, item in enumerate(list(self._partial_items.get(job_id, ()))):
+                    sent_items += 1
+                    yield {"type": "item", "job_id": job_id, "index": index, "item": item}
+
+            if job["status"] == "completed":
+                yield {"type": "completed", "job_id": job_id, "result": job["result"]}
+                return
+            if job["status"] == "failed":
+                yield {"type": "failed", "job_id": job_id, "error": job["error"]}
+                return
+
+            while True:
+                event = await queue.get()
+                if event["type"] == "stage":
+                    if event["stage"] in sent_stages:
+                        continue
+                    sent_stages.add(event["stage"])
+                elif event["type"] == "item" and event["index"] < sent_items:
+                    continue
+                yield event
+                if event["type"] in TERMINAL_STATUSES:
+                    return
+        finally:
+            self._unlisten(job_id, queue)
+
+    async def wait(self, job_id: str) -> Optional[Dict[str, Any]]:
+        """Wait without blocking the event loop until a job finishes, then return it."""
+        async for _ in self.events(job_id):
+            pass
+        return await self.get(job_id)
+
+
+tracer = Tracer(
+    "explore",
+    JsonlExporter(ExploreConfig.TRACE_DIR, max_queue=ExploreConfig.TRACE_EXPORT_QUEUE) if ExploreConfig.TRACE_DIR else None,
+    sample_rate=ExploreConfig.TRACE_SAMPLE_RATE,
+    slow_seconds=ExploreConfig.TRACE_SLOW_SECONDS,
+    max_spans=ExploreConfig.TRACE_MAX_SPANS,
+)
+job_manager = JobManager(JobStore(ExploreConfig.JOB_DB_PATH), ExploreConfig.JOB_WORKERS, tracer)
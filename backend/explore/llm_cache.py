@@ -0,0 +1,364 @@
+"""
+Deterministic completion cache for watsonx Granite calls.
+
+With greedy decoding the same (model, params, prompt, stop sequences) always yields
+the same completion, so repeated prompts can skip the watsonx round trip. Kept
+identical in backend/chat and backend/explore; change both copies together.
+"""
+
+import contextvars
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Any, Dict, Iterator, List, Optional
+
+from langchain_community.llms import WatsonxLLM
+from langchain_core.callbacks import CallbackManagerForLLMRun
+from langchain_core.outputs import Generation, GenerationChunk, LLMResult
+
+from token_usage import current_usage, estimate_tokens
+from tracing import span
+
+logger = logging.getLogger(__name__)
+
+# Per-call state shared with the WatsonxLLM hooks below: the budget's max_new_tokens cap
+# and the token counts reported on streamed chunks
+_max_new_tokens: contextvars.ContextVar[Optional[int]] = contextvars.ContextVar("max_new_tokens", default=None)
+_stream_counts: contextvars.ContextVar[Optional[Dict[str, int]]] = contextvars.ContextVar("stream_counts", default=None)
+# Set while WatsonxLLM._generate runs, so its own _stream calls go straight to watsonx
+_in_watsonx_call: contextvars.ContextVar[bool] = contextvars.ContextVar("in_watsonx_call", default=False)
+
+
+def completion_key(model_id: str, params: Optional[Dict[str, Any]], prompt: str, stop: Optional[List[str]]) -> str:
+    """Stable hash of everything that determines a greedy completion"""
+    material = json.dumps([model_id, params or {}, stop or [], prompt], sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class CompletionCache:
+    """
+    Bounded in-memory LRU of completions with an optional SQLite tier and per-agent stats.
+
+    Memory is capped by entry count and total characters held. The disk tier, when a
+    path is given, is read on memory misses and written through on every store.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        max_bytes: int = 16 * 1024 * 1024,
+        ttl: float = 24 * 3600,
+        disk_path: Optional[str] = None,
+    ):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._evictions = 0
+        self._agent_stats: Dict[str, Dict[str, float]] = defaultdict(
+            lambda: {"hits": 0, "disk_hits": 0, "misses": 0, "seconds_saved": 0.0}
+        )
+        # Average live latency per agent, used to estimate time saved by hits
+        self._agent_latency: Dict[str, List[float]] = defaultdict(lambda: [0.0, 0])
+
+        self._disk: Optional[sqlite3.Connection] = None
+        # Guards the SQLite connection only; the LRU has its own lock
+        self._disk_lock = threading.Lock()
+        if disk_path:
+            os.makedirs(os.path.dirname(os.path.abspath(disk_path)), exist_ok=True)
+            self._disk = sqlite3.connect(disk_path, check_same_thread=False)
+            self._disk.execute("PRAGMA journal_mode=WAL")
+            with self._disk:
+                self._disk.execute(
+                    """
+                    CREATE TABLE IF NOT EXISTS completions (
+                        key TEXT PRIMARY KEY,
+                        model_id TEXT NOT NULL,
+                        text TEXT NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                    """
+                )
+
+    def get(self, key: str, agent: str) -> Optional[str]:
+        now = time.time()
+        with self._lock:
+            stats = self._agent_stats[agent]
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] + self.ttl > now:
+                self._entries.move_to_end(key)
+                stats["hits"] += 1
+                stats["seconds_saved"] += self._average_latency(agent)
+                return entry[1]
+
+        # The disk read runs outside the memory lock so other agents' lookups don't queue behind it
+        row = None
+        if self._disk is not None:
+            try:
+                with self._disk_lock:
+                    row = self._disk.execute(
+                        "SELECT text, created_at FROM completions WHERE key = ?", (key,)
+                    ).fetchone()
+            except sqlite3.Error as e:
+                logger.warning(f"Completion cache disk read failed: {e}")
+
+        with self._lock:
+            if row is not None and row[1] + self.ttl > now:
+                self._store_memory(key, row[0], row[1])
+                stats["disk_hits"] += 1
+                stats["seconds_saved"] += self._average_latency(agent)
+                return row[0]
+            stats["misses"] += 1
+            return None
+
+    def put(self, key: str, model_id: str, text: str, agent: str, latency: float):
+        now = time.time()
+        with self._lock:
+            totals = self._agent_latency[agent]
+            totals[0] += latency
+            totals[1] += 1
+            self._store_memory(key, text, now)
+        if self._disk is not None:
+            try:
+                with self._disk_lock, self._disk:
+                    self._disk.execute(
+                        "INSERT OR REPLACE INTO completions (key, model_id, text, created_at) VALUES (?, ?, ?, ?)",
+                        (key, model_id, text, now),
+                    )
+            except sqlite3.Error as e:
+                logger.warning(f"Completion cache disk write failed: {e}")
+
+    def _store_memory(self, key: str, text: str, created_at: float):
+        """Insert into the LRU and evict down to the caps (caller holds the lock)"""
+        if len(text) > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= len(previous[1])
+        self._entries[key] = (created_at, text)
+        self._bytes += len(text)
+        while self._entries and (len(self._entries) > self.max_entries or self._bytes > self.max_bytes):
+            _, (_, evicted) = self._entries.popitem(last=False)
+            self._bytes -= len(evicted)
+            self._evictions += 1
+
+    def _average_latency(self, agent: str) -> float:
+        total, count = self._agent_latency[agent]
+        return total / count if count else 0.0
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            agents = {}
+            for agent, stats in self._agent_stats.items():
+                hits = stats["hits"] + stats["disk_hits"]
+                lookups = hits + stats["misses"]
+                agents[agent] = {
+                    "hits": int(stats["hits"]),
+                    "disk_hits": int(stats["disk_hits"]),
+                    "misses": int(stats["misses"]),
+                    "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+                    "seconds_saved": round(stats["seconds_saved"], 2),
+                }
+            return {
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_entries": self.max_entries,
+                "max_bytes": self.max_bytes,
+                "evictions": self._evictions,
+                "disk_enabled": self._disk is not None,
+                "agents": agents,
+            }
+
+
+class CachedWatsonxLLM(WatsonxLLM):
+    """WatsonxLLM that answers repeated greedy prompts from a CompletionCache"""
+
+    agent_name: str = "default"
+    completion_cache: Any = None
+    # Set by WatsonxClientRegistry: the shared client is resolved on the first call
+    client_registry: Any = None
+    client_key: Any = None
+
+    def _is_cacheable(self) -> bool:
+        params = self.params or {}
+        return self.completion_cache is not None and params.get("decoding_method", "greedy") == "greedy"
+
+    def _get_chat_params(self, stop: Optional[List[str]] = None) -> Dict[str, Any]:
+        params = super()._get_chat_params(stop=stop)
+        cap = _max_new_tokens.get()
+        if cap is not None:
+            params["max_new_tokens"] = min(params.get("max_new_tokens", cap), cap)
+        return params
+
+    def _stream_response_to_generation_chunk(self, stream_response: Dict[str, Any]) -> GenerationChunk:
+        counts = _stream_counts.get()
+        if counts is not None and stream_response.get("results"):
+            # Streamed chunks carry running totals; keep the largest seen
+            result = stream_response["results"][0]
+            for key in ("input_token_count", "generated_token_count"):
+                if result.get(key):
+                    counts[key] = max(counts.get(key, 0), result[key])
+        return super()._stream_response_to_generation_chunk(stream_response)
+
+    def _call_watsonx(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]],
+        run_manager: Optional[CallbackManagerForLLMRun],
+        stream: Optional[bool],
+        **kwargs: Any,
+    ) -> LLMResult:
+        """Live watsonx call through the registry's shared client, with per-client stats"""
+        direct = _in_watsonx_call.set(True)
+        try:
+            if self.client_registry is None:
+                return super()._generate(prompts, stop=stop, run_manager=run_manager, stream=stream, **kwargs)
+            if self.watsonx_model is None:
+                self.watsonx_model = self.client_registry.model(self.client_key)
+            started = self.client_registry.begin(self.client_key)
+            error = None
+            try:
+                return super()._generate(prompts, stop=stop, run_manager=run_manager, stream=stream, **kwargs)
+            except BaseException as e:
+                error = e
+                raise
+            finally:
+                self.client_registry.end(self.client_key, started, error)
+        finally:
+            _in_watsonx_call.reset(direct)
+
+    def _stream(
+        self,
+        prompt: str,
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        **kwargs: Any,
+    ) -> Iterator[GenerationChunk]:
+        """Route LLM.stream() (what crewai calls) through _generate, so the cache, budgets and tracing apply"""
+        if _in_watsonx_call.get():
+            yield from super()._stream(prompt, stop=stop, run_manager=run_manager, **kwargs)
+            return
+        result = self._generate([prompt], stop=stop, run_manager=run_manager, stream=True, **kwargs)
+        generation = result.generations[0][0]
+        yield GenerationChunk(text=generation.text, generation_info=generation.generation_info)
+
+    def _generate(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]] = None,
+        run_manager: Optional[CallbackManagerForLLMRun] = None,
+        stream: Optional[bool] = None,
+        **kwargs: Any,
+    ) -> LLMResult:
+        usage = current_usage.get()
+        with span(
+            "llm.generate",
+            agent=self.agent_name,
+            model=self.model_id,
+            prompts=len(prompts),
+            prompt_chars=sum(len(prompt) for prompt in prompts),
+        ) as call:
+            cap = usage.allowance("".join(prompts), (self.params or {}).get("max_new_tokens")) if usage else None
+            if cap == 0:
+                result = self._budget_exhausted(usage, run_manager, stream)
+            else:
+                cap_token = _max_new_tokens.set(cap)
+                counts: Dict[str, int] = {}
+                counts_token = _stream_counts.set(counts)
+                try:
+                    # A completion cut short by the cap is not what the params promise, so it is not cached
+                    result = self._generate_cached(prompts, stop, run_manager, stream, store=cap is None, **kwargs)
+                finally:
+                    _stream_counts.reset(counts_token)
+                    _max_new_tokens.reset(cap_token)
+                if usage is not None:
+                    self._account(usage, prompts, result, counts, capped=cap is not None)
+            if call is not None:
+                call.set(
+                    output_chars=sum(len(g.text) for generations in result.generations for g in generations),
+                    cached=bool((result.llm_output or {}).get("cached")),
+                    max_new_tokens=cap,
+                    **(result.llm_output or {}).get("token_usage", {}),
+                )
+            return result
+
+    def _account(
+        self,
+        usage: Any,
+        prompts: List[str],
+        result: LLMResult,
+        stream_counts: Dict[str, int],
+        capped: bool,
+    ):
+        """Charge a finished call to the request: reported counts when watsonx sent them, else estimates"""
+        llm_output = result.llm_output or {}
+        text = "".join(g.text for generations in result.generations for g in generations)
+        if llm_output.get("cached"):
+            usage.record_cached(self.agent_name)
+            return
+        reported = llm_output.get("token_usage") or stream_counts
+        input_tokens = reported.get("input_token_count") or 0
+        output_tokens = reported.get("generated_token_count") or 0
+        estimated = not input_tokens or (not output_tokens and bool(text))
+        if estimated:
+            input_tokens = input_tokens or sum(estimate_tokens(prompt) for prompt in prompts)
+            output_tokens = output_tokens or estimate_tokens(text)
+        if "token_usage" not in llm_output:
+            result.llm_output = {
+                **llm_output,
+                "token_usage": {"input_token_count": input_tokens, "generated_token_count": output_tokens},
+            }
+        usage.record(self.agent_name, input_tokens, output_tokens, estimated=estimated, capped=capped, output=text)
+
+    def _budget_exhausted(
+        self,
+        usage: Any,
+        run_manager: Optional[CallbackManagerForLLMRun],
+        stream: Optional[bool],
+    ) -> LLMResult:
+        """Answer without calling watsonx once the request's token budget is spent"""
+        text = usage.record_skipped(self.agent_name)
+        if run_manager and (stream if stream is not None else self.streaming):
+            run_manager.on_llm_new_token(text)
+        return LLMResult(
+            generations=[[Generation(text=text, generation_info={"finish_reason": "token_budget"})]],
+            llm_output={"model_id": self.model_id, "token_budget_exhausted": True},
+        )
+
+    def _generate_cached(
+        self,
+        prompts: List[str],
+        stop: Optional[List[str]],
+        run_manager: Optional[CallbackManagerForLLMRun],
+        stream: Optional[bool],
+        store: bool = True,
+        **kwargs: Any,
+    ) -> LLMResult:
+        if len(prompts) != 1 or not self._is_cacheable():
+            return self._call_watsonx(prompts, stop, run_manager, stream, **kwargs)
+
+        key = completion_key(self.model_id, self.params, prompts[0], stop)
+        cached = self.completion_cache.get(key, self.agent_name)
+        if cached is not None:
+            if run_manager and (stream if stream is not None else self.streaming):
+                # Keep streaming consumers working: deliver the cached completion as one token
+                run_manager.on_llm_new_token(cached)
+            return LLMResult(
+                generations=[[Generation(text=cached, generation_info={"finish_reason": "cached"})]],
+                llm_output={"model_id": self.model_id, "cached": True},
+            )
+
+        started = time.perf_counter()
+        result = self._call_watsonx(prompts, stop, run_manager, stream, **kwargs)
+        text = result.generations[0][0].text if result.generations and result.generations[0] else None
+        finish_reason = (result.generations[0][0].generation_info or {}).get("finish_reason") if text else None
+        if text and (store or finish_reason not in ("max_tokens", "not_finished")):
+            self.completion_cache.put(key, self.model_id, text, self.agent_name, time.perf_counter() - started)
+        return result
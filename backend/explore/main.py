@@ -1,16 +1,89 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, Header, HTTPException, Query
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
 from pydantic import BaseModel
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
+import asyncio
+import json
 import uvicorn
 
 from config import ExploreConfig
-from crew import explore_crew
+from jobs import job_manager, tracer
+import token_usage
+from metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, registry
+from profiling import HeapTracker, Profiler, ProfilingMiddleware
+from startup import Warmup
+
+
+# Heavy components (crewai, langchain, agents, crews) are loaded by the warmup thread
+# so the server can bind its port and answer /live straight away.
+explore_crew = None
+exa_client = None
+completion_cache = None
+llm_registry = None
+
+
+def load_agents() -> None:
+    """Import agents: EXA client, caches and the watsonx client registry."""
+    global exa_client, completion_cache, llm_registry
+    import agents
+
+    exa_client, completion_cache, llm_registry = agents.exa_client, agents.completion_cache, agents.llm_registry
+
+
+def load_explore_crew() -> None:
+    """Build the explore crew and prebuild its crew pool."""
+    global explore_crew
+    import crew
+
+    explore_crew = crew.explore_crew
+
+
+# On-demand request profiles and heap snapshots, gated by PROFILE_TOKEN.
+profiler = Profiler(
+    "explore",
+    ExploreConfig.PROFILE_DIR,
+    token=ExploreConfig.PROFILE_TOKEN,
+    interval=ExploreConfig.PROFILE_INTERVAL,
+    max_seconds=ExploreConfig.PROFILE_MAX_SECONDS,
+    keep=ExploreConfig.PROFILE_KEEP,
+)
+heap_tracker = HeapTracker(frames=ExploreConfig.HEAP_TRACE_FRAMES, max_snapshots=ExploreConfig.HEAP_MAX_SNAPSHOTS)
+# Read with every heap snapshot, so a diff shows which of these grew alongside the allocations
+heap_tracker.add_probe("crew_pool", lambda: explore_crew.pool.stats() if explore_crew else None)
+heap_tracker.add_probe("llm_cache", lambda: completion_cache.stats() if completion_cache else None)
+
+warmup = Warmup("explore")
+warmup.step("import crewai", lambda: __import__("crewai"))
+warmup.step("import langchain", lambda: __import__("langchain_community.llms"))
+warmup.step("agents and caches", load_agents)
+warmup.step("crew pool", load_explore_crew)
+if ExploreConfig.WARMUP_CONNECT:
+    warmup.step("watsonx auth", lambda: llm_registry.warm(), retries=3)
+
+
+def require_profiling(token: Optional[str]) -> None:
+    """Heap endpoints answer only to the profile token (404 while profiling is off)."""
+    if not profiler.enabled:
+        raise HTTPException(status_code=404, detail="Profiling is disabled (set PROFILE_TOKEN)")
+    if not profiler.authorized(token):
+        raise HTTPException(status_code=403, detail="Invalid profile token")
+
+
+def require_ready() -> None:
+    """Reject new work that needs the crews until warmup has finished."""
+    if not warmup.ready:
+        raise HTTPException(
+            status_code=503,
+            detail={"error": "warming_up", "state": warmup.state},
+            headers={"Retry-After": "5"},
+        )
 
 
 class ExploreRequest(BaseModel):
     query: str
+    user_location: Optional[Dict[str, float]] = None
 
 
 class ExploreResponse(BaseModel):
@@ -19,9 +92,30 @@ class ExploreResponse(BaseModel):
     plan: str
     notes: str
     result: Dict[str, Any]
+    token_usage: Optional[Dict[str, Any]] = None
     timestamp: str
 
 
+class JobSubmitResponse(BaseModel):
+    job_id: str
+    status: str
+    status_url: str
+    stream_url: str
+
+
+class JobStatusResponse(BaseModel):
+    job_id: str
+    query: str
+    status: str
+    current_stage: Optional[str] = None
+    stages_completed: List[str]
+    stages: Dict[str, str]
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+    created_at: str
+    updated_at: str
+
+
 # Validate config on import
 ExploreConfig.validate_config()
 
@@ -47,6 +141,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Requests presenting the profile token are sampled and written to PROFILE_DIR
+app.add_middleware(ProfilingMiddleware, profiler=profiler)
+
+# Request counts, latency and in-flight requests for /metrics
+app.add_middleware(MetricsMiddleware)
+
 
 @app.get("/")
 async def root():
@@ -54,35 +154,242 @@ async def root():
         "message": "Explore API",
         "description": "Plan → Search (EXA) → Synthesize using IBM Watsonx",
         "version": "1.0.0",
-        "endpoints": {"explore": "/explore", "health": "/health"},
+        "endpoints": {
+            "explore": "/explore",
+            "explore_stream": "/explore/stream",
+            "jobs": "/explore/jobs",
+            "job_status": "/explore/jobs/{job_id}",
+            "job_stream": "/explore/jobs/{job_id}/stream",
+            "search_stats": "/search/stats",
+            "llm_stats": "/llm/stats",
+            "trace_stats": "/traces/stats",
+            "token_stats": "/tokens/stats",
+            "profile_stats": "/profiles/stats",
+            "heap": "/heap",
+            "metrics": "/metrics",
+            "health": "/health",
+            "live": "/live",
+            "ready": "/ready",
+        },
     }
 
 
+@app.on_event("startup")
+async def start_job_manager():
+    if ExploreConfig.LAZY_STARTUP:
+        warmup.start()
+    else:
+        await asyncio.get_running_loop().run_in_executor(None, warmup.run)
+    tracer.start()
+    # Resumed jobs load the crew on their worker thread, waiting for warmup if needed
+    job_manager.start(asyncio.get_running_loop())
+
+
+@app.on_event("shutdown")
+async def stop_job_manager():
+    job_manager.shutdown()
+    tracer.close()
+    if exa_client is not None:
+        await exa_client.aclose()
+
+
+@app.get("/live")
+async def liveness():
+    """Liveness probe: the process is up and serving HTTP."""
+    return {"status": "alive", "timestamp": datetime.now().isoformat()}
+
+
+@app.get("/ready")
+async def readiness():
+    """Readiness probe: 200 only once crews are built and watsonx is reachable."""
+    status = warmup.status()
+    if not warmup.ready:
+        return JSONResponse(status_code=503, content=status)
+    return status
+
+
 @app.get("/health")
 async def health():
-    return {
-        "status": "healthy",
-        "timestamp": datetime.now().isoformat(),
-        "config_valid": True,
-    }
+    return JSONResponse(
+        status_code=503 if warmup.state == "failed" else 200,
+        content={
+            "status": "healthy" if warmup.ready else warmup.state,
+            "timestamp": datetime.now().isoformat(),
+            "config_valid": True,
+            "agents_ready": warmup.ready,
+            "warmup": warmup.status(),
+        },
+    )
+
+
+@app.get("/search/stats")
+async def search_stats():
+    """EXA connection pool utilisation and latency."""
+    require_ready()
+    return exa_client.stats()
+
+
+@app.get("/llm/stats")
+async def llm_stats():
+    """Completion cache size and per-agent hit rates."""
+    require_ready()
+    return completion_cache.stats() if completion_cache else {"enabled": False}
+
+
+@app.get("/llm/clients")
+async def llm_clients():
+    """Shared watsonx clients: which agents use them, in-flight calls and latency."""
+    require_ready()
+    return llm_registry.stats()
+
+
+@app.get("/crew/stats")
+async def crew_stats():
+    """Crew set pool utilisation (one set per running job)."""
+    require_ready()
+    return explore_crew.pool.stats()
+
+
+@app.get("/traces/stats")
+async def trace_stats():
+    """Traces started, kept (sampled, slow, failed) and written by the JSONL exporter."""
+    return tracer.stats()
+
+
+@app.get("/tokens/stats")
+async def token_stats():
+    """watsonx tokens since startup per endpoint and agent, and the per-job budget."""
+    return {"budget_per_job": ExploreConfig.TOKEN_BUDGET or None, **token_usage.stats()}
+
+
+@app.get("/profiles/stats")
+async def profile_stats():
+    """Request profiles written (newest first), and whether one is being sampled now."""
+    return profiler.stats()
+
+
+@app.get("/heap")
+async def heap_status(x_profile_token: Optional[str] = Header(None)):
+    """tracemalloc state, kept snapshots and the current probe readings."""
+    require_profiling(x_profile_token)
+    return heap_tracker.status()
+
+
+@app.post("/heap/snapshot")
+async def heap_snapshot(limit: int = Query(25, ge=1, le=500), x_profile_token: Optional[str] = Header(None)):
+    """Take a tracemalloc snapshot (the first one starts tracing) and diff it against the previous one."""
+    require_profiling(x_profile_token)
+    return await asyncio.get_running_loop().run_in_executor(None, heap_tracker.snapshot, limit)
+
+
+@app.get("/heap/diff")
+async def heap_diff(
+    base: Optional[int] = None,
+    target: Optional[int] = None,
+    group_by: str = "lineno",
+    filter: Optional[str] = None,
+    limit: int = Query(25, ge=1, le=500),
+    x_profile_token: Optional[str] = Header(None),
+):
+    """Allocation growth between two snapshots, grouped by lineno, traceback or filename."""
+    require_profiling(x_profile_token)
+    try:
+        return await asyncio.get_running_loop().run_in_executor(
+            None, heap_tracker.diff, base, target, group_by, limit, filter
+        )
+    except KeyError as e:
+        raise HTTPException(status_code=404, detail=str(e.args[0]))
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@app.delete("/heap")
+async def heap_stop(x_profile_token: Optional[str] = Header(None)):
+    """Stop tracemalloc (it slows every allocation) and drop the kept snapshots."""
+    require_profiling(x_profile_token)
+    return {"tracing": False, "snapshots_dropped": heap_tracker.stop()}
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus text exposition: per-stage latency histograms, error counters and in-flight gauges."""
+    return PlainTextResponse(registry.render(), media_type=METRICS_CONTENT_TYPE)
 
 
 @app.post("/explore", response_model=ExploreResponse)
-async def explore(req: ExploreRequest):
+async def explore(req: ExploreRequest, traceparent: Optional[str] = Header(None)):
+    require_ready()
     try:
-        result = explore_crew.run(req.query)
+        # Runs on the job pool; this handler only waits, it never blocks the event loop
+        job = await job_manager.asubmit(req.query, req.user_location, traceparent)
+        job = await job_manager.wait(job["id"])
+        if job["status"] != "completed":
+            raise HTTPException(status_code=500, detail=job["error"] or "Explore job failed")
+        result = job["result"]
         return ExploreResponse(
             success=True,
             query=result["query"],
             plan=result["plan"],
             notes=result["notes"],
             result=result["result"],
+            token_usage=result.get("token_usage"),
             timestamp=datetime.now().isoformat(),
         )
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@app.post("/explore/jobs", response_model=JobSubmitResponse, status_code=202)
+async def submit_explore_job(req: ExploreRequest, traceparent: Optional[str] = Header(None)):
+    require_ready()
+    job = await job_manager.asubmit(req.query, req.user_location, traceparent)
+    return JobSubmitResponse(
+        job_id=job["id"],
+        status=job["status"],
+        status_url=f"/explore/jobs/{job['id']}",
+        stream_url=f"/explore/jobs/{job['id']}/stream",
+    )
+
+
+@app.get("/explore/jobs/{job_id}", response_model=JobStatusResponse)
+async def get_explore_job(job_id: str):
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return JobStatusResponse(job_id=job["id"], **{k: v for k, v in job.items() if k not in ("id", "user_location")})
+
+
+def _job_event_stream(job_id: str) -> StreamingResponse:
+    """Server-sent events for a job: stage outputs in order, each place item, then the result."""
+
+    async def event_stream():
+        async for event in job_manager.events(job_id):
+            yield f"event: {event['type']}\ndata: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.get("/explore/jobs/{job_id}/stream")
+async def stream_explore_job(job_id: str):
+    if await job_manager.get(job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return _job_event_stream(job_id)
+
+
+@app.post("/explore/stream")
+async def explore_stream(req: ExploreRequest, traceparent: Optional[str] = Header(None)):
+    """Submit an exploration and stream its stages and place items in one request."""
+    require_ready()
+    job = await job_manager.asubmit(req.query, req.user_location, traceparent)
+    return _job_event_stream(job["id"])
+
+
 if __name__ == "__main__":
     uvicorn.run(
         "main:app",
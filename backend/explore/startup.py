@@ -0,0 +1,121 @@
+"""
+Background warmup with honest liveness/readiness state.
+
+The API process binds its port straight away and imports crewai/langchain, builds
+agents and authenticates with watsonx on a background thread. `/live` only says
+the process is up. `/ready` turns green once every warmup step has succeeded, so
+orchestrators never route traffic to a cold instance. Kept identical in
+backend/chat and backend/explore; change both copies together.
+"""
+
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+STARTING = "starting"
+WARMING = "warming"
+READY = "ready"
+FAILED = "failed"
+
+
+class WarmupStep:
+    def __init__(self, name: str, fn: Callable[[], Any], retries: int = 0, retry_delay: float = 2.0):
+        self.name = name
+        self.fn = fn
+        self.retries = retries
+        self.retry_delay = retry_delay
+        self.seconds: Optional[float] = None
+        self.attempts = 0
+        self.error: Optional[str] = None
+
+
+class Warmup:
+    """Runs named startup steps in order, timing each one"""
+
+    def __init__(self, service: str):
+        self.service = service
+        self.steps: List[WarmupStep] = []
+        self.state = STARTING
+        self.started_at = time.time()
+        self.ready_at: Optional[float] = None
+        self._ready = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def step(self, name: str, fn: Callable[[], Any], retries: int = 0, retry_delay: float = 2.0):
+        """Register a step; steps run in registration order"""
+        self.steps.append(WarmupStep(name, fn, retries, retry_delay))
+
+    @property
+    def ready(self) -> bool:
+        return self._ready.is_set()
+
+    def start(self):
+        """Warm up on a daemon thread so the server can accept /live probes immediately"""
+        if self._thread is None:
+            self._thread = threading.Thread(target=self.run, name=f"{self.service}-warmup", daemon=True)
+            self._thread.start()
+
+    def run(self) -> bool:
+        """Warm up in the calling thread; returns True once ready"""
+        self.state = WARMING
+        for step in self.steps:
+            while True:
+                step.attempts += 1
+                started = time.perf_counter()
+                try:
+                    step.fn()
+                    step.seconds = time.perf_counter() - started
+                    step.error = None
+                    break
+                except Exception as e:
+                    step.seconds = time.perf_counter() - started
+                    step.error = f"{type(e).__name__}: {e}"
+                    if step.attempts > step.retries:
+                        self.state = FAILED
+                        logger.error(f"{self.service} warmup failed at '{step.name}': {step.error}")
+                        self._log_breakdown()
+                        return False
+                    logger.warning(f"{self.service} warmup step '{step.name}' failed, retrying: {step.error}")
+                    time.sleep(step.retry_delay * step.attempts)
+
+        self.state = READY
+        self.ready_at = time.time()
+        self._ready.set()
+        self._log_breakdown()
+        return True
+
+    def wait(self, timeout: Optional[float] = None) -> bool:
+        return self._ready.wait(timeout)
+
+    def _log_breakdown(self):
+        lines = [f"{self.service} warmup {self.state} after {time.time() - self.started_at:.2f}s:"]
+        for step in self.steps:
+            if step.seconds is None:
+                lines.append(f"  {step.name:<28} not run")
+            else:
+                suffix = f"  ({step.attempts} attempts)" if step.attempts > 1 else ""
+                suffix += f"  FAILED: {step.error}" if step.error else ""
+                lines.append(f"  {step.name:<28} {step.seconds:8.3f}s{suffix}")
+        # print so the breakdown shows up in container logs regardless of logging config
+        print("\n".join(lines), flush=True)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "service": self.service,
+            "state": self.state,
+            "ready": self.ready,
+            "uptime_seconds": round(time.time() - self.started_at, 1),
+            "warmup_seconds": round(self.ready_at - self.started_at, 3) if self.ready_at else None,
+            "steps": [
+                {
+                    "name": step.name,
+                    "seconds": round(step.seconds, 3) if step.seconds is not None else None,
+                    "attempts": step.attempts,
+                    "error": step.error,
+                }
+                for step in self.steps
+            ],
+        }
@@ -0,0 +1,113 @@
+import contextvars
+import json
+import re
+from typing import Any, Callable, Dict, Optional
+
+from langchain_core.callbacks import BaseCallbackHandler
+
+
+_ITEMS_ARRAY_START = re.compile(r'"items"\s*:\s*\[')
+
+
+class ItemStreamParser:
+    """
+    Incrementally extracts place objects from the `items` array of streamed synthesis JSON.
+
+    Each object is handed to `on_item` as soon as its closing brace arrives, so the
+    first card can render long before the rest of the payload has been generated.
+    """
+
+    def __init__(self, on_item: Callable[[Dict[str, Any]], None]) -> None:
+        self._on_item = on_item
+        self.items_emitted = 0
+        self.reset()
+
+    def reset(self) -> None:
+        """Forget partial state; called at the start of every LLM generation."""
+        self._prefix = ""
+        self._in_array = False
+        self._done = False
+        self._depth = 0
+        self._in_string = False
+        self._escaped = False
+        self._current = []
+        self._index = 0
+
+    def feed(self, text: str) -> None:
+        if self._done or not text:
+            return
+
+        if not self._in_array:
+            self._prefix += text
+            match = _ITEMS_ARRAY_START.search(self._prefix)
+            if not match:
+                return
+            self._in_array = True
+            text = self._prefix[match.end():]
+            self._prefix = ""
+
+        for char in text:
+            if self._depth == 0:
+                # Between items: skip separators, stop at the end of the array
+                if char == "{":
+                    self._depth = 1
+                    self._current = [char]
+                elif char == "]":
+                    self._done = True
+                    return
+                continue
+
+            self._current.append(char)
+            if self._in_string:
+                if self._escaped:
+                    self._escaped = False
+                elif char == "\\":
+                    self._escaped = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char in "{[":
+                self._depth += 1
+            elif char in "}]":
+                self._depth -= 1
+                if self._depth == 0:
+                    self._emit("".join(self._current))
+                    self._current = []
+
+    def _emit(self, raw: str) -> None:
+        try:
+            item = json.loads(raw)
+        except ValueError:
+            return
+        if not isinstance(item, dict):
+            return
+        # A retried generation repeats items that were already delivered; skip those
+        self._index += 1
+        if self._index <= self.items_emitted:
+            return
+        self.items_emitted += 1
+        self._on_item(item)
+
+
+# Parser for the explore job running in this worker thread, if it wants streamed items
+current_item_parser: contextvars.ContextVar[Optional[ItemStreamParser]] = contextvars.ContextVar(
+    "current_item_parser", default=None
+)
+
+
+class ItemStreamHandler(BaseCallbackHandler):
+    """LangChain callback feeding synthesis tokens into the active job's ItemStreamParser."""
+
+    def on_llm_start(self, serialized: Any, prompts: Any, **kwargs: Any) -> None:
+        parser = current_item_parser.get()
+        if parser is not None:
+            parser.reset()
+
+    def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
+        parser = current_item_parser.get()
+        if parser is not None:
+            parser.feed(token)
+
+
+item_stream_handler = ItemStreamHandler()
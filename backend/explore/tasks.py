@@ -1,9 +1,8 @@
 from typing import Dict
-from crewai import Task
-from agents import planner_agent, research_agent, coordinate_extraction_agent, synthesis_agent
+from crewai import Agent, Task
 
 
-def create_planning_task(user_query: str, user_location: Dict[str, float] = None) -> Task:
+def create_planning_task(agent: Agent, user_query: str, user_location: Dict[str, float] = None) -> Task:
     # Extract location context from query or use user's location
     location_context = ""
     if user_location:
@@ -34,14 +33,14 @@ def create_planning_task(user_query: str, user_location: Dict[str, float] = None
 
         Keep it short and practical (3-6 steps).
         """,
-        agent=planner_agent,
+        agent=agent,
         expected_output="""
         A numbered list of 3-6 targeted steps, each with: search query, goal, expected data points, and contribution.
         """,
     )
 
 
-def create_research_task(user_query: str, plan_text: str, user_location: Dict[str, float] = None) -> Task:
+def create_research_task(agent: Agent, user_query: str, plan_text: str, user_location: Dict[str, float] = None) -> Task:
     location_context = ""
     if user_location:
         location_context = f"\nUser's current location: Latitude {user_location['lat']}, Longitude {user_location['lng']}"
@@ -102,14 +101,14 @@ def create_research_task(user_query: str, plan_text: str, user_location: Dict[st
            - Document each verification step
            - Keep track of confirmed in-location temples
         """,
-        agent=research_agent,
+        agent=agent,
         expected_output="""
         A structured research note with sections per plan step, containing bullet points of key findings and the list of sources with URLs.
         """,
     )
 
 
-def create_coordinate_extraction_task(user_query: str, research_notes: str, user_location: Dict[str, float] = None) -> Task:
+def create_coordinate_extraction_task(agent: Agent, user_query: str, research_notes: str, user_location: Dict[str, float] = None) -> Task:
     location_context = ""
     if user_location:
         location_context = f"\nUser's current location: Latitude {user_location['lat']}, Longitude {user_location['lng']}"
@@ -207,14 +206,14 @@ def create_coordinate_extraction_task(user_query: str, research_notes: str, user
         PLACE: [Next Exact Place Name]
         ...
         """,
-        agent=coordinate_extraction_agent,
+        agent=agent,
         expected_output="""
         Structured list of places with their coordinates, images, and addresses extracted from research.
         """,
     )
 
 
-def create_synthesis_task(user_query: str, research_notes: str, coordinate_data: str = "", user_location: Dict[str, float] = None) -> Task:
+def create_synthesis_task(agent: Agent, user_query: str, research_notes: str, coordinate_data: str = "", user_location: Dict[str, float] = None) -> Task:
     location_context = ""
     if user_location:
         location_context = f"\nUser's current location: Latitude {user_location['lat']}, Longitude {user_location['lng']}"
@@ -307,7 +306,7 @@ def create_synthesis_task(user_query: str, research_notes: str, coordinate_data:
         - CRITICAL: Double-check all URLs for typos before including them
         - Return ONLY minified JSON in the exact schema; do not wrap in code fences.
         """,
-        agent=synthesis_agent,
+        agent=agent,
         expected_output="""
         A minified JSON string strictly following the schema.
         """,
@@ -0,0 +1,5 @@
+import os
+import sys
+
+# The service imports its modules flat (as it does when run from backend/explore)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,59 @@
+import asyncio
+import threading
+import time
+
+from jobs import JobManager, JobStore
+from tracing import Tracer
+
+
+def make_manager(tmp_path):
+    return JobManager(JobStore(str(tmp_path / "jobs.db")), workers=1, tracer=Tracer("explore", None))
+
+
+def test_reads_wait_for_writers_off_the_event_loop(tmp_path):
+    manager = make_manager(tmp_path)
+    job = manager.store.create("temples of Hampi")
+    writing = threading.Event()
+
+    def slow_writer():
+        # A worker committing stage output holds the store lock
+        with manager.store._lock:
+            writing.set()
+            time.sleep(0.3)
+
+    async def run():
+        writer = threading.Thread(target=slow_writer)
+        writer.start()
+        writing.wait()
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while not read.done():
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        read = asyncio.ensure_future(manager.get(job["id"]))
+        await ticker()
+        writer.join()
+        return await read, ticks
+
+    found, ticks = asyncio.run(run())
+    assert found["id"] == job["id"]
+    assert ticks >= 10
+    manager.shutdown()
+
+
+def test_events_replay_a_finished_job(tmp_path):
+    manager = make_manager(tmp_path)
+    job = manager.store.create("forts of Rajasthan")
+    manager.store.save_stage(job["id"], "search", "results")
+    manager.store.complete(job["id"], {"query": "forts of Rajasthan"})
+
+    async def run():
+        return [event async for event in manager.events(job["id"])], await manager.wait(job["id"])
+
+    events, finished = asyncio.run(run())
+    assert [event["type"] for event in events] == ["status", "stage", "completed"]
+    assert finished["status"] == "completed"
+    manager.shutdown()
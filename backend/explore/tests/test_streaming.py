@@ -0,0 +1,72 @@
+import json
+
+import pytest
+
+from streaming import ItemStreamParser
+
+ITEMS = [
+    {"name": "Brihadeeswarar Temple", "summary": "Chola temple, {granite} vimana", "tags": ["temple", "UNESCO"]},
+    {"name": "Gangaikonda \"Cholapuram\"", "summary": "Path: C:\\temples\\ [sic]", "location": {"lat": 11.2, "lng": 79.4}},
+    {"name": "Darasuram", "summary": "Airavatesvara } temple ]", "tags": []},
+]
+PAYLOAD = json.dumps({"title": "Chola temples", "items": ITEMS, "notes": [{"ignored": True}]}, indent=2)
+
+
+def parse(chunks):
+    received = []
+    parser = ItemStreamParser(received.append)
+    for chunk in chunks:
+        parser.feed(chunk)
+    return received, parser
+
+
+def chunked(text, size):
+    return [text[i:i + size] for i in range(0, len(text), size)]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 64, len(PAYLOAD)])
+def test_items_survive_any_chunk_boundary(size):
+    received, parser = parse(chunked(PAYLOAD, size))
+    assert received == ITEMS
+    assert parser.items_emitted == len(ITEMS)
+
+
+def test_items_key_split_across_chunks():
+    start = PAYLOAD.index('"items"')
+    chunks = [PAYLOAD[:start + 3], PAYLOAD[start + 3:start + 9], PAYLOAD[start + 9:]]
+    received, _ = parse(chunks)
+    assert received == ITEMS
+
+
+def test_each_item_is_delivered_when_its_brace_closes():
+    received = []
+    parser = ItemStreamParser(received.append)
+    first_end = PAYLOAD.index("}", PAYLOAD.index('"tags"')) + 1
+    parser.feed(PAYLOAD[:first_end - 1])
+    assert received == []
+    parser.feed(PAYLOAD[first_end - 1:first_end])
+    assert received == ITEMS[:1]
+
+
+def test_text_after_the_array_is_ignored():
+    received, _ = parse(chunked(PAYLOAD, 5))
+    assert {"ignored": True} not in received
+
+
+def test_malformed_item_is_skipped():
+    received, _ = parse(['{"items": [{"name": "ok"}, {"name": oops}, {"name": "also ok"}]}'])
+    assert received == [{"name": "ok"}, {"name": "also ok"}]
+
+
+def test_retried_generation_does_not_repeat_items():
+    received = []
+    parser = ItemStreamParser(received.append)
+    cut = PAYLOAD.index('"Darasuram"')
+    for chunk in chunked(PAYLOAD[:cut], 4):
+        parser.feed(chunk)
+    assert received == ITEMS[:2]
+
+    parser.reset()
+    for chunk in chunked(PAYLOAD, 4):
+        parser.feed(chunk)
+    assert received == ITEMS